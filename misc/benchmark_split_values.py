@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+#
+# Copyright (C) 2010-2012 Platform Computing
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+'''
+Micro-benchmark which compares the scanner used to split X-OCCI-Attribute
+values with the shlex based splitting it replaced.
+
+Created on Oct 17, 2026
+'''
+
+from occi.protocol.occi_rendering import split_values
+import shlex
+import timeit
+
+HEADER = ', '.join(['occi.compute.attr%d="value, %d"' % (i, i)
+                    for i in range(20)])
+
+
+def split_shlex(string):
+    '''
+    The old way of splitting.
+
+    string -- The string to split.
+    '''
+    split = shlex.shlex(string, posix=True)
+    split.whitespace = ','
+    split.whitespace_split = True
+    return list(split)
+
+
+if __name__ == '__main__':
+    assert split_shlex(HEADER) == split_values(HEADER)
+    for func in [split_shlex, split_values]:
+        duration = min(timeit.repeat(lambda: func(HEADER), number=1000,
+                                     repeat=3))
+        print '%-13s %8.1f us per header' % (func.__name__,
+                                             duration * 1000)
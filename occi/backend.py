@@ -24,6 +24,8 @@ Created on Jun 27, 2011
 @author: tmetsch
 '''
 
+from occi.exceptions import HTTPError
+
 
 def is_related_valid(link):
     '''
@@ -87,6 +89,12 @@ class KindBackend(object):
     multiple kinds to one backend.
     '''
 
+    # If the backends are called concurrently (see Application) backends
+    # which are ordered are called one by one after the others (before them
+    # on deletion) - e.g. link backends which need the source resource to be
+    # created first.
+    ordered = False
+
     def create(self, entity, extras):
         '''
         Call the Resource Management and create this entity.
@@ -147,6 +155,41 @@ class KindBackend(object):
         '''
         pass
 
+    # The *_many methods are called by the workflow with all the entities of
+    # a request which this backend handles. Override them if the Resource
+    # Management can handle batches - by default they call the single entity
+    # methods one by one.
+
+    def create_many(self, entities, extras):
+        '''
+        Call the Resource Management and create these entities.
+
+        entities -- The entities which are to be created.
+        extras -- Any extra arguments which are defined by the user.
+        '''
+        for entity in entities:
+            self.create(entity, extras)
+
+    def retrieve_many(self, entities, extras):
+        '''
+        Call the Resource Management and refresh these entities.
+
+        entities -- The entities which are to be retrieved.
+        extras -- Any extra arguments which are defined by the user.
+        '''
+        for entity in entities:
+            self.retrieve(entity, extras)
+
+    def delete_many(self, entities, extras):
+        '''
+        Call the Resource Management and delete these entities.
+
+        entities -- The entities which are to be deleted.
+        extras -- Any extra arguments which are defined by the user.
+        '''
+        for entity in entities:
+            self.delete(entity, extras)
+
 
 class ActionBackend(object):
     '''
@@ -169,6 +212,28 @@ class ActionBackend(object):
         '''
         pass
 
+    def action_many(self, entities, action, attributes, extras):
+        '''
+        Call the Resource Management and perform this action on several
+        entities.
+
+        Returns the entities on which the action failed as (entity, error)
+        tuples - raising an error fails the action on all of them. By
+        default action is called for one entity after another.
+
+        entities -- The entities on which the action is going to be performed.
+        action -- The action category definition.
+        attributes -- The acctributes for this action.
+        extras -- Any extra arguments which are defined by the user.
+        '''
+        errors = []
+        for entity in entities:
+            try:
+                self.action(entity, action, attributes, extras)
+            except (AttributeError, HTTPError) as err:
+                errors.append((entity, err))
+        return errors
+
 
 class MixinBackend(KindBackend):
     '''
@@ -0,0 +1,131 @@
+# coding=utf-8
+#
+# Copyright (C) 2010-2012 Platform Computing
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+'''
+Simple caches used within the service.
+
+Created on Oct 17, 2026
+'''
+
+import collections
+import threading
+
+
+class LRUCache(object):
+    '''
+    A bounded dictionary which drops the least recently used entry once it
+    is full. Safe to be used from multiple threads.
+    '''
+
+    def __init__(self, max_size=256, max_bytes=None, weigh=len):
+        '''
+        Constructor.
+
+        max_size -- Maximum number of entries.
+        max_bytes -- Maximum overall weight of the values (None for no
+                     limit).
+        weigh -- Function returning the weight (in bytes) of a value.
+        '''
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.weigh = weigh
+        self.bytes = 0
+        self.entries = collections.OrderedDict()
+        self.weights = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        '''
+        Return the value for a key and mark it as recently used.
+
+        key -- The key to look for.
+        default -- Returned when the key is not cached.
+        '''
+        with self.lock:
+            try:
+                value = self.entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self.entries[key] = value
+            return value
+
+    def put(self, key, value):
+        '''
+        Add a value to the cache - evicts the oldest entry if needed.
+
+        key -- The key.
+        value -- The value.
+        '''
+        with self.lock:
+            self._remove(key)
+            if self.max_bytes is not None:
+                weight = self.weigh(value)
+                if weight > self.max_bytes:
+                    return
+                self.weights[key] = weight
+                self.bytes += weight
+            self.entries[key] = value
+            while len(self.entries) > self.max_size or \
+                    (self.max_bytes is not None and
+                     self.bytes > self.max_bytes):
+                self._remove(next(iter(self.entries)))
+
+    def pop(self, key):
+        '''
+        Remove a key from the cache (if present).
+
+        key -- The key.
+        '''
+        with self.lock:
+            self._remove(key)
+
+    def clear(self):
+        '''
+        Remove all entries.
+        '''
+        with self.lock:
+            self.entries.clear()
+            self.weights.clear()
+            self.bytes = 0
+
+    def _remove(self, key):
+        '''
+        Drop an entry and its weight - the lock needs to be held.
+
+        key -- The key.
+        '''
+        self.entries.pop(key, None)
+        self.bytes -= self.weights.pop(key, 0)
+
+    def get_stats(self):
+        '''
+        Returns the number of hits, misses and the current size.
+        '''
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'size': len(self.entries)}
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,341 @@
+# coding=utf-8
+#
+# Copyright (C) 2010-2012 Platform Computing
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+'''
+Containers which are split into chunks so copies can share them - used by
+the copy-on-write registry.
+
+A copy only copies the list of chunks; a chunk is copied once it is changed
+for the first time after the copy. Neither the original nor the copy may be
+changed concurrently with a read of the same container.
+
+Created on Oct 17, 2026
+'''
+
+import bisect
+
+
+class _Chunks(object):
+    '''
+    Base class for the hashed containers: the items are spread over the
+    chunks by the hash of their key. The number of chunks is kept at about
+    the square root of the number of items, so a write copies O(sqrt(n))
+    references instead of all n items.
+    '''
+
+    factory = dict
+
+    def __init__(self, size=8):
+        '''
+        Constructor.
+
+        size -- Initial number of chunks.
+        '''
+        self.chunks = [self.factory() for _ in range(size)]
+        self.size = 0
+        # ids of the chunks which are not shared with a copy.
+        self.owned = set(id(chunk) for chunk in self.chunks)
+
+    def copy(self):
+        '''
+        Return a copy which shares the chunks with this one.
+        '''
+        result = self.__class__.__new__(self.__class__)
+        result.chunks = list(self.chunks)
+        result.size = self.size
+        result.owned = set()
+        # the chunks are shared now - both sides have to copy them.
+        self.owned = set()
+        return result
+
+    def _get(self, key):
+        '''
+        Returns the chunk which holds a key for reading.
+
+        key -- The key.
+        '''
+        return self.chunks[hash(key) % len(self.chunks)]
+
+    def _own(self, key):
+        '''
+        Returns the chunk which holds a key for changing it.
+
+        key -- The key.
+        '''
+        index = hash(key) % len(self.chunks)
+        chunk = self.chunks[index]
+        if id(chunk) not in self.owned:
+            chunk = self.factory(chunk)
+            self.chunks[index] = chunk
+            self.owned.add(id(chunk))
+        return chunk
+
+    def _grow(self):
+        '''
+        Spread the items over more chunks once they got too big.
+        '''
+        if self.size <= len(self.chunks) ** 2:
+            return
+        items = self.chunks
+        self.chunks = [self.factory() for _ in range(len(items) * 2)]
+        self.owned = set(id(chunk) for chunk in self.chunks)
+        for chunk in items:
+            self._spread(chunk)
+
+    def _spread(self, chunk):
+        '''
+        Add the items of an old chunk after the chunks got rearranged.
+
+        chunk -- The old chunk.
+        '''
+        raise NotImplementedError()
+
+    def __contains__(self, key):
+        return key in self._get(key)
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            for key in chunk:
+                yield key
+
+    def __len__(self):
+        return self.size
+
+
+class ChunkedDict(_Chunks):
+    '''
+    Dictionary which is split into chunks.
+    '''
+
+    def __getitem__(self, key):
+        return self._get(key)[key]
+
+    def __setitem__(self, key, value):
+        chunk = self._own(key)
+        if key not in chunk:
+            self.size += 1
+        chunk[key] = value
+        self._grow()
+
+    def get(self, key, default=None):
+        '''
+        Return the value for a key - or the default if it is not present.
+
+        key -- The key.
+        default -- Returned when the key is not present.
+        '''
+        return self._get(key).get(key, default)
+
+    def pop(self, key, *default):
+        '''
+        Remove a key and return its value. Raises KeyError if it is not
+        present and no default is given.
+
+        key -- The key.
+        default -- Returned when the key is not present.
+        '''
+        if key not in self._get(key):
+            if len(default):
+                return default[0]
+            raise KeyError(key)
+        self.size -= 1
+        return self._own(key).pop(key)
+
+    def keys(self):
+        '''
+        Returns a list of the keys.
+        '''
+        return list(self)
+
+    def values(self):
+        '''
+        Returns a list of the values.
+        '''
+        return [value for chunk in self.chunks for value in chunk.itervalues()]
+
+    def items(self):
+        '''
+        Returns a list of the (key, value) pairs.
+        '''
+        return list(self.iteritems())
+
+    def iteritems(self):
+        '''
+        Iterates over the (key, value) pairs.
+        '''
+        for chunk in self.chunks:
+            for item in chunk.iteritems():
+                yield item
+
+    def _spread(self, chunk):
+        for key, value in chunk.iteritems():
+            self.chunks[hash(key) % len(self.chunks)][key] = value
+
+
+class ChunkedSet(_Chunks):
+    '''
+    Set which is split into chunks.
+    '''
+
+    factory = set
+
+    def add(self, key):
+        '''
+        Add a key.
+
+        key -- The key.
+        '''
+        chunk = self._own(key)
+        if key not in chunk:
+            self.size += 1
+            chunk.add(key)
+            self._grow()
+
+    def discard(self, key):
+        '''
+        Remove a key if it is present.
+
+        key -- The key.
+        '''
+        if key in self._get(key):
+            self.size -= 1
+            self._own(key).discard(key)
+
+    def _spread(self, chunk):
+        for key in chunk:
+            self.chunks[hash(key) % len(self.chunks)].add(key)
+
+
+class ChunkedList(object):
+    '''
+    Sorted list which is split into chunks of at most max_chunk items. A
+    write copies the (short) lists of chunks and the chunk it changes.
+    '''
+
+    max_chunk = 1024
+
+    def __init__(self):
+        self.chunks = []
+        # the first item of each chunk - to find the chunk of an item.
+        self.firsts = []
+        self.size = 0
+        self.owned = set()
+
+    def copy(self):
+        '''
+        Return a copy which shares the chunks with this one.
+        '''
+        result = ChunkedList()
+        result.chunks = list(self.chunks)
+        result.firsts = list(self.firsts)
+        result.size = self.size
+        # the chunks are shared now - both sides have to copy them.
+        self.owned = set()
+        return result
+
+    def add(self, item):
+        '''
+        Insert an item at its position.
+
+        item -- The item.
+        '''
+        self.size += 1
+        if not len(self.chunks):
+            self.chunks.append([item])
+            self.firsts.append(item)
+            self.owned.add(id(self.chunks[0]))
+            return
+        index = self._find(item)
+        chunk = self._own(index)
+        bisect.insort(chunk, item)
+        self.firsts[index] = chunk[0]
+        if len(chunk) > self.max_chunk:
+            half = len(chunk) // 2
+            parts = [chunk[:half], chunk[half:]]
+            self.chunks[index:index + 1] = parts
+            self.firsts[index:index + 1] = [part[0] for part in parts]
+            self.owned.discard(id(chunk))
+            self.owned.update(id(part) for part in parts)
+
+    def remove(self, item):
+        '''
+        Remove an item. Raises ValueError if it is not present.
+
+        item -- The item.
+        '''
+        if not len(self.chunks):
+            raise ValueError(item)
+        index = self._find(item)
+        position = bisect.bisect_left(self.chunks[index], item)
+        if position == len(self.chunks[index]) or \
+                self.chunks[index][position] != item:
+            raise ValueError(item)
+        chunk = self._own(index)
+        del chunk[position]
+        self.size -= 1
+        if len(chunk):
+            self.firsts[index] = chunk[0]
+        else:
+            del self.chunks[index]
+            del self.firsts[index]
+            self.owned.discard(id(chunk))
+
+    def iter_from(self, item):
+        '''
+        Iterate over the items starting with the first one which is not
+        smaller than the given one.
+
+        item -- Where to start.
+        '''
+        index = max(self._find(item), 0)
+        for number in range(index, len(self.chunks)):
+            chunk = self.chunks[number]
+            start = 0
+            if number == index:
+                start = bisect.bisect_left(chunk, item)
+            for position in range(start, len(chunk)):
+                yield chunk[position]
+
+    def _find(self, item):
+        '''
+        Returns the index of the chunk an item belongs to.
+
+        item -- The item.
+        '''
+        return max(bisect.bisect_right(self.firsts, item) - 1, 0)
+
+    def _own(self, index):
+        '''
+        Returns the chunk at the given index for changing it.
+
+        index -- Index of the chunk.
+        '''
+        chunk = self.chunks[index]
+        if id(chunk) not in self.owned:
+            chunk = list(chunk)
+            self.chunks[index] = chunk
+            self.owned.add(id(chunk))
+        return chunk
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            for item in chunk:
+                yield item
+
+    def __len__(self):
+        return self.size
@@ -28,6 +28,12 @@ Created on Jun 27, 2011
 # disabling 'Too many arguments' pylint check (It's more elegant this way...)
 # pylint: disable=R0903, R0913
 
+import itertools
+import time
+
+# Source for the versions of entities - unique within the process.
+VERSIONS = itertools.count(1)
+
 #==============================================================================
 # Categories
 #==============================================================================
@@ -130,6 +136,10 @@ class Entity(object):
         self.actions = []
         self.extras = None
 
+        # Change whenever the entity is changed (see workflow.touch).
+        self.version = next(VERSIONS)
+        self.modified = time.time()
+
 
 class Resource(Entity):
     '''
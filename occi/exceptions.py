@@ -43,3 +43,19 @@ class HTTPError(Exception):
 
     def __str__(self):
         return repr(self.code) + ' - ' + self.message
+
+
+class BackendErrors(AttributeError):
+    '''
+    Raised when several backends failed during one operation.
+    '''
+
+    def __init__(self, errors):
+        '''
+        Creates the error.
+
+        errors -- List of the errors raised by the backends.
+        '''
+        AttributeError.__init__(self, 'Several backends failed: '
+                                + '; '.join([str(item) for item in errors]))
+        self.errors = errors
@@ -0,0 +1,180 @@
+# coding=utf-8
+#
+# Copyright (C) 2010-2012 Platform Computing
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+'''
+A simple thread pool to call backends concurrently.
+
+Created on Oct 17, 2026
+'''
+
+import Queue
+import sys
+import threading
+
+
+class Future(object):
+    '''
+    The result of a call which was submitted to a ThreadPool.
+    '''
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+    def set_result(self, value):
+        '''
+        Set the return value of the call.
+
+        value -- The return value.
+        '''
+        self.value = value
+        self.event.set()
+
+    def set_error(self, error):
+        '''
+        Set the error raised by the call.
+
+        error -- The exc_info tuple of the error.
+        '''
+        self.error = error
+        self.event.set()
+
+    def done(self):
+        '''
+        Returns True if the call has finished.
+        '''
+        return self.event.is_set()
+
+    def wait(self, timeout=None):
+        '''
+        Wait until the call has finished. Returns True if it did.
+
+        timeout -- Seconds to wait at most (default: forever).
+        '''
+        return self.event.wait(timeout)
+
+    def result(self):
+        '''
+        Wait for the call and return its value - raises the error of the
+        call if there was one.
+        '''
+        self.event.wait()
+        if self.error is not None:
+            raise self.error[0], self.error[1], self.error[2]
+        return self.value
+
+
+class ThreadPool(object):
+    '''
+    A fixed number of daemon threads which run the submitted calls. The
+    threads are started with the first call.
+    '''
+
+    def __init__(self, max_workers=8):
+        '''
+        Constructor.
+
+        max_workers -- Number of threads.
+        '''
+        self.max_workers = max_workers
+        self.queue = Queue.Queue()
+        self.threads = []
+        self.lock = threading.Lock()
+
+    def submit(self, func, *args, **kwargs):
+        '''
+        Queue a call - returns a Future.
+
+        func -- The function to call.
+        args -- The arguments for the function.
+        kwargs -- The keyworded arguments for the function.
+        '''
+        with self.lock:
+            while len(self.threads) < self.max_workers:
+                thread = threading.Thread(target=self._work)
+                thread.daemon = True
+                thread.start()
+                self.threads.append(thread)
+        future = Future()
+        self.queue.put((future, func, args, kwargs))
+        return future
+
+    def run(self, calls):
+        '''
+        Run a set of calls concurrently and wait for all of them. Returns the
+        errors (exc_info tuples) of the calls which failed.
+
+        Calls done from within one of the threads of this pool are done one
+        after another - waiting for the pool from within would deadlock once
+        all threads wait.
+
+        calls -- List of (function, arguments) tuples.
+        '''
+        errors = []
+        if len(calls) < 2 or self.is_worker():
+            for func, args in calls:
+                try:
+                    func(*args)
+                # catching everything - errors are handed to the caller.
+                # pylint: disable=W0703
+                except Exception:
+                    errors.append(sys.exc_info())
+            return errors
+
+        futures = [self.submit(func, *args) for func, args in calls]
+        for future in futures:
+            future.wait()
+            if future.error is not None:
+                errors.append(future.error)
+        return errors
+
+    def is_worker(self):
+        '''
+        Returns True if called from one of the threads of this pool.
+        '''
+        return threading.current_thread() in self.threads
+
+    def shutdown(self):
+        '''
+        Stop the threads once the queued calls are done.
+        '''
+        with self.lock:
+            threads = self.threads
+            self.threads = []
+        for _ in threads:
+            self.queue.put(None)
+        for thread in threads:
+            if thread is not threading.current_thread():
+                thread.join()
+
+    def _work(self):
+        '''
+        Loop of the threads.
+        '''
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            future, func, args, kwargs = item
+            try:
+                future.set_result(func(*args, **kwargs))
+            # catching everything - errors are handed to the caller.
+            # pylint: disable=W0703
+            except Exception:
+                future.set_error(sys.exc_info())
@@ -25,7 +25,15 @@ Created on Jun 27, 2011
 '''
 
 from occi import workflow
+from occi.cache import LRUCache
 from occi.exceptions import HTTPError
+from occi.jobs import submit_action
+import base64
+import email.utils
+import hashlib
+import urllib
+import urlparse
+import uuid
 
 #==============================================================================
 # Set of HTTP Header field names - naming is defined by WSGI
@@ -38,6 +46,42 @@ LOCATION = 'X-OCCI-Location'
 ATTRIBUTE = 'X-OCCI-Attribute'
 CATEGORY = 'Category'
 QUERY_STRING = 'Query_String'
+ETAG = 'ETag'
+LAST_MODIFIED = 'Last-Modified'
+IF_NONE_MATCH = 'If-None-Match'
+IF_MODIFIED_SINCE = 'If-Modified-Since'
+
+# Part of every ETag - versions are only unique within one process.
+ETAG_EPOCH = uuid.uuid4().hex
+
+
+def _weigh_rendering(rendering):
+    '''
+    Returns the size of a rendering (headers and body) in bytes.
+
+    rendering -- Tuple of headers and body.
+    '''
+    headers, body = rendering
+    size = len(body)
+    for key, value in headers.items():
+        size += len(str(key)) + len(str(value))
+    return size
+
+# default limits of the cache for the renderings of entities.
+RENDER_CACHE_SIZE = 1024
+RENDER_CACHE_BYTES = 16 * 1024 * 1024
+
+
+def create_render_cache(max_size=RENDER_CACHE_SIZE,
+                        max_bytes=RENDER_CACHE_BYTES):
+    '''
+    Returns a cache for the renderings of entities - see
+    BaseHandler.render_entity.
+
+    max_size -- Maximum number of renderings.
+    max_bytes -- Maximum overall size of the renderings in bytes.
+    '''
+    return LRUCache(max_size, max_bytes=max_bytes, weigh=_weigh_rendering)
 
 
 class BaseHandler(object):
@@ -48,13 +92,23 @@ class BaseHandler(object):
     # disabling 'Too many arguments' pylint check (only inst. within module)
     # pylint: disable=R0913
 
-    def __init__(self, registry, headers, body, query, extras=None):
+    def __init__(self, registry, headers, body, query, extras=None,
+                 stream=False, executor=None, jobs=None, render_cache=None):
         self.registry = registry
         self.headers = headers
         self.body = body
         self.query = query
 
         self.extras = extras
+        # render collections piece by piece (body will be an iterable).
+        self.stream = stream
+        # ThreadPool to call the backends concurrently (optional).
+        self.executor = executor
+        # ThreadPool to run actions asynchronously (optional).
+        self.jobs = jobs
+        # (identifier, version, mime type, hostname) -> (headers, body) of
+        # rendered entities (optional - see create_render_cache).
+        self.render_cache = render_cache
 
     def handle(self, method, key):
         '''
@@ -100,14 +154,72 @@ class BaseHandler(object):
 
         return status, headers, body
 
+    def get_validators(self, parts, modified=None):
+        '''
+        Returns the ETag (and Last-Modified) headers for a rendering. The
+        ETag is derived from the given parts, the rendering and hostname.
+
+        parts -- Something with a repr which changes whenever the rendering
+                 would change (e.g. entity versions).
+        modified -- Time of the last modification (default: None).
+        '''
+        rendering = self.get_renderer(ACCEPT)
+        tmp = repr((ETAG_EPOCH, rendering.mime_type,
+                    self.registry.get_hostname(), parts))
+        headers = {ETAG: '"' + hashlib.md5(tmp).hexdigest() + '"'}
+        if modified is not None:
+            headers[LAST_MODIFIED] = email.utils.formatdate(modified,
+                                                            usegmt=True)
+        return headers
+
+    def is_not_modified(self, validators):
+        '''
+        Checks the If-None-Match and If-Modified-Since headers of the request
+        against the validators (see get_validators).
+
+        validators -- The ETag and Last-Modified headers.
+        '''
+        if IF_NONE_MATCH in self.headers:
+            for tag in self.headers[IF_NONE_MATCH].split(','):
+                tag = tag.strip()
+                if tag.startswith('W/'):
+                    tag = tag[2:]
+                if tag == '*' or tag == validators[ETAG]:
+                    return True
+            return False
+        if IF_MODIFIED_SINCE in self.headers and LAST_MODIFIED in validators:
+            since = email.utils.parsedate_tz(self.headers[IF_MODIFIED_SINCE])
+            if since is not None:
+                modified = email.utils.parsedate_tz(validators[LAST_MODIFIED])
+                return email.utils.mktime_tz(modified) <= \
+                    email.utils.mktime_tz(since)
+        return False
+
+    def get_body(self, rendering):
+        '''
+        Returns the body in the form the rendering accepts: renderings which
+        set streams_body get it as it is (e.g. an iterable over its lines) -
+        all others get it as string, just as it was sent.
+
+        rendering -- The rendering which will parse the body.
+        '''
+        if rendering.streams_body or isinstance(self.body, basestring):
+            return self.body
+        # the body can only be read once - keep the string.
+        if hasattr(self.body, 'read'):
+            self.body = self.body.read()
+        else:
+            self.body = '\n'.join(self.body)
+        return self.body
+
     def parse_action(self):
         '''
         Retrieves the Action which was given in the request.
         '''
         rendering = self.get_renderer(CONTENT_TYPE)
 
-        action, attr = rendering.to_action(self.headers, self.body,
-            self.extras)
+        action, attr = rendering.to_action(self.headers,
+            self.get_body(rendering), self.extras)
 
         return action, attr
 
@@ -120,16 +232,39 @@ class BaseHandler(object):
         cat = CATEGORY
         if attr not in self.headers:
             # stupid pep8 - have to break in two lines :-/
-            if cat not in self.headers and self.body == '':
+            if cat not in self.headers and not self.body:
                 return [], {}
 
         rendering = self.get_renderer(CONTENT_TYPE)
 
-        categories, attributes = rendering.get_filters(self.headers, self.body,
-            self.extras)
+        categories, attributes = rendering.get_filters(self.headers,
+            self.get_body(rendering), self.extras)
 
         return categories, attributes
 
+    def parse_page(self):
+        '''
+        Retrieves the limit and cursor for pagination from the query string -
+        both are None if not given.
+        '''
+        query = urlparse.parse_qs(self.headers.get(QUERY_STRING, ''))
+        limit = None
+        cursor = None
+        if 'limit' in query:
+            try:
+                limit = int(query['limit'][0])
+            except ValueError:
+                limit = 0
+            if limit < 1:
+                raise AttributeError('The limit needs to be a positive'
+                                     ' integer.')
+        if 'cursor' in query:
+            try:
+                cursor = base64.urlsafe_b64decode(query['cursor'][0])
+            except TypeError:
+                raise AttributeError('Invalid cursor.')
+        return limit, cursor
+
     def parse_entity(self, def_kind=None):
         '''
         Retrieves the entity which was rendered within the request.
@@ -138,17 +273,28 @@ class BaseHandler(object):
         '''
         rendering = self.get_renderer(CONTENT_TYPE)
 
-        entity = rendering.to_entity(self.headers, self.body, def_kind,
-            self.extras)
+        entity = rendering.to_entity(self.headers,
+            self.get_body(rendering), def_kind, self.extras)
         return entity
 
+    def parse_new_entities(self):
+        '''
+        Retrieves the new entities which were rendered within the request -
+        one or several (bulk create).
+        '''
+        rendering = self.get_renderer(CONTENT_TYPE)
+
+        return rendering.to_new_entities(self.headers,
+            self.get_body(rendering), self.extras)
+
     def parse_entities(self):
         '''
         Retrieves a set of entities which was rendered within the request.
         '''
         rendering = self.get_renderer(CONTENT_TYPE)
 
-        entities = rendering.to_entities(self.headers, self.body, self.extras)
+        entities = rendering.to_entities(self.headers,
+            self.get_body(rendering), self.extras)
 
         return entities
 
@@ -158,7 +304,8 @@ class BaseHandler(object):
         '''
         rendering = self.get_renderer(CONTENT_TYPE)
 
-        mixin = rendering.to_mixins(self.headers, self.body, self.extras)
+        mixin = rendering.to_mixins(self.headers,
+            self.get_body(rendering), self.extras)
 
         return mixin
 
@@ -166,23 +313,50 @@ class BaseHandler(object):
         '''
         Renders a single entity to the client.
 
+        The rendering is taken from the render cache (if given) as long as
+        the version of the entity does not change.
+
         entity -- The entity which should be rendered.
         '''
         rendering = self.get_renderer(ACCEPT)
 
-        headers, body = rendering.from_entity(entity)
+        if self.render_cache is None:
+            headers, body = rendering.from_entity(entity)
+            return 200, headers, body
 
-        return 200, headers, body
+        key = (entity.identifier, entity.version, rendering.mime_type,
+               self.registry.get_hostname())
+        result = self.render_cache.get(key)
+        if result is None:
+            result = rendering.from_entity(entity)
+            self.render_cache.put(key, result)
+        headers, body = result
 
-    def render_entities(self, entities, key):
+        # headers get changed later on - never hand out the cached ones.
+        return 200, dict(headers), body
+
+    def render_entities(self, entities, key, next_page=None):
         '''
         Renders a list of entities to the client.
 
         entities -- The entities which should be rendered.
+        key -- The path of the collection.
+        next_page -- Path of the next page if the entities are only one page
+                     of the collection (default: None).
         '''
         rendering = self.get_renderer(ACCEPT)
 
-        headers, body = rendering.from_entities(entities, key)
+        if self.stream:
+            headers, body = rendering.iter_entities(entities, key, next_page)
+        else:
+            headers, body = rendering.from_entities(entities, key, next_page)
+
+        if next_page is not None:
+            tmp = '<' + self.registry.get_hostname() + next_page + \
+                  '>; rel="next"'
+            if LINK in headers:
+                tmp = headers[LINK] + ', ' + tmp
+            headers[LINK] = tmp
 
         return 200, headers, body
 
@@ -199,6 +373,19 @@ class BaseHandler(object):
         return 200, headers, body
 
 
+def _get_next_page(key, limit, last):
+    '''
+    Returns the path of the page which follows the given one.
+
+    key -- The path of the collection.
+    limit -- Maximum number of entities on a page.
+    last -- The last entity of the current page.
+    '''
+    cursor = base64.urlsafe_b64encode(last.identifier)
+    return key + '?' + urllib.urlencode([('limit', limit),
+                                         ('cursor', cursor)])
+
+
 class ResourceHandler(BaseHandler):
     '''
     Handles the request on single resource instances.
@@ -213,9 +400,19 @@ class ResourceHandler(BaseHandler):
         try:
             entity = self.registry.get_resource(key, self.extras)
 
-            workflow.retrieve_entity(entity, self.registry, self.extras)
+            # the backends are asked first - they might change the entity.
+            workflow.retrieve_entity(entity, self.registry, self.extras,
+                                     self.executor)
+
+            validators = self.get_validators((entity.identifier,
+                                              entity.version),
+                                             entity.modified)
+            if self.is_not_modified(validators):
+                return self.response(304, validators, '')
 
-            return self.render_entity(entity)
+            status, headers, body = self.render_entity(entity)
+            headers.update(validators)
+            return status, headers, body
         except KeyError as key_error:
             raise HTTPError(404, 'Resource not found: ' + str(key_error))
 
@@ -231,6 +428,13 @@ class ResourceHandler(BaseHandler):
                 entity = self.registry.get_resource(key, self.extras)
                 action, attr = self.parse_action()
 
+                if self.jobs is not None:
+                    job = submit_action(entity, action, self.registry, attr,
+                                        self.extras, self.jobs)
+                    heads = {'Location': self.registry.get_hostname()
+                                               + job.identifier}
+                    return self.response(202, heads)
+
                 workflow.action_entity(entity, action, self.registry, attr,
                                        self.extras)
 
@@ -275,7 +479,8 @@ class ResourceHandler(BaseHandler):
             try:
                 entity = self.parse_entity()
 
-                workflow.create_entity(key, entity, self.registry, self.extras)
+                workflow.create_entity(key, entity, self.registry, self.extras,
+                                       self.executor)
 
                 heads = {'Location': self.registry.get_hostname()
                                            + entity.identifier}
@@ -293,7 +498,8 @@ class ResourceHandler(BaseHandler):
         try:
             entity = self.registry.get_resource(key, self.extras)
 
-            workflow.delete_entity(entity, self.registry, self.extras)
+            workflow.delete_entity(entity, self.registry, self.extras,
+                                   self.executor)
 
             return self.response(200)
         except AttributeError as attr:
@@ -316,11 +522,41 @@ class CollectionHandler(BaseHandler):
         # retrieve (filter)
         try:
             categories, attributes = self.parse_filter()
-            entities = workflow.get_entities_under_path(key, self.registry,
+            limit, cursor = self.parse_page()
+            # taken before the entities are looked up - a change in between
+            # results in a new ETag next time.
+            revision = self.registry.get_revision()
+            generation = self.registry.get_generation()
+            next_page = None
+            if limit is None:
+                result = workflow.get_filtered_entities(key, categories,
+                                                        attributes,
+                                                        self.registry,
                                                         self.extras)
-            result = workflow.filter_entities(entities, categories, attributes)
-
-            return self.render_entities(result, key)
+            else:
+                result, more = workflow.get_page(key, categories, attributes,
+                                                 self.registry, self.extras,
+                                                 limit, cursor)
+                if more:
+                    next_page = _get_next_page(key, limit, result[-1])
+
+            if revision is None or generation is None:
+                # registry does not keep track of the changes.
+                parts = [(entity.identifier, entity.version)
+                         for entity in result]
+            else:
+                parts = (revision, generation,
+                         repr(self.registry.get_extras(self.extras)),
+                         [str(item) for item in categories],
+                         sorted(attributes.items()), limit, cursor)
+            validators = self.get_validators((key, next_page, parts))
+            if self.is_not_modified(validators):
+                return self.response(304, validators, '')
+
+            status, headers, body = self.render_entities(result, key,
+                                                         next_page)
+            headers.update(validators)
+            return status, headers, body
         except AttributeError as attr:
             raise HTTPError(400, str(attr))
 
@@ -336,30 +572,49 @@ class CollectionHandler(BaseHandler):
                 action, attr = self.parse_action()
                 entities = workflow.get_entities_under_path(key, self.registry,
                                                             self.extras)
-                for entity in entities:
-                    workflow.action_entity(entity, action, self.registry, attr,
-                                           self.extras)
-
-                return self.response(200)
+                results = workflow.action_entities(entities, action,
+                                                   self.registry, attr,
+                                                   self.extras, self.executor)
+
+                # one line per entity - none of the renderings can express
+                # the outcomes, so they are sent as plain text.
+                hostname = self.registry.get_hostname()
+                body = '\n'.join([hostname + entity.identifier + ' ' +
+                                   str(code) + ' ' + message
+                                   for entity, code, message in results])
+                return 207, {CONTENT_TYPE: 'text/plain'}, body
             except AttributeError as attr:
                 raise HTTPError(400, str(attr))
-        elif not len(self.parse_entities()):
-            # create resource (&links)
-            try:
-                entity = self.parse_entity()
-                workflow.create_entity(workflow.create_id(entity.kind),
-                                       entity, self.registry, self.extras)
 
-                heads = {'Location': self.registry.get_hostname()
-                                           + entity.identifier}
-                return self.response(201, heads)
+        new_entities = self.parse_entities()
+        if not len(new_entities):
+            # create resource(s) (&links)
+            try:
+                entities = self.parse_new_entities()
+                if len(entities) == 1:
+                    entity = entities[0]
+                    workflow.create_entity(workflow.create_id(entity.kind),
+                                           entity, self.registry, self.extras,
+                                           self.executor)
+
+                    heads = {'Location': self.registry.get_hostname()
+                                               + entity.identifier}
+                    return self.response(201, heads)
+                elif not len(entities):
+                    raise AttributeError('No entities given.')
+
+                # bulk create - answered with the locations of all of them.
+                workflow.create_entities(entities, self.registry, self.extras,
+                                         self.executor)
+                rendering = self.get_renderer(ACCEPT)
+                heads, body = rendering.from_entities(entities, key)
+                return 201, heads, body
             except AttributeError as attr:
                 raise HTTPError(400, str(attr))
-        elif len(self.parse_entities()) > 0:
+        else:
             # update
             try:
                 mixin = self.registry.get_category(key, self.extras)
-                new_entities = self.parse_entities()
                 old_entities = workflow.get_entities_under_path(key,
                                                                 self.registry,
                                                                 self.extras)
@@ -396,19 +651,19 @@ class CollectionHandler(BaseHandler):
 
         key -- The resource id.
         '''
-        if not len(self.parse_entities()):
+        entities = self.parse_entities()
+        if not len(entities):
             # delete entities
             entities = workflow.get_entities_under_path(key, self.registry,
                                                         self.extras)
-            for entity in entities:
-                workflow.delete_entity(entity, self.registry, self.extras)
+            workflow.delete_entities(entities, self.registry, self.extras,
+                                     self.executor)
 
             return self.response(200)
-        elif len(self.parse_entities()) > 0:
+        else:
             # remove from collection
             try:
                 mixin = self.registry.get_category(key, self.extras)
-                entities = self.parse_entities()
                 workflow.delete_from_collection(mixin, entities, self.registry,
                                                 self.extras)
 
@@ -439,7 +694,20 @@ class QueryHandler(BaseHandler):
             result = workflow.filter_categories(categories, self.registry,
                                                 self.extras)
 
-            return self.render_categories(result)
+            generation = self.registry.get_generation()
+            if generation is None:
+                # registry does not keep track of changes to the categories.
+                return self.render_categories(result)
+
+            owner = self.registry.get_extras(self.extras)
+            validators = self.get_validators((generation, repr(owner),
+                                              [str(item) for item in result]))
+            if self.is_not_modified(validators):
+                return self.response(304, validators, '')
+
+            status, headers, body = self.render_categories(result)
+            headers.update(validators)
+            return status, headers, body
         except AttributeError as attr:
             raise HTTPError(400, str(attr))
 
@@ -0,0 +1,204 @@
+# coding=utf-8
+#
+# Copyright (C) 2010-2012 Platform Computing
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+'''
+Asynchronous actions - the action is done by a worker thread while the
+client polls a job resource.
+
+Created on Oct 17, 2026
+'''
+
+from occi import workflow
+from occi.backend import KindBackend
+from occi.core_model import Kind, Resource
+import collections
+import logging
+import threading
+import time
+import uuid
+
+JOB_ATTRIBUTES = {'ssf.job.action': 'immutable',
+                  'ssf.job.entity': 'immutable',
+                  'ssf.job.state': 'immutable',
+                  'ssf.job.result': 'immutable'}
+
+JOB = Kind('http://pyssf.sourceforge.net/occi#',
+           'job',
+           [Resource.kind],
+           None,
+           'Job of an asynchronous action',
+           JOB_ATTRIBUTES,
+           '/-/jobs/')
+
+# states of a job.
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+# finished jobs are kept for at most this many seconds...
+JOB_TTL = 3600
+# ...and only this many of them.
+MAX_FINISHED_JOBS = 1000
+
+
+class JobBackend(KindBackend):
+    '''
+    Backend for the jobs - they can be polled and deleted once they are
+    finished but are only ever created and changed by submit_action and the
+    worker which runs the action.
+
+    Finished jobs are removed once they are older than ttl seconds or when
+    more than max_finished of them are around - whatever comes first.
+    Queued and running jobs are always kept.
+    '''
+
+    def __init__(self, max_finished=MAX_FINISHED_JOBS, ttl=JOB_TTL):
+        '''
+        Constructor.
+
+        max_finished -- Number of finished jobs which are kept.
+        ttl -- Number of seconds a finished job is kept.
+        '''
+        self.max_finished = max_finished
+        self.ttl = ttl
+        # (time it finished, job, extras) - oldest first.
+        self.finished = collections.deque()
+        self.lock = threading.Lock()
+
+    def finish(self, job, extras):
+        '''
+        Remember that a job is finished so it can expire.
+
+        job -- The job resource.
+        extras -- Any extra arguments which are defined by the user.
+        '''
+        with self.lock:
+            self.finished.append((time.time(), job, extras))
+
+    def expire(self, registry):
+        '''
+        Remove the finished jobs which are beyond the retention limits.
+
+        registry -- The registry used for this process.
+        '''
+        expired = []
+        with self.lock:
+            deadline = time.time() - self.ttl
+            while len(self.finished) and \
+                    (len(self.finished) > self.max_finished or
+                     self.finished[0][0] < deadline):
+                expired.append(self.finished.popleft())
+
+        for _, job, extras in expired:
+            try:
+                registry.get_resource(job.identifier, extras)
+            except KeyError:
+                # already deleted by the client.
+                continue
+            workflow.delete_entity(job, registry, extras)
+
+    def create(self, entity, extras):
+        raise AttributeError('Jobs are only created by asynchronous'
+                             ' actions.')
+
+    def delete(self, entity, extras):
+        if entity.attributes.get('ssf.job.state') in (QUEUED, RUNNING):
+            raise AttributeError('Unfinished jobs cannot be deleted.')
+
+    def update(self, old, new, extras):
+        raise AttributeError('Jobs cannot be updated.')
+
+    def replace(self, old, new, extras):
+        raise AttributeError('Jobs cannot be replaced.')
+
+
+def submit_action(entity, action, registry, attributes, extras, executor):
+    '''
+    Queue an action on an entity and return the job resource which tracks
+    it. The job is registered with the registry so clients can poll it -
+    until it expires (see JobBackend).
+
+    entity -- The entity on which to perform the operation.
+    action -- The action definition.
+    registry -- The registry used for this process.
+    attributes -- The attributes for the operation.
+    extras -- Any extra arguments which are defined by the user.
+    executor -- The ThreadPool which runs the action.
+    '''
+    job = Resource(JOB.location + str(uuid.uuid4()), JOB, [])
+    job.attributes = {'ssf.job.action': str(action),
+                      'ssf.job.entity': entity.identifier,
+                      'ssf.job.state': QUEUED,
+                      'ssf.job.result': ''}
+    # not through the workflow - the backend refuses to create jobs.
+    with registry.transaction(extras):
+        workflow.touch(job)
+        registry.add_resource(job.identifier, job, extras)
+    registry.get_backend(JOB, extras).expire(registry)
+
+    # the hostname is kept per thread - the worker needs the request's one.
+    executor.submit(_run, job, entity, action, registry, attributes, extras,
+                    registry.get_hostname())
+    return job
+
+
+def _run(job, entity, action, registry, attributes, extras, hostname):
+    '''
+    Performs the action and records the outcome in the job.
+
+    job -- The job resource.
+    entity -- The entity on which to perform the operation.
+    action -- The action definition.
+    registry -- The registry used for this process.
+    attributes -- The attributes for the operation.
+    extras -- Any extra arguments which are defined by the user.
+    hostname -- The hostname of the service as seen by the request.
+    '''
+    registry.set_hostname(hostname)
+    _update(job, registry, extras, RUNNING)
+    try:
+        workflow.action_entity(entity, action, registry, attributes, extras)
+    # catching everything - the client needs to know what happened.
+    # pylint: disable=W0703
+    except Exception as err:
+        logging.error('Job ' + job.identifier + ' failed: ' + str(err))
+        _update(job, registry, extras, FAILED, str(err))
+    else:
+        _update(job, registry, extras, DONE, 'OK')
+
+    backend = registry.get_backend(JOB, extras)
+    backend.finish(job, extras)
+    backend.expire(registry)
+
+
+def _update(job, registry, extras, state, result=None):
+    '''
+    Change the state of a job.
+
+    job -- The job resource.
+    registry -- The registry used for this process.
+    extras -- Any extra arguments which are defined by the user.
+    state -- The new state.
+    result -- The result of the action (optional).
+    '''
+    job.attributes['ssf.job.state'] = state
+    if result is not None:
+        job.attributes['ssf.job.result'] = result
+    workflow.touch(job)
+    registry.update_resource(job.identifier, job, extras)
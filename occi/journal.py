@@ -0,0 +1,527 @@
+# coding=utf-8
+#
+# Copyright (C) 2010-2012 Platform Computing
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+'''
+Write-ahead log and snapshots which make the in-memory registry durable.
+
+Created on Oct 17, 2026
+'''
+
+from occi.backend import UserDefinedMixinBackend
+from occi.core_model import Action, Category, Entity, Kind, Link, Mixin, \
+    Resource
+import cPickle as pickle
+import logging
+import os
+import threading
+import time
+import uuid
+
+LOG_FILE = 'journal.log'
+# the log is moved here while a snapshot is written.
+OLD_LOG_FILE = 'journal.log.old'
+SNAPSHOT_FILE = 'journal.snapshot'
+
+CATEGORY_TYPES = {'kind': Kind, 'mixin': Mixin, 'action': Action}
+
+
+class Journal(object):
+    '''
+    Append-only log of the changes made to a NonePersistentRegistry.
+
+    Records are flushed on every write but only fsync'ed once group_size
+    records are pending or group_interval seconds passed since the last sync
+    (group commit) - and at the end of every transaction. A timer syncs the
+    records which are left when the service gets idle.
+
+    Once snapshot_every records are in the log the timer writes a compacted
+    snapshot: the log is moved aside (OLD_LOG_FILE) and a new one is
+    started; the snapshot is then written without holding any lock and the
+    old log is removed. The new log starts with a checkpoint record whose
+    token is stored in the snapshot - so on restore it is known whether the
+    snapshot already covers the old log.
+
+    Pass it on to the registry's constructor - it will load the latest
+    snapshot and replay the log tail before it starts to log.
+
+    Records only hold complete states so replaying one which is already part
+    of the snapshot does no harm.
+
+    Entities only hold references to their kind, mixins and actions. As the
+    registry is restored before the application registers its categories,
+    the restored entities get stand-ins which are replaced by the registered
+    categories once they are set (see resolve).
+    '''
+
+    def __init__(self, directory, group_size=64, group_interval=0.05,
+                 snapshot_every=100000):
+        '''
+        Constructor.
+
+        directory -- Directory which holds the log and snapshot files.
+        group_size -- Number of records after which the log is fsync'ed.
+        group_interval -- Seconds after which pending records are fsync'ed.
+        snapshot_every -- Number of records after which a snapshot is taken.
+        '''
+        self.directory = directory
+        self.group_size = group_size
+        self.group_interval = group_interval
+        self.snapshot_every = snapshot_every
+
+        self.lock = threading.RLock()
+        self.registry = None
+        self.log = None
+        self.depth = 0
+        self.pending = 0
+        self.records = 0
+        self.last_sync = time.time()
+        self.timer = None
+        self.wakeup = threading.Event()
+        self.snapshotting = False
+        # (scheme, term, class, owner) -> (stand-in, entities using it)
+        self.unresolved = {}
+
+    def restore(self, registry):
+        '''
+        Load the snapshot and replay the log into the given registry.
+        Afterwards the journal is opened for appending.
+
+        registry -- The registry (without a journal attached yet).
+        '''
+        self.registry = registry
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+        mixins = {}
+        states = {}
+        token = None
+        snapshot = os.path.join(self.directory, SNAPSHOT_FILE)
+        if os.path.exists(snapshot):
+            with open(snapshot, 'rb') as tmp:
+                mixins, states, token = pickle.load(tmp)
+
+        path = os.path.join(self.directory, LOG_FILE)
+        old_path = os.path.join(self.directory, OLD_LOG_FILE)
+        records, valid = _read_log(path)
+        if os.path.exists(old_path):
+            if not records or records[0] != ('checkpoint', token):
+                # the snapshot was not written - old log is still needed.
+                records = _read_log(old_path)[0] + records
+        for record in records:
+            self.records += 1
+            _apply(record, mixins, states)
+
+        for mixin in mixins.values():
+            mixin.related = [self._get_category(item, mixin)
+                             for item in mixin.related]
+            registry.set_backend(mixin, UserDefinedMixinBackend(), None)
+            self.resolve(mixin)
+        entities = _build_entities(states, self._get_category)
+        # in key order - keeps the insertion into the sorted indexes cheap;
+        # in one transaction so a copy-on-write registry copies once.
+        with registry.transaction(None):
+            for key in sorted(entities):
+                registry.add_resource(key, entities[key], None)
+
+        self.log = open(path, 'ab')
+        self.log.truncate(valid)
+        if os.path.exists(old_path):
+            # no one else is using the registry yet.
+            self.snapshot()
+
+        self.timer = threading.Thread(target=self._run)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def resolve(self, category):
+        '''
+        Replace the stand-ins for a category which just got registered in the
+        restored entities and user-defined mixins.
+
+        category -- The registered category.
+        '''
+        with self.lock:
+            stand_in, users = self.unresolved.pop(_category_ref(category),
+                                                  (None, []))
+        for user in users:
+            if isinstance(user, Category):
+                user.related = [category if item is stand_in else item
+                                for item in user.related]
+                continue
+            if user.kind is stand_in:
+                user.kind = category
+            user.mixins = [category if item is stand_in else item
+                           for item in user.mixins]
+            user.actions = [category if item is stand_in else item
+                            for item in user.actions]
+
+    def _get_category(self, ref, user):
+        '''
+        Return the registered category for a reference - or a stand-in which
+        is replaced once the category gets registered (see resolve).
+
+        ref -- The reference (see _category_ref).
+        user -- The entity (or mixin) which uses the category.
+        '''
+        if isinstance(ref, Category):
+            # states written before references were used.
+            ref = _category_ref(ref)
+        category = self.registry.get_category_by_name(ref[0], ref[1], ref[3])
+        if category is not None and repr(category) == ref[2]:
+            return category
+
+        with self.lock:
+            if ref not in self.unresolved:
+                stand_in = CATEGORY_TYPES.get(ref[2], Kind)(ref[0], ref[1])
+                stand_in.extras = ref[3]
+                self.unresolved[ref] = (stand_in, [])
+            self.unresolved[ref][1].append(user)
+            return self.unresolved[ref][0]
+
+    def append(self, record):
+        '''
+        Add a record to the log.
+
+        record -- Tuple describing the change.
+        '''
+        with self.lock:
+            pickle.dump(record, self.log, pickle.HIGHEST_PROTOCOL)
+            self.pending += 1
+            self.records += 1
+            if self.depth == 0:
+                self.commit()
+
+    def log_resource(self, key, entity):
+        '''
+        Log that a resource got added or changed.
+
+        key -- Unique identifier of the resource.
+        entity -- The entity.
+        '''
+        self.append(('resource', key, _get_state(entity)))
+
+    def log_delete_resource(self, key):
+        '''
+        Log that a resource got removed.
+
+        key -- Unique identifier of the resource.
+        '''
+        self.append(('delete_resource', key))
+
+    def log_mixin(self, mixin):
+        '''
+        Log that a user-defined mixin got added.
+
+        mixin -- The mixin.
+        '''
+        self.append(('mixin', mixin))
+
+    def log_delete_mixin(self, mixin):
+        '''
+        Log that a user-defined mixin got removed.
+
+        mixin -- The mixin.
+        '''
+        self.append(('delete_mixin', mixin))
+
+    def begin(self):
+        '''
+        Start a transaction - records are synced when the outermost one ends.
+        '''
+        with self.lock:
+            self.depth += 1
+
+    def end(self):
+        '''
+        End a transaction.
+        '''
+        with self.lock:
+            self.depth -= 1
+            if self.depth == 0:
+                self.commit(True)
+
+    def commit(self, force=False):
+        '''
+        Make the pending records durable if the group is full or the
+        interval passed. Wakes the timer to take a snapshot if the log got
+        too long.
+
+        force -- Sync even if the group is not full yet.
+        '''
+        with self.lock:
+            if not self.pending or self.log is None:
+                return
+            self.log.flush()
+            now = time.time()
+            if force or self.pending >= self.group_size or \
+                    now - self.last_sync >= self.group_interval:
+                os.fsync(self.log.fileno())
+                self.pending = 0
+                self.last_sync = now
+            if self.records >= self.snapshot_every:
+                # snapshots are taken by the timer - callers might hold the
+                # lock of the registry.
+                self.wakeup.set()
+
+    def snapshot(self):
+        '''
+        Write a compacted snapshot of the registry and remove the log
+        records it covers. The journal and the registry are only locked while
+        the log is moved aside - not while the snapshot is written.
+        '''
+        # writers change the registry before they log - holding the
+        # registry keeps both in line while the log is moved aside. The
+        # copies are cheap (see SnapshotRegistry) and are not changed later.
+        with self.registry.locked() as view:
+            with self.lock:
+                if self.snapshotting or self.log is None:
+                    return
+                self.snapshotting = True
+                backends = dict(view.backends)
+                resources = view.resources.copy()
+                token = self._rotate()
+
+        try:
+            mixins = {}
+            for category, backend in backends.items():
+                if isinstance(backend, UserDefinedMixinBackend):
+                    mixins[category] = category
+            states = {}
+            for key, entity in resources.iteritems():
+                states[key] = _get_state(entity)
+
+            path = os.path.join(self.directory, SNAPSHOT_FILE)
+            with open(path + '.tmp', 'wb') as tmp:
+                pickle.dump((mixins, states, token), tmp,
+                            pickle.HIGHEST_PROTOCOL)
+                tmp.flush()
+                os.fsync(tmp.fileno())
+            os.rename(path + '.tmp', path)
+            os.remove(os.path.join(self.directory, OLD_LOG_FILE))
+        finally:
+            self.snapshotting = False
+
+    def _rotate(self):
+        '''
+        Move the log aside and start a new one with a checkpoint record.
+        Returns the token of the checkpoint. Call with the lock held.
+        '''
+        path = os.path.join(self.directory, LOG_FILE)
+        old_path = os.path.join(self.directory, OLD_LOG_FILE)
+        self.log.flush()
+        os.fsync(self.log.fileno())
+        self.log.close()
+        if os.path.exists(old_path):
+            # the last snapshot failed - keep the records of both logs.
+            with open(old_path, 'ab') as old:
+                with open(path, 'rb') as tmp:
+                    old.write(tmp.read())
+                old.flush()
+                os.fsync(old.fileno())
+            os.remove(path)
+        else:
+            os.rename(path, old_path)
+
+        token = uuid.uuid4().hex
+        self.log = open(path, 'ab')
+        pickle.dump(('checkpoint', token), self.log, pickle.HIGHEST_PROTOCOL)
+        self.log.flush()
+        os.fsync(self.log.fileno())
+        self.pending = 0
+        self.records = 0
+        self.last_sync = time.time()
+        return token
+
+    def _run(self):
+        '''
+        Loop of the timer - syncs pending records every group_interval and
+        takes the snapshots.
+        '''
+        while self.log is not None:
+            self.wakeup.wait(self.group_interval)
+            self.wakeup.clear()
+            try:
+                self.commit(True)
+                if self.records >= self.snapshot_every:
+                    self.snapshot()
+            # keep the timer alive - the next round will try again.
+            # pylint: disable=W0703
+            except Exception as err:
+                logging.error('Journal maintenance failed: ' + str(err))
+
+    def close(self):
+        '''
+        Sync all pending records and close the log.
+        '''
+        with self.lock:
+            if self.log is None:
+                return
+            self.commit(True)
+            self.log.close()
+            self.log = None
+        self.wakeup.set()
+        if self.timer is not None and \
+                self.timer is not threading.current_thread():
+            self.timer.join()
+
+
+def _get_state(entity):
+    '''
+    Returns the state of an entity - references to other entities are
+    replaced by their identifiers.
+
+    entity -- The entity.
+    '''
+    # copies - the entity might change while the state gets pickled.
+    state = {'title': entity.title,
+             'kind': _category_ref(entity.kind),
+             'mixins': [_category_ref(item) for item in entity.mixins],
+             'attributes': dict(entity.attributes),
+             'actions': [_category_ref(item) for item in entity.actions],
+             'extras': entity.extras}
+    if isinstance(entity, Link):
+        state['type'] = 'link'
+        state['source'] = entity.source.identifier
+        state['target'] = entity.target.identifier
+    elif isinstance(entity, Resource):
+        state['type'] = 'resource'
+        state['summary'] = entity.summary
+        state['links'] = [link.identifier for link in entity.links]
+    else:
+        state['type'] = 'entity'
+    return state
+
+
+def _category_ref(category):
+    '''
+    Returns a tuple which can be stored and later be turned into the
+    registered category again.
+
+    category -- The category.
+    '''
+    if category is None:
+        return None
+    return (category.scheme, category.term, repr(category), category.extras)
+
+
+def _apply(record, mixins, states):
+    '''
+    Apply a log record to the state loaded so far.
+
+    record -- The log record.
+    mixins -- Dictionary of user-defined mixins.
+    states -- Dictionary of entity states by key.
+    '''
+    if record[0] == 'resource':
+        states[record[1]] = record[2]
+    elif record[0] == 'delete_resource':
+        states.pop(record[1], None)
+    elif record[0] == 'mixin':
+        mixins[record[1]] = record[1]
+    elif record[0] == 'delete_mixin':
+        mixins.pop(record[1], None)
+
+
+def _read_log(path):
+    '''
+    Read the records of a log. Returns the records and the offset up to
+    which the log is valid - a torn write at the end is ignored.
+
+    path -- Path of the log file.
+    '''
+    records = []
+    valid = 0
+    if not os.path.exists(path):
+        return records, valid
+    with open(path, 'rb') as tmp:
+        unpickler = pickle.Unpickler(tmp)
+        while True:
+            try:
+                record = unpickler.load()
+            except EOFError:
+                break
+            except (pickle.UnpicklingError, ValueError, IndexError,
+                    AttributeError, KeyError):
+                # torn write at the end of the log.
+                logging.warn('Ignoring incomplete journal record.')
+                break
+            valid = tmp.tell()
+            records.append(record)
+    return records, valid
+
+
+def _build_entities(states, get_category):
+    '''
+    Turn the entity states into entities and restore the references between
+    resources and links.
+
+    states -- Dictionary of entity states by key.
+    get_category -- Function which turns a category reference and the entity
+                    using it into a category (see Journal._get_category).
+    '''
+    entities = {}
+    for key, state in states.iteritems():
+        if state['type'] == 'link':
+            entity = Link(key, None, [], None, None, state['title'])
+        elif state['type'] == 'resource':
+            entity = Resource(key, None, [], [], state['summary'],
+                              state['title'])
+        else:
+            entity = Entity(key, state['title'], None, [])
+        if state['kind'] is not None:
+            entity.kind = get_category(state['kind'], entity)
+        entity.mixins = [get_category(item, entity)
+                         for item in state['mixins']]
+        entity.attributes = state['attributes']
+        entity.actions = [get_category(item, entity)
+                          for item in state['actions']]
+        entity.extras = state['extras']
+        entities[key] = entity
+
+    # links created on their own are only logged with their source
+    # identifier - the state of the source does not know about them.
+    sources = {}
+    for key in sorted(states):
+        if states[key]['type'] == 'link':
+            sources.setdefault(states[key]['source'], []).append(key)
+
+    for key, state in states.iteritems():
+        if state['type'] == 'link':
+            entities[key].source = _get_reference(entities, state['source'])
+            entities[key].target = _get_reference(entities, state['target'])
+        elif state['type'] == 'resource':
+            items = [item for item in state['links'] if item in entities]
+            known = set(items)
+            items.extend([item for item in sources.get(key, [])
+                          if item not in known])
+            entities[key].links = [entities[item] for item in items]
+    return entities
+
+
+def _get_reference(entities, key):
+    '''
+    Return the source or target of a link. If it no longer exists a bare
+    resource with only the identifier set is returned.
+
+    entities -- Dictionary of the restored entities.
+    key -- Unique identifier of the entity.
+    '''
+    try:
+        return entities[key]
+    except KeyError:
+        return Resource(key, Resource.kind, [])
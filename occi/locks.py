@@ -0,0 +1,90 @@
+# coding=utf-8
+#
+# Copyright (C) 2010-2012 Platform Computing
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+'''
+Locks used to make the registry safe for multi-threaded servers.
+
+Created on Oct 17, 2026
+'''
+
+import contextlib
+import threading
+
+
+class ReadWriteLock(object):
+    '''
+    Lock which allows many concurrent readers or a single writer. Waiting
+    writers are preferred so they do not starve.
+
+    The writer can acquire the lock again (for reading and writing); readers
+    must neither acquire it again nor try to upgrade to a write lock.
+    '''
+
+    def __init__(self):
+        self.cond = threading.Condition(threading.Lock())
+        self.readers = 0
+        self.writer = None
+        self.depth = 0
+        self.waiting = 0
+
+    @contextlib.contextmanager
+    def read(self):
+        '''
+        Context manager which holds the lock shared.
+        '''
+        me = threading.current_thread()
+        with self.cond:
+            if self.writer is me:
+                self.depth += 1
+            else:
+                while self.writer is not None or self.waiting:
+                    self.cond.wait()
+                self.readers += 1
+        try:
+            yield
+        finally:
+            with self.cond:
+                if self.writer is me:
+                    self.depth -= 1
+                else:
+                    self.readers -= 1
+                    if not self.readers:
+                        self.cond.notify_all()
+
+    @contextlib.contextmanager
+    def write(self):
+        '''
+        Context manager which holds the lock exclusively.
+        '''
+        me = threading.current_thread()
+        with self.cond:
+            if self.writer is not me:
+                self.waiting += 1
+                while self.writer is not None or self.readers:
+                    self.cond.wait()
+                self.waiting -= 1
+                self.writer = me
+            self.depth += 1
+        try:
+            yield
+        finally:
+            with self.cond:
+                self.depth -= 1
+                if not self.depth:
+                    self.writer = None
+                    self.cond.notify_all()
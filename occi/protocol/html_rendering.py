@@ -27,10 +27,9 @@ Created on Jul 15, 2011
 # disabling 'Method is abstract' pylint check (HTML only support simple ops!)
 # pylint: disable=W0223
 
-from occi.core_model import Category
 from occi.core_model import Resource, Link
 from occi.handlers import QUERY_STRING
-from occi.protocol.rendering import Rendering
+from occi.protocol.rendering import Rendering, chunked
 
 
 class HTMLRendering(Rendering):
@@ -39,6 +38,7 @@ class HTMLRendering(Rendering):
     '''
 
     mime_type = 'text/html'
+    streams_body = True
 
     css = "body { \
             font-family: sans-serif; \
@@ -214,7 +214,22 @@ class HTMLRendering(Rendering):
             tmp += '\t\t\t<h2>Title</h2><p>' + str(entity.title) + '</p>\n'
         return tmp
 
-    def from_entities(self, entities, key):
+    def from_entities(self, entities, key, next_page=None):
+        headers, body = self.iter_entities(entities, key, next_page)
+        return headers, ''.join(body)
+
+    def iter_entities(self, entities, key, next_page=None):
+        return {'Content-Type': self.mime_type}, chunked(self._iter_listing(
+            entities, key, next_page))
+
+    def _iter_listing(self, entities, key, next_page):
+        '''
+        Generator for the HTML listing of a collection.
+
+        entities -- The entities which will be rendered.
+        key -- The path of the collection.
+        next_page -- Path of the next page (or None).
+        '''
         tmp = '<html>\n\t<head>\n'
         tmp += '\t\t<title>Resource listing: ' + key + '</title>\n'
         tmp += '\t\t<style type="text/css"><!-- ' + self.css + ' --></style>\n'
@@ -237,12 +252,17 @@ class HTMLRendering(Rendering):
         tmp += '\t\t<div id="entity"><ul>\n'
         if not len(entities):
             tmp += '\t\t\t<li>No resources found</li>\n'
+        yield tmp
         for item in entities:
-            tmp += '\t\t\t<li><a href="' + item.identifier + '">'
-            tmp += item.identifier + '</a></li>\n'
-        tmp += '\t\t</ul></div>\n'
+            yield '\t\t\t<li><a href="' + item.identifier + '">' + \
+                item.identifier + '</a></li>\n'
+        tmp = '\t\t</ul>\n'
+        if next_page is not None:
+            tmp += '\t\t<p><a href="' + next_page.replace('&', '&amp;')
+            tmp += '">Next page</a></p>\n'
+        tmp += '\t\t</div>\n'
         tmp += '\t</body>\n</html>'
-        return {'Content-Type': self.mime_type}, tmp
+        yield tmp
 
     def from_categories(self, categories):
         tmp = '<html>\n\t<head>\n'
@@ -318,12 +338,7 @@ class HTMLRendering(Rendering):
         else:
             raise AttributeError('Unable to find the term. Broken request?.')
 
-        tmp = Category(scheme + '#', term, '', {}, '')
-        cats = self.registry.get_categories(extras)
-        if tmp in cats:
-            for item in self.registry.get_categories(extras):
-                if tmp == item:
-                    del tmp
-                    return item, {}
-        else:
+        action = self.registry.find_category(scheme + '#', term, extras)
+        if action is None:
             raise AttributeError('Action is not defined. Check the QI.')
+        return action, {}
@@ -28,12 +28,12 @@ Created on 01.02.2012
 # L8R: check if this can be move partly to occi_rendering (once standardized)
 # and rename to a parser class.
 
-# disabling 'Method is abstract' pylint check (currently only support GETs!)
+# disabling 'Method is abstract' pylint check (only entities can be parsed!)
 # pylint: disable=W0223
 
-from occi.core_model import Resource
+from occi.core_model import Resource, Link
 from occi.handlers import CONTENT_TYPE
-from occi.protocol.rendering import Rendering
+from occi.protocol.rendering import Rendering, chunked
 import json
 
 
@@ -110,6 +110,146 @@ def _from_entity(entity):
     return data
 
 
+def _iter_entities(entities):
+    '''
+    Generator for a JSON array of entities - one entity is dumped at a time
+    but the result is the same as dumping the whole list.
+    '''
+    if not len(entities):
+        yield '[]'
+        return
+    yield '['
+    separator = '\n  '
+    for item in entities:
+        tmp = json.dumps(_from_entity(item), sort_keys=True, indent=2)
+        yield separator + tmp.replace('\n', '\n  ')
+        separator = ', \n  '
+    yield '\n]'
+
+
+def _load(body):
+    '''
+    Parse the JSON body of a request. The body is parsed as a whole.
+
+    body -- The HTTP body.
+    '''
+    data = None
+    if body.strip():
+        try:
+            data = json.loads(body)
+        except ValueError as err:
+            raise AttributeError('Unable to parse the JSON body: ' + str(err))
+    return data
+
+
+def _get_path(location, registry):
+    '''
+    Strip the hostname from a location.
+
+    location -- The location.
+    registry -- The registry used for this call.
+    '''
+    if not location.find(registry.get_hostname()):
+        location = location.replace(registry.get_hostname(), '')
+    return location
+
+
+def _get_resource(location, registry, extras):
+    '''
+    Return the resource of a location.
+
+    location -- The location.
+    registry -- The registry used for this call.
+    extras -- Passed on extra object.
+    '''
+    try:
+        return registry.get_resource(_get_path(location, registry), extras)
+    except KeyError:
+        raise AttributeError('Could not find the resource with id: '
+                             + location)
+
+
+def _to_category(data, registry, extras):
+    '''
+    Return the registered category for a JSON struct of a category.
+
+    data -- The JSON struct with scheme and term.
+    registry -- The registry used for this call.
+    extras -- Passed on extra object.
+    '''
+    try:
+        scheme, term = data['scheme'], data['term']
+    except (KeyError, TypeError):
+        raise AttributeError('Categories need a scheme and a term.')
+    category = registry.find_category(scheme, term, extras)
+    if category is None:
+        raise AttributeError('The following category is not registered within'
+                             + ' this service (See Query interfaces): '
+                             + _to_str(scheme) + _to_str(term))
+    return category
+
+
+def _to_str(value):
+    '''
+    Turn a JSON value into a string as the other renderings provide them -
+    text is encoded as UTF-8.
+
+    value -- The JSON value.
+    '''
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    if isinstance(value, (dict, list)):
+        raise AttributeError('Only strings, numbers and booleans are supported'
+                             ' as values: ' + json.dumps(value))
+    return str(value)
+
+
+def _to_entity(data, registry, extras, def_kind=None, source=None):
+    '''
+    Create an entity from a JSON struct as rendered by _from_entity.
+
+    data -- The JSON struct of the entity.
+    registry -- The registry used for this call.
+    extras -- Passed on extra object.
+    def_kind -- A given kind definition.
+    source -- The source resource if it is an inline link.
+    '''
+    if not isinstance(data, dict):
+        raise AttributeError('Entities need to be JSON objects.')
+    kind = def_kind
+    if kind is None:
+        kind = _to_category(data.get('kind'), registry, extras)
+    if repr(kind) != 'kind':
+        raise AttributeError('Could not find a valid kind.')
+    mixins = [_to_category(item, registry, extras)
+              for item in data.get('mixins', [])]
+    attributes = {}
+    for name, value in data.get('attributes', {}).items():
+        attributes[_to_str(name)] = _to_str(value)
+
+    if Resource.kind in kind.related and source is None:
+        entity = Resource(None, kind, mixins, [])
+        for item in data.get('links', []):
+            entity.links.append(_to_entity(item, registry, extras,
+                                           source=entity))
+    elif Link.kind in kind.related:
+        if source is None:
+            source = _get_resource(data.get('source') or
+                                   attributes.get('occi.core.source', ''),
+                                   registry, extras)
+        # FUTURE_IMPROVEMENT: string links
+        target = _get_resource(data.get('target') or
+                               attributes.get('occi.core.target', ''),
+                               registry, extras)
+        entity = Link(None, kind, mixins, source, target)
+    else:
+        raise AttributeError('This kind seems not to be related to either'
+                             + ' resource or link.')
+
+    entity.attributes = attributes
+    return entity
+
+
 class JsonRendering(Rendering):
     '''
     This is a rendering which will use the HTTP header to place the information
@@ -118,19 +258,39 @@ class JsonRendering(Rendering):
 
     mime_type = 'application/occi+json'
 
+    def to_entity(self, headers, body, def_kind, extras):
+        data = _load(body)
+        if isinstance(data, list) and len(data) == 1:
+            data = data[0]
+        return _to_entity(data, self.registry, extras, def_kind)
+
+    def to_new_entities(self, headers, body, extras):
+        data = _load(body)
+        if not isinstance(data, list):
+            data = [data]
+        return [_to_entity(item, self.registry, extras) for item in data]
+
+    def to_entities(self, headers, body, extras):
+        # a JSON array of locations - anything else holds new entities.
+        data = _load(body)
+        if not isinstance(data, list) or \
+                not all([isinstance(item, basestring) for item in data]):
+            return []
+        return [_get_resource(item, self.registry, extras) for item in data]
+
     def from_entity(self, entity):
         data = _from_entity(entity)
 
         body = json.dumps(data, sort_keys=True, indent=2)
         return {CONTENT_TYPE: self.mime_type}, body
 
-    def from_entities(self, entities, key):
-        data = []
-        for item in entities:
-            data.append(_from_entity(item))
+    def from_entities(self, entities, key, next_page=None):
+        headers, body = self.iter_entities(entities, key, next_page)
+        return headers, ''.join(body)
 
-        body = json.dumps(data, sort_keys=True, indent=2)
-        return {CONTENT_TYPE: self.mime_type}, body
+    def iter_entities(self, entities, key, next_page=None):
+        return {CONTENT_TYPE: self.mime_type}, chunked(_iter_entities(
+            entities))
 
     def from_categories(self, categories):
         data = []
@@ -28,7 +28,7 @@ Created on Jun 28, 2011
 # disabling 'Too many branches' pylint check (text renderings :-()
 # pylint: disable=R0914,R0912
 
-from occi.core_model import Category, Link, Mixin, Kind
+from occi.core_model import Link, Mixin, Kind
 
 #==============================================================================
 # Following are text/occi and text/plain related parsing functions.
@@ -39,7 +39,9 @@ def get_category(category_string, registry, extras, is_mixin=False):
     '''
     Create a Category from a string rendering.
 
-    If found it will return the object from the registry.
+    If found it will return the object from the registry. The result is
+    cached in the category cache of the registry until categories get added
+    or removed.
 
     If is_mixin is set to true it will not match with the registry and just
     return a Mixin.
@@ -49,52 +51,98 @@ def get_category(category_string, registry, extras, is_mixin=False):
     extras -- The passed on extras argument
     is_mixin -- Mixin will be created and no matching will be done.
     '''
-    categories = registry.get_categories(extras)
+    if not is_mixin:
+        key = _get_cache_key(category_string, registry, extras)
+        category = None
+        if key is not None:
+            category = registry.get_category_cache().get(key)
+        if category is None:
+            category = _parse_category(category_string, registry, extras)
+            if key is not None:
+                registry.get_category_cache().put(key, category)
+        return category
+
     # find term
     term = category_string[:category_string.find(';')].strip()
 
     # find scheme
     scheme = find_in_string(category_string, 'scheme')
 
-    if is_mixin:
-        location = find_in_string(category_string, 'location')
-        if not location[-1] == '/':
-            raise AttributeError('Illegal location; must end with /')
-        if location[0] != '/' and location.find('http') != 0:
-            raise AttributeError('Illegal location; Either provide full URL'
-                                 ' or just a path starting with /.')
-        mixin = Mixin(scheme, term, location=location)
-        mixin.extras = registry.get_extras(extras)
-
-        try:
-            related = find_in_string(category_string, 'rel')
-        except AttributeError:
-            return mixin
-        else:
-            for item in categories:
-                if str(item) == related:
-                    mixin.related = [item]
-                    return mixin
-            raise AttributeError('Related category cannot be found.')
-
-    # return the category from registry...
-    tmp = Category(scheme, term, '', {}, '')
+    location = find_in_string(category_string, 'location')
+    if not location[-1] == '/':
+        raise AttributeError('Illegal location; must end with /')
+    if location[0] != '/' and location.find('http') != 0:
+        raise AttributeError('Illegal location; Either provide full URL'
+                             ' or just a path starting with /.')
+    mixin = Mixin(scheme, term, location=location)
+    mixin.extras = registry.get_extras(extras)
+
+    try:
+        related = find_in_string(category_string, 'rel')
+    except AttributeError:
+        return mixin
+    else:
+        for item in registry.get_categories(extras):
+            if str(item) == related:
+                mixin.related = [item]
+                return mixin
+        raise AttributeError('Related category cannot be found.')
+
+
+def _parse_category(category_string, registry, extras):
+    '''
+    Find the registered category for a string rendering.
+
+    category_string -- A string rendering of a category.
+    registry -- The registry used for this call.
+    extras -- The passed on extras argument
+    '''
+    term = category_string[:category_string.find(';')].strip()
+    scheme = find_in_string(category_string, 'scheme')
+    return _find_category(scheme, term, registry, extras)
+
+
+def _get_cache_key(value, registry, extras):
+    '''
+    Returns the key for the category cache of the registry - None if the
+    result cannot be cached.
+
+    The keys are (generation, owner, string) - entries of older generations
+    are never hit again and drop out eventually.
+
+    value -- The string which is parsed.
+    registry -- The registry used for this call.
+    extras -- The passed on extras argument
+    '''
+    generation = registry.get_generation()
+    if generation is None or registry.get_category_cache() is None:
+        return None
+    owner = None
     if extras is not None:
-        tmp.extras = registry.get_extras(extras)
-    for item in categories:
-        if item.extras is None:
-            tmp.extras = None
-            if tmp == item:
-                del tmp
-                return item
-            tmp.extras = registry.get_extras(extras)
-        elif item.extras is not None:
-            if tmp == item:
-                del tmp
-                return item
-    raise AttributeError('The following category is not registered within'
-                         + ' this service (See Query interfaces): '
-                         + str(scheme) + str(term))
+        owner = registry.get_extras(extras)
+    key = (generation, owner, value)
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def _find_category(scheme, term, registry, extras):
+    '''
+    Return a registered category.
+
+    scheme -- The scheme of the category.
+    term -- The term of the category.
+    registry -- The registry used for this call.
+    extras -- The passed on extras argument
+    '''
+    category = registry.find_category(scheme, term, extras)
+    if category is None:
+        raise AttributeError('The following category is not registered within'
+                             + ' this service (See Query interfaces): '
+                             + str(scheme) + str(term))
+    return category
 
 
 def get_category_str(category, registry):
@@ -143,6 +191,25 @@ def _get_link_categories(categories, registry, extras):
     '''
     Determine the kind ans mixins for inline link creation.
 
+    categories -- String with a set of category string definitions.
+    registry -- Registry used for this call.
+    extras -- Passed on extra object.
+    '''
+    key = _get_cache_key(('link', categories), registry, extras)
+    result = None
+    if key is not None:
+        result = registry.get_category_cache().get(key)
+    if result is None:
+        result = _parse_link_categories(categories, registry, extras)
+        if key is not None:
+            registry.get_category_cache().put(key, result)
+    return result[0], list(result[1])
+
+
+def _parse_link_categories(categories, registry, extras):
+    '''
+    Find the kind and mixins for a set of category string definitions.
+
     categories -- String with a set of category string definitions.
     registry -- Registry used for this call.
     extras -- Passed on extra object.
@@ -151,9 +218,9 @@ def _get_link_categories(categories, registry, extras):
     tmp_mixins = []
     for tmp_cat in categories.split(' '):
         tempus = tmp_cat.split('#')
-        link_category = get_category(tempus[1].strip() + ';scheme="'
-                                     + tempus[0].strip() + '#"', registry,
-                                     extras)
+        link_category = _find_category(tempus[0].strip().strip('"') + '#',
+                                       tempus[1].strip().strip('"'), registry,
+                                       extras)
         if isinstance(link_category, Kind):
             tmp_kind = link_category
         else:
@@ -173,17 +240,31 @@ def get_link(link_string, source, registry, extras):
     registry -- Registry used for this call.
     extras -- Passed on extra object.
     '''
-    tmp = link_string.find('<') + 1
-    target_id = link_string[tmp:link_string.rfind('>', tmp)].strip()
-
-    try:
-        link_id = find_in_string(link_string, 'self')
-    except AttributeError:
-        link_id = None
-
-    try:
-        tmp_category = find_in_string(link_string, 'category')
-    except AttributeError:
+    # single pass over the ';' separated segments - every segment is looked
+    # at once so the effort stays linear in the length of the string.
+    segments = link_string.split(';')
+    tmp = segments[0].find('<') + 1
+    target_id = segments[0][tmp:segments[0].rfind('>', tmp)].strip()
+
+    link_id = None
+    tmp_category = None
+    attributes = {}
+    for segment in segments[1:]:
+        tmp = segment.strip().split('=')
+        if len(tmp) < 2:
+            continue
+        name = tmp[0].strip()
+        if tmp_category is None:
+            value = segment[segment.find('=') + 1:]
+            value = value.rstrip('"').lstrip('"').strip()
+            if name == 'self' and link_id is None:
+                link_id = value
+            elif name == 'category':
+                tmp_category = value
+        elif len(tmp) == 2:
+            attributes[name] = tmp[1].rstrip('"').lstrip('"').strip()
+
+    if tmp_category is None:
         raise AttributeError('Could not determine the Category of the Link.')
 
     tmp_kind, tmp_mixins = _get_link_categories(tmp_category, registry, extras)
@@ -191,14 +272,6 @@ def get_link(link_string, source, registry, extras):
     if tmp_kind is None:
         raise AttributeError('Unable to find the Kind of the Link.')
 
-    attributes = {}
-    attr_begin = link_string.find('category="') + 12 + len(tmp_category)
-    attributes_str = link_string[attr_begin:]
-    for attribute in attributes_str.split(';'):
-        tmp = attribute.strip().split('=')
-        if len(tmp) == 2:
-            attributes[tmp[0].strip()] = tmp[1].rstrip('"').lstrip('"').strip()
-
     try:
         if not target_id.find(registry.get_hostname()):
             target_id = target_id.replace(registry.get_hostname(), '')
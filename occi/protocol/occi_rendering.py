@@ -26,9 +26,13 @@ Created on Jun 28, 2011
 
 from occi.core_model import Resource, Link
 from occi.handlers import CATEGORY, ATTRIBUTE, LOCATION, LINK, CONTENT_TYPE
-from occi.protocol.rendering import Rendering
+from occi.protocol.rendering import Rendering, chunked
 import occi.protocol.occi_parser as parser
-import shlex
+import re
+
+# characters which need attention while splitting a list of values.
+SPECIALS = re.compile(r'[,"\'\\#]')
+QUOTED_SPECIALS = re.compile(r'["\\]')
 
 
 class HTTPData(object):
@@ -45,6 +49,9 @@ class HTTPData(object):
         self.links = []
         self.attributes = []
         self.locations = []
+        # one HTTPData per entity for bodies with several entities - each
+        # starts with a Category line after a blank line.
+        self.blocks = []
 
 #==============================================================================
 # text/occi rendering
@@ -290,10 +297,7 @@ def _extract_data_from_headers(headers):
     if CATEGORY in headers.keys():
         data.categories = headers[CATEGORY].split(',')
     if ATTRIBUTE in headers.keys():
-        split = shlex.shlex(headers[ATTRIBUTE], posix=True)
-        split.whitespace = ','
-        split.whitespace_split = True
-        data.attributes = list(split)
+        data.attributes = split_values(headers[ATTRIBUTE])
     if LOCATION in headers.keys():
         data.locations = headers[LOCATION].split(',')
     if LINK in headers.keys():
@@ -334,6 +338,7 @@ class TextOcciRendering(Rendering):
     '''
 
     mime_type = 'text/occi'
+    streams_body = True
 
     # disabling 'Method could be...' pylint check (want them to be overwritten)
     # disabling 'Unused argument' pylint check (text/plain will use it :-))
@@ -371,7 +376,7 @@ class TextOcciRendering(Rendering):
         entities = _to_entities(data, self.registry, extras)
         return entities
 
-    def from_entities(self, entities, key):
+    def from_entities(self, entities, key, next_page=None):
         data = _from_entities(entities, self.registry)
         headers, body = self.set_data(data)
         return headers, body
@@ -401,21 +406,70 @@ def _extract_data_from_body(body):
     '''
     Simple method to split out the information from the HTTP body.
 
+    The body can either be a string or an iterable over its lines (e.g. a
+    stream which is read while parsing). An iterable can only be read once
+    so the result is stored with it.
+
     body -- The HTTP body.
     '''
+    if isinstance(body, basestring):
+        lines = body.split('\n')
+    elif getattr(body, 'data', None) is not None:
+        return body.data
+    else:
+        lines = body
+
     data = HTTPData()
-    for entry in body.split('\n'):
+    block = HTTPData()
+    # None until the first line of a block is seen.
+    new_entity = None
+    for entry in lines:
+        if not entry.strip():
+            _add_block(data, block, new_entity)
+            block = HTTPData()
+            new_entity = None
+        elif new_entity is None:
+            new_entity = entry.strip().startswith(CATEGORY + ':')
         if entry.find(CATEGORY + ':') > -1:
-            data.categories.extend(_extract_values(entry, CATEGORY + ':'))
+            block.categories.extend(_extract_values(entry, CATEGORY + ':'))
         if entry.find(ATTRIBUTE + ':') > -1:
-            data.attributes.extend(_extract_values(entry, ATTRIBUTE + ':'))
+            block.attributes.extend(_extract_values(entry, ATTRIBUTE + ':'))
         if entry.find(LINK + ':') > -1:
-            data.links.extend(_extract_values(entry, LINK + ':'))
+            block.links.extend(_extract_values(entry, LINK + ':'))
         if entry.find(LOCATION + ':') > -1:
-            data.locations.extend(_extract_values(entry, LOCATION + ':'))
+            block.locations.extend(_extract_values(entry, LOCATION + ':'))
+    _add_block(data, block, new_entity)
+    if lines is body:
+        body.data = data
     return data
 
 
+def _add_block(data, block, new_entity):
+    '''
+    Add the information of one blank line separated block of the body.
+    Blocks which do not start with a Category line belong to the entity of
+    the block before.
+
+    data -- The HTTPData of the whole body.
+    block -- The HTTPData of the block.
+    new_entity -- True if the block starts with a Category line.
+    '''
+    if block.categories or block.attributes or block.links or \
+            block.locations:
+        data.categories.extend(block.categories)
+        data.attributes.extend(block.attributes)
+        data.links.extend(block.links)
+        data.locations.extend(block.locations)
+        if new_entity or not len(data.blocks):
+            data.blocks.append(block)
+        else:
+            last = data.blocks[-1]
+            last.categories.extend(block.categories)
+            last.attributes.extend(block.attributes)
+            last.links.extend(block.links)
+            last.locations.extend(block.locations)
+
+
 def _extract_values(entry, key):
     '''
     In HTTP body OCCI renderings can either be in new lines or separated by ,.
@@ -428,13 +482,84 @@ def _extract_values(entry, key):
     if tmp.find(',') == -1:
         items.append(tmp)
     else:
-        split = shlex.shlex(tmp, posix=True)
-        split.whitespace = ','
-        split.whitespace_split = True
-        items.extend(list(split))
+        items.extend(split_values(tmp))
     return items
 
 
+def split_values(string):
+    '''
+    Split a comma separated list of values in a single pass. Quotes are
+    removed (commas within quotes are kept) and backslashes escape the next
+    character.
+
+    Behaves exactly like a posix shlex with ',' as the only whitespace and
+    whitespace_split enabled (including treating # as start of a comment) -
+    which was used before.
+
+    string -- The string to split.
+    '''
+    result = []
+    chunks = []
+    quoted = False
+    pos = 0
+    length = len(string)
+    while True:
+        match = SPECIALS.search(string, pos)
+        if match is None:
+            chunks.append(string[pos:])
+            break
+        index = match.start()
+        chunks.append(string[pos:index])
+        char = string[index]
+        pos = index + 1
+
+        if char == ',' or char == '#':
+            if char == '#':
+                # comment - skip the rest of the line.
+                end = string.find('\n', pos)
+                pos = length if end == -1 else end + 1
+            token = ''.join(chunks)
+            if token or quoted:
+                result.append(token)
+            chunks = []
+            quoted = False
+        elif char == '\\':
+            if pos == length:
+                raise ValueError('No escaped character')
+            chunks.append(string[pos])
+            pos += 1
+        elif char == "'":
+            quoted = True
+            end = string.find("'", pos)
+            if end == -1:
+                raise ValueError('No closing quotation')
+            chunks.append(string[pos:end])
+            pos = end + 1
+        else:
+            quoted = True
+            while True:
+                match = QUOTED_SPECIALS.search(string, pos)
+                if match is None:
+                    raise ValueError('No closing quotation')
+                index = match.start()
+                chunks.append(string[pos:index])
+                pos = index + 1
+                if string[index] == '"':
+                    break
+                if pos == length:
+                    raise ValueError('No escaped character')
+                # only quotes and backslashes can be escaped within quotes.
+                if string[pos] != '"' and string[pos] != '\\':
+                    chunks.append('\\')
+                chunks.append(string[pos])
+                pos += 1
+
+    token = ''.join(chunks)
+    if token or quoted:
+        result.append(token)
+    return result
+
+
 def _set_data_to_body(data, mime_type):
     '''
     Simple method to set all information in the HTTP body.
@@ -476,6 +601,11 @@ class TextPlainRendering(TextOcciRendering):
     def get_data(self, headers, body):
         return _extract_data_from_body(body)
 
+    def to_new_entities(self, headers, body, extras):
+        data = self.get_data(headers, body)
+        return [_to_entity(block, None, self.registry, extras)
+                for block in data.blocks or [data]]
+
 
 class TextUriListRendering(Rendering):
     '''
@@ -483,6 +613,7 @@ class TextUriListRendering(Rendering):
     '''
 
     mime_type = 'text/uri-list'
+    streams_body = True
     error = 'Unable to handle this request with the text/uri-list' \
                 ' rendering.'
 
@@ -495,11 +626,25 @@ class TextUriListRendering(Rendering):
     def to_entities(self, headers, body, extras):
         raise AttributeError(self.error)
 
-    def from_entities(self, entities, key):
-        body = '# uri:' + str(key)
+    def from_entities(self, entities, key, next_page=None):
+        headers, body = self.iter_entities(entities, key, next_page)
+        return headers, ''.join(body)
+
+    def iter_entities(self, entities, key, next_page=None):
+        return {CONTENT_TYPE: self.mime_type}, chunked(self._iter_uris(
+            entities, key))
+
+    def _iter_uris(self, entities, key):
+        '''
+        Generator for the lines of the URI list.
+
+        entities -- The entities which will be rendered.
+        key -- The path of the collection.
+        '''
+        yield '# uri:' + str(key)
+        hostname = self.registry.get_hostname()
         for entity in entities:
-            body += '\n' + self.registry.get_hostname() + entity.identifier
-        return {CONTENT_TYPE: self.mime_type}, body
+            yield '\n' + hostname + entity.identifier
 
     def from_categories(self, categories):
         raise AttributeError(self.error)
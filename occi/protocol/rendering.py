@@ -24,12 +24,44 @@ Created on Feb 2, 2012
 @author: tmetsch
 '''
 
+# Size (in bytes) of the pieces in which streamed bodies are sent.
+CHUNK_SIZE = 8192
+
+
+def chunked(parts, size=CHUNK_SIZE):
+    '''
+    Join an iterable of (small) strings to chunks of roughly the given size.
+
+    parts -- Iterable of strings.
+    size -- Number of bytes after which a chunk is handed out.
+    '''
+    tmp = []
+    length = 0
+    for part in parts:
+        tmp.append(part)
+        length += len(part)
+        if length >= size:
+            yield ''.join(tmp)
+            tmp = []
+            length = 0
+    if len(tmp):
+        yield ''.join(tmp)
+
 
 class Rendering(object):
     '''
     All renderings should derive from this class.
+
+    The body handed to the to_* methods and get_filters is a string - unless
+    the rendering sets streams_body. Those renderings get an iterable over
+    the lines of the body (without line breaks) instead, which can only be
+    read once (see occi.wsgi.RequestBody) - or a string if the body did not
+    come from a WSGI request.
     '''
 
+    # set to True if the rendering can parse the body from its lines.
+    streams_body = False
+
     def __init__(self, registry):
         '''
         Constructor.
@@ -45,12 +77,25 @@ class Rendering(object):
         instances.
 
         headers -- The HTTP headers.
-        body -- The HTTP body.
+        body -- The HTTP body (see streams_body).
         def_kind -- If provided this kind is taken (Needed for update).
         extras -- Passed on extra object.
         '''
         raise NotImplementedError()
 
+    def to_new_entities(self, headers, body, extras):
+        '''
+        Given the HTTP headers and the body this method will convert the HTTP
+        data into a list of new entities - for requests which create several
+        entities at once. Renderings which support this should overwrite it;
+        by default the request holds one entity (see to_entity).
+
+        headers -- The HTTP headers.
+        body -- The HTTP body (see streams_body).
+        extras -- Passed on extra object.
+        '''
+        return [self.to_entity(headers, body, None, extras)]
+
     def from_entity(self, entity):
         '''
         Given an entity it will return a HTTP body an header.
@@ -69,20 +114,38 @@ class Rendering(object):
         Resource or Link instances.
 
         headers -- The HTTP headers.
-        body -- The HTTP body.
+        body -- The HTTP body (see streams_body).
         extras -- Passed on extra object.
         '''
         raise NotImplementedError()
 
-    def from_entities(self, entities, key):
+    def from_entities(self, entities, key, next_page=None):
         '''
         Given an set of entities it will return a HTTP body an header.
 
+        The handler adds a Link header (rel="next") when the entities are
+        only one page of the collection - renderings only need to care about
+        next_page if they want to show it in the body.
+
         entities -- The entities which will be rendered.
         key -- Needed for uri-list (see RFC) and html rendering.
+        next_page -- Path of the next page (default: None).
         '''
         raise NotImplementedError()
 
+    def iter_entities(self, entities, key, next_page=None):
+        '''
+        Same as from_entities but returns the body as an iterable of strings
+        so it can be sent while it is rendered. Renderings which can create
+        the body piece by piece should overwrite this.
+
+        entities -- The entities which will be rendered.
+        key -- Needed for uri-list (see RFC) and html rendering.
+        next_page -- Path of the next page (default: None).
+        '''
+        headers, body = self.from_entities(entities, key, next_page)
+        return headers, [body]
+
     def from_categories(self, categories):
         '''
         Given an set of categories it will return a HTTP body an header.
@@ -97,7 +160,7 @@ class Rendering(object):
         data into an Action.
 
         headers -- The HTTP headers.
-        body -- The HTTP body.
+        body -- The HTTP body (see streams_body).
         extras -- Passed on extra object.
         '''
         raise NotImplementedError()
@@ -108,7 +171,7 @@ class Rendering(object):
         data into a Mixins. Must return a list with Mixin instances.
 
         headers -- The HTTP headers.
-        body -- The HTTP body.
+        body -- The HTTP body (see streams_body).
         extras -- Passed on extra object.
         '''
         raise NotImplementedError()
@@ -119,7 +182,7 @@ class Rendering(object):
         data into a list of categories and attributes.
 
         headers -- The HTTP headers.
-        body -- The HTTP body.
+        body -- The HTTP body (see streams_body).
         extras -- Passed on extra object.
         '''
         raise NotImplementedError()
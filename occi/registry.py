@@ -30,9 +30,20 @@ Created on Aug 22, 2011
 # disabling 'Method could be function' pylint check (see above)
 # pylint: disable=R0922,W0613,R0201
 
-from occi.backend import KindBackend, ActionBackend, MixinBackend
+from occi.backend import KindBackend, ActionBackend, MixinBackend, \
+    UserDefinedMixinBackend
+from occi.cache import LRUCache
+from occi.chunked import ChunkedDict, ChunkedList, ChunkedSet
 from occi.exceptions import HTTPError
+from occi.locks import ReadWriteLock
 from occi.protocol.occi_rendering import Rendering
+import bisect
+import contextlib
+import itertools
+import threading
+
+# default number of parsed category strings cached by a registry.
+CATEGORY_CACHE_SIZE = 1024
 
 
 class Registry(object):
@@ -46,15 +57,23 @@ class Registry(object):
 
     def get_hostname(self):
         '''
-        Returns the hostname of the service.
+        Returns the hostname of the service (as seen by the current request).
         '''
-        return self.hostname
+        return getattr(getattr(self, 'request', None), 'hostname',
+                       self.hostname)
 
     def set_hostname(self, hostname):
         '''
-        Set the hostname of the service.
+        Set the hostname of the service for the request handled by the
+        current thread.
         '''
-        self.hostname = hostname
+        # requests can be handled by multiple threads concurrently - so the
+        # hostname is kept per thread. Created here so subclasses do not
+        # need to call __init__.
+        request = getattr(self, 'request', None)
+        if request is None:
+            request = vars(self).setdefault('request', threading.local())
+        request.hostname = hostname
 
     def get_default_type(self):
         '''
@@ -141,6 +160,51 @@ class Registry(object):
         raise NotImplementedError('Registry implementation seems to be'
                                   ' incomplete.')
 
+    def get_generation(self):
+        '''
+        Return a counter which changes whenever categories are added or
+        removed - used to invalidate caches of parsed categories. Returns
+        None if the registry does not keep track (nothing is cached then).
+        '''
+        return None
+
+    def get_revision(self):
+        '''
+        Return a counter which changes whenever resources are added, removed
+        or updated - used to build the validators of collections. Returns
+        None if the registry does not keep track (the versions of all
+        entities in the collection are used then).
+        '''
+        return None
+
+    def get_category_cache(self):
+        '''
+        Return the cache for parsed category strings (an
+        occi.cache.LRUCache) - or None if nothing should be cached. Only
+        used if get_generation is implemented as well.
+        '''
+        return None
+
+    def find_category(self, scheme, term, extras):
+        '''
+        Return the category with the given scheme and term - the ones of the
+        user are preferred over the shared ones. Returns None if there is
+        none.
+
+        Walks over all categories - overwrite this if you can do better.
+
+        scheme -- The scheme of the category.
+        term -- The term of the category.
+        extras -- Extras object - same as the one passed on to the backends.
+        '''
+        shared = None
+        for item in self.get_categories(extras):
+            if item.scheme == scheme and item.term == term:
+                if item.extras is not None:
+                    return item
+                shared = item
+        return shared
+
     def get_resource(self, key, extras):
         '''
         Return a certain resource.
@@ -172,6 +236,17 @@ class Registry(object):
         raise NotImplementedError('Registry implementation seems to be'
                                   ' incomplete.')
 
+    def update_resource(self, key, entity, extras):
+        '''
+        Notify the registry that a resource was changed in place (e.g. mixins
+        got added or removed) so it can update whatever it keeps about it.
+
+        key -- Unique identifier of the resource.
+        entity -- the OCCI representation.
+        extras -- Extras object - same as the one passed on to the backends.
+        '''
+        pass
+
     def get_resource_keys(self, extras):
         '''
         Return all keys of all resources.
@@ -190,6 +265,97 @@ class Registry(object):
         raise NotImplementedError('Registry implementation seems to be'
                                   ' incomplete.')
 
+    def get_resources_of_category(self, category, extras):
+        '''
+        Return all resources which have the given category as kind or mixin.
+
+        Walks over all resources - overwrite this if you can do better.
+
+        category -- The kind or mixin.
+        extras -- Extras object - same as the one passed on to the backends.
+        '''
+        result = []
+        for res in self.get_resources(extras):
+            if category == res.kind or category in res.mixins:
+                result.append(res)
+        return result
+
+    def get_resources_under_prefix(self, prefix, extras):
+        '''
+        Return all resources whose identifier starts with the given prefix
+        (e.g. everything under /foo/bar/).
+
+        Walks over all resources - overwrite this if you can do better.
+
+        prefix -- The path prefix.
+        extras -- Extras object - same as the one passed on to the backends.
+        '''
+        result = []
+        for res in self.get_resources(extras):
+            if res.identifier.startswith(prefix):
+                result.append(res)
+        return result
+
+    def get_page_of_category(self, category, extras, start, limit):
+        '''
+        Return up to limit resources which have the given category as kind or
+        mixin - ordered by their keys and starting after the given key.
+
+        Walks over all resources of the category - overwrite this if you can
+        do better.
+
+        category -- The kind or mixin.
+        extras -- Extras object - same as the one passed on to the backends.
+        start -- The resources need to have a larger key (None for all).
+        limit -- Maximum number of resources.
+        '''
+        return _slice_page(self.get_resources_of_category(category, extras),
+                           start, limit)
+
+    def get_page_under_prefix(self, prefix, extras, start, limit):
+        '''
+        Return up to limit resources whose identifier starts with the given
+        prefix - ordered by their keys and starting after the given key.
+
+        Walks over all resources under the prefix - overwrite this if you can
+        do better.
+
+        prefix -- The path prefix.
+        extras -- Extras object - same as the one passed on to the backends.
+        start -- The resources need to have a larger key (None for all).
+        limit -- Maximum number of resources.
+        '''
+        return _slice_page(self.get_resources_under_prefix(prefix, extras),
+                           start, limit)
+
+    def get_resource_keys_by_attribute(self, name, value, extras):
+        '''
+        Return the keys of the resources which have an attribute with the
+        given value - or None if the attribute is not indexed and the caller
+        needs to walk over the resources itself. The keys are not filtered by
+        owner.
+
+        By default no attribute is indexed.
+
+        name -- Name of the attribute.
+        value -- The value of the attribute.
+        extras -- Extras object - same as the one passed on to the backends.
+        '''
+        return None
+
+    @contextlib.contextmanager
+    def transaction(self, extras):
+        '''
+        Group the changes of a multi-entity operation (e.g. a resource and
+        its links) so a registry can write them in one batch. Used as a
+        context manager by the workflow; can be nested.
+
+        By default it does nothing.
+
+        extras -- Extras object - same as the one passed on to the backends.
+        '''
+        yield
+
     def get_extras(self, extras):
         '''
         Will return what goes into the extras attribute of the entity and
@@ -209,27 +375,63 @@ class NonePersistentRegistry(Registry):
     @author: tmetsch
     '''
 
-    def __init__(self):
+    def __init__(self, journal=None, category_cache_size=CATEGORY_CACHE_SIZE):
+        '''
+        Constructor.
+
+        journal -- Optional occi.journal.Journal - the registry is restored
+                   from it and all changes are logged to it.
+        category_cache_size -- Number of parsed category strings which are
+                               cached.
+        '''
         self.backends = {}
+        self.locations = {}
+        # (scheme, term, owner) -> category
+        self.names = {}
+        # changed whenever categories are added or removed.
+        self.generation = 0
+        # changed whenever resources are added, removed or updated.
+        self.revision = 0
+        # (generation, owner, string) -> parsed categories.
+        self.category_cache = LRUCache(category_cache_size)
+        # (kind, mixins) -> backends to call for entities of that signature.
+        self.resolved = LRUCache(1024)
         self.renderings = {}
-        self.resources = {}
+        # raw Accept/Content-Type header -> rendering (None if none fits).
+        self.negotiated = LRUCache(256)
+        self.resources = self._create_index()
+        # resources partitioned by owner (the value of get_extras()); shared
+        # resources live in the partition None.
+        self.partitions = self._create_index()
+        # the keys of each partition in sorted order - for range scans.
+        self.ordered = self._create_index()
+        # category -> sorted keys of the resources in that collection and the
+        # reverse (key -> categories) to be able to update it.
+        self.members = self._create_index()
+        self.memberships = self._create_index()
+        # (attribute name, value) -> keys for the names in indexed_attributes
+        # and the reverse (key -> (name, value) pairs).
+        self.indexed_attributes = set()
+        self.attribute_index = self._create_index()
+        self.attribute_values = self._create_index()
         self.host = ''
+        # categories/backends and resources are guarded separately - the
+        # resource indexes can be read concurrently.
+        self.category_lock = threading.RLock()
+        self.resource_lock = ReadWriteLock()
         super(NonePersistentRegistry, self).__init__()
 
-    def get_renderer(self, mime_type):
-        parser = None
-
-        for tmp in mime_type.split(','):
-            type_str = tmp.strip()
-            if type_str.find(';q=') > -1:
-                type_str = type_str[:type_str.find(';q=')]
+        self.journal = None
+        if journal is not None:
+            journal.restore(self)
+            self.journal = journal
 
-            if type_str in self.renderings:
-                parser = self.renderings[type_str]
-                break
-            elif type_str == '*/*':
-                parser = self.renderings[self.get_default_type()]
-                break
+    def get_renderer(self, mime_type):
+        parser = self.negotiated.get(mime_type, False)
+        if parser is False:
+            parser = _negotiate(mime_type, self.renderings,
+                                self.get_default_type())
+            self.negotiated.put(mime_type, parser)
 
         if parser is None:
             raise HTTPError(406, 'This service is unable to understand the ' +
@@ -241,12 +443,13 @@ class NonePersistentRegistry(Registry):
         if not isinstance(renderer, Rendering):
             raise AttributeError('renderer needs to derive from Rendering.')
         self.renderings[mime_type] = renderer
+        self.negotiated.clear()
 
     def get_backend(self, category, extras):
         # no need to check - a get_categories or get_categroy will be called
         # first.
         try:
-            back = self.backends[category]
+            back = self._view().backends[category]
             if repr(category) == 'kind' and isinstance(back, KindBackend):
                 return back
             if repr(category) == 'action' and isinstance(back,
@@ -258,34 +461,72 @@ class NonePersistentRegistry(Registry):
             raise AttributeError('Cannot find corresponding Backend.')
 
     def get_all_backends(self, entity, extras):
-        res = [self.get_backend(entity.kind, extras)]
-        for mixin in entity.mixins:
-            res.append(self.get_backend(mixin, extras))
-        # remove duplicates - only need to call backs once - right?
-        return list(set(res))
+        signature = (entity.kind, frozenset(entity.mixins))
+        res = self.resolved.get(signature)
+        if res is None:
+            with self.category_lock:
+                res = [self.get_backend(entity.kind, extras)]
+                # sorted so the order does not depend on the order of the
+                # mixins.
+                for mixin in sorted(signature[1], key=str):
+                    back = self.get_backend(mixin, extras)
+                    # remove duplicates - only need to call backs once - right?
+                    if back not in res:
+                        res.append(back)
+                res = tuple(res)
+                self.resolved.put(signature, res)
+        return res
 
     def set_backend(self, category, backend, extras):
         if extras is not None:
             # category belongs to single user...
             category.extras = self.get_extras(extras)
-        self.backends[category] = backend
+        with self.category_lock:
+            self.generation += 1
+            self.resolved.clear()
+            if category in self.backends:
+                # re-registration - drop the location of the old definition.
+                for path, item in self.locations.items():
+                    if item == category:
+                        self.locations.pop(path)
+            self.backends[category] = backend
+            self.names[(category.scheme, category.term,
+                        category.extras)] = category
+            if category.location is not None:
+                self.locations[category.location] = category
+            if self.journal is not None:
+                # restored entities might wait for this category.
+                self.journal.resolve(category)
+                if isinstance(backend, UserDefinedMixinBackend):
+                    self.journal.log_mixin(category)
 
     def delete_mixin(self, mixin, extras):
         # no need to check because in get_category in renderer it is assured
         # that the user only sees own. Will get not found if he tries to delete
         # mixin from other user.
-        self.backends.pop(mixin)
+        with self.category_lock:
+            self.generation += 1
+            self.backends.pop(mixin)
+            # the given mixin might be parsed from the request - the location
+            # of the registered one counts.
+            registered = self.names.pop((mixin.scheme, mixin.term,
+                                         mixin.extras), mixin)
+            self.resolved.clear()
+            if self.locations.get(registered.location) == registered:
+                self.locations.pop(registered.location)
+            if self.journal is not None:
+                self.journal.log_delete_mixin(mixin)
 
     def get_category(self, path, extras):
         # no need for ownership check - paths cannot overlap!
-        for category in self.backends.keys():
-            if category.location == path:
-                return category
-        return None
+        with self._read() as view:
+            return view.locations.get(path)
 
     def get_categories(self, extras):
         result = []
-        for item in self.backends.keys():
+        with self._read() as view:
+            categories = view.backends.keys()
+        for item in categories:
             if item.extras is None:
                 # categories visible to all!
                 result.append(item)
@@ -294,38 +535,635 @@ class NonePersistentRegistry(Registry):
                 result.append(item)
         return result
 
+    def get_generation(self):
+        return self.generation
+
+    def get_category_cache(self):
+        return self.category_cache
+
+    def get_revision(self):
+        return self._view().revision
+
+    @contextlib.contextmanager
+    def locked(self):
+        '''
+        Context manager which holds off all changes to the registry - e.g. to
+        copy a consistent state of it. Yields the object which holds the
+        indexes (backends, resources...) - they must not be changed.
+        '''
+        with self._write():
+            yield self._view()
+
+    def find_category(self, scheme, term, extras):
+        with self._read() as view:
+            if extras is not None:
+                owner = self.get_extras(extras)
+                if owner is not None:
+                    category = view.names.get((scheme, term, owner))
+                    if category is not None:
+                        return category
+            return view.names.get((scheme, term, None))
+
+    def get_category_by_name(self, scheme, term, owner):
+        '''
+        Return the registered category with the given scheme, term and owner
+        - or None if there is none. Unlike find_category the owner is not
+        taken from the extras and there is no fallback to shared categories.
+
+        scheme -- The scheme of the category.
+        term -- The term of the category.
+        owner -- The extras attribute of the category (None if it is visible
+                 to all).
+        '''
+        with self._read() as view:
+            return view.names.get((scheme, term, owner))
+
     def get_resource(self, key, extras):
-        if self.resources[key].extras is not None and self.resources[key]\
-                                            .extras != self.get_extras(extras):
+        # a single lookup - atomic, no need to lock.
+        resource = self._view().resources[key]
+        if resource.extras is not None and \
+                resource.extras != self.get_extras(extras):
             raise KeyError
-        return self.resources[key]
+        return resource
 
     def add_resource(self, key, resource, extras):
         if extras is not None:
             resource.extras = self.get_extras(extras)
-        self.resources[key] = resource
+        with self._write():
+            if key in self.resources:
+                self._remove_from_partition(key, self.resources[key])
+            self.resources[key] = resource
+            self._get_partition(resource.extras)[key] = resource
+            self._add_key(self._get_ordered(resource.extras), key)
+            self._index_categories(key, resource)
+            self._index_attributes(key, resource)
+            self.revision += 1
+            if self.journal is not None:
+                self.journal.log_resource(key, resource)
 
     def delete_resource(self, key, extras):
         # get_resources and get_resource is called before this - no need for
         # ownership checking.
-        self.resources.pop(key)
+        with self._write():
+            resource = self.resources.pop(key)
+            self._remove_from_partition(key, resource)
+            self._index_categories(key, None)
+            self._index_attributes(key, None)
+            self.revision += 1
+            if self.journal is not None:
+                self.journal.log_delete_resource(key)
+
+    def update_resource(self, key, entity, extras):
+        with self._write():
+            if self.resources.get(key) is entity:
+                self._index_categories(key, entity)
+                self._index_attributes(key, entity)
+                self.revision += 1
+                if self.journal is not None:
+                    self.journal.log_resource(key, entity)
+
+    @contextlib.contextmanager
+    def transaction(self, extras):
+        if self.journal is None:
+            yield
+            return
+        self.journal.begin()
+        try:
+            yield
+        finally:
+            self.journal.end()
 
     def get_resource_keys(self, extras):
         result = []
-        for key in self.resources.keys():
-            if self.resources[key].extras is None:
-                result.append(key)
-            elif self.resources[key].extras is not None and \
-                 self.resources[key].extras == self.get_extras(extras):
-                result.append(key)
+        with self._read() as view:
+            for owner in self._get_owners(view, extras):
+                result.extend(view.partitions[owner].keys())
         return result
 
     def get_resources(self, extras):
         result = []
-        for item in self.resources.values():
-            if item.extras is None:
-                result.append(item)
-            elif item.extras is not None and \
-                 item.extras == self.get_extras(extras):
-                result.append(item)
+        with self._read() as view:
+            for owner in self._get_owners(view, extras):
+                result.extend(view.partitions[owner].values())
+        return result
+
+    def get_resources_of_category(self, category, extras):
+        result = []
+        with self._read() as view:
+            partitions = [view.partitions[owner]
+                          for owner in self._get_owners(view, extras)]
+            for key in view.members.get(category, ()):
+                for partition in partitions:
+                    if key in partition:
+                        result.append(partition[key])
+                        break
         return result
+
+    def get_resources_under_prefix(self, prefix, extras):
+        result = []
+        with self._read() as view:
+            owners = self._get_owners(view, extras)
+            for owner in owners:
+                partition = view.partitions[owner]
+                for key in self._iter_keys(view.ordered[owner], prefix):
+                    if not key.startswith(prefix):
+                        break
+                    result.append(partition[key])
+        if len(owners) > 1:
+            # two sorted runs - keep the overall result ordered by key.
+            result.sort(key=lambda res: res.identifier)
+        return result
+
+    def get_page_of_category(self, category, extras, start, limit):
+        result = []
+        with self._read() as view:
+            partitions = [view.partitions[owner]
+                          for owner in self._get_owners(view, extras)]
+            keys = view.members.get(category)
+            if keys is None or limit < 1:
+                return result
+            # keys of other owners are skipped.
+            for key in self._iter_keys(keys, start or ''):
+                if key == start:
+                    continue
+                for partition in partitions:
+                    if key in partition:
+                        result.append(partition[key])
+                        break
+                if len(result) == limit:
+                    break
+        return result
+
+    def get_page_under_prefix(self, prefix, extras, start, limit):
+        result = []
+        first = prefix
+        if start is not None and start > prefix:
+            first = start
+        with self._read() as view:
+            for owner in self._get_owners(view, extras):
+                partition = view.partitions[owner]
+                count = 0
+                for key in self._iter_keys(view.ordered[owner], first):
+                    if not key.startswith(prefix) or count == limit:
+                        break
+                    if key != start:
+                        result.append(partition[key])
+                        count += 1
+        # one sorted run per owner - keep the first ones over all.
+        result.sort(key=lambda res: res.identifier)
+        return result[:limit]
+
+    def get_resource_keys_by_attribute(self, name, value, extras):
+        with self._read() as view:
+            if name not in view.indexed_attributes:
+                return None
+            try:
+                return frozenset(view.attribute_index.get((name, value), ()))
+            except TypeError:
+                # unhashable values are not indexed - and equal no string.
+                return frozenset()
+
+    def index_attribute(self, name):
+        '''
+        Maintain an inverted index for an attribute so collections can be
+        filtered by it without walking over all resources. The index is kept
+        current by add_resource and update_resource - which are called by the
+        workflow whenever an entity is created or changed.
+
+        name -- Name of the attribute (e.g. occi.compute.state).
+        '''
+        with self._write():
+            self.indexed_attributes = self.indexed_attributes | set([name])
+            for key, resource in self.resources.items():
+                self._index_attributes(key, resource)
+
+    def _view(self):
+        '''
+        Returns the object which holds the indexes readers should use.
+        '''
+        return self
+
+    @contextlib.contextmanager
+    def _read(self):
+        '''
+        Context manager for reading the indexes - yields the view to read
+        from.
+        '''
+        with self.resource_lock.read():
+            yield self
+
+    @contextlib.contextmanager
+    def _write(self):
+        '''
+        Context manager for changing the indexes.
+        '''
+        with self.resource_lock.write():
+            yield
+
+    def _create_index(self):
+        '''
+        Returns a new, empty top-level index.
+        '''
+        return {}
+
+    def _add_key(self, keys, key):
+        '''
+        Insert a key into sorted keys (see _get_ordered).
+
+        keys -- The sorted keys.
+        key -- The key.
+        '''
+        bisect.insort(keys, key)
+
+    def _remove_key(self, keys, key):
+        '''
+        Remove a key from sorted keys (see _get_ordered).
+
+        keys -- The sorted keys.
+        key -- The key.
+        '''
+        del keys[bisect.bisect_left(keys, key)]
+
+    def _iter_keys(self, keys, start):
+        '''
+        Iterate over sorted keys - beginning with the first one which is not
+        smaller than start.
+
+        keys -- The sorted keys.
+        start -- Where to begin.
+        '''
+        return itertools.islice(keys, bisect.bisect_left(keys, start), None)
+
+    def _get_partition(self, owner):
+        '''
+        Returns the partition of an owner for changing it.
+
+        owner -- The owner (return value of get_extras()).
+        '''
+        return self.partitions.setdefault(owner, {})
+
+    def _get_ordered(self, owner):
+        '''
+        Returns the sorted keys of an owner's partition for changing them.
+
+        owner -- The owner (return value of get_extras()).
+        '''
+        return self.ordered.setdefault(owner, [])
+
+    def _get_members(self, category):
+        '''
+        Returns the sorted keys of the resources in a collection for changing
+        them.
+
+        category -- The category.
+        '''
+        return self.members.setdefault(category, [])
+
+    def _get_attribute_keys(self, pair):
+        '''
+        Returns the keys of the resources with the given attribute value for
+        changing them.
+
+        pair -- Tuple of attribute name and value.
+        '''
+        return self.attribute_index.setdefault(pair, set())
+
+    def _get_owners(self, view, extras):
+        '''
+        Return the owners of the partitions visible to the caller: the shared
+        one (extras=None) and the one of the caller itself.
+
+        view -- The view on the indexes (see _read).
+        extras -- Extras object - same as the one passed on to the backends.
+        '''
+        result = []
+        if None in view.partitions:
+            result.append(None)
+        if extras is not None:
+            owner = self.get_extras(extras)
+            if owner is not None and owner in view.partitions:
+                result.append(owner)
+        return result
+
+    def _remove_from_partition(self, key, resource):
+        '''
+        Remove a resource from the partition of its owner.
+
+        key -- Unique identifier of the resource.
+        resource -- The resource which is to be removed.
+        '''
+        owner = resource.extras
+        if owner not in self.partitions or key not in self.partitions[owner]:
+            # owner got changed after the resource was added...
+            for tmp in self.partitions.keys():
+                if key in self.partitions[tmp]:
+                    owner = tmp
+                    break
+        partition = self._get_partition(owner)
+        partition.pop(key)
+        self._remove_key(self._get_ordered(owner), key)
+        if not len(partition):
+            self.partitions.pop(owner)
+            self.ordered.pop(owner)
+
+    def _index_categories(self, key, resource):
+        '''
+        Bring the category membership index in line with the current kind and
+        mixins of a resource.
+
+        key -- Unique identifier of the resource.
+        resource -- The resource or None if it got removed.
+        '''
+        categories = set()
+        if resource is not None:
+            if resource.kind is not None:
+                categories.add(resource.kind)
+            categories.update(resource.mixins or [])
+
+        old = self.memberships.pop(key, set())
+        for category in old - categories:
+            if category in self.members:
+                keys = self._get_members(category)
+                self._remove_key(keys, key)
+                if not len(keys):
+                    self.members.pop(category)
+        for category in categories - old:
+            self._add_key(self._get_members(category), key)
+
+        if len(categories):
+            self.memberships[key] = categories
+
+    def _index_attributes(self, key, resource):
+        '''
+        Bring the attribute index in line with the current attributes of a
+        resource.
+
+        key -- Unique identifier of the resource.
+        resource -- The resource or None if it got removed.
+        '''
+        pairs = set()
+        if resource is not None and len(self.indexed_attributes):
+            for name in self.indexed_attributes:
+                if name in resource.attributes:
+                    pair = (name, resource.attributes[name])
+                    try:
+                        hash(pair)
+                    except TypeError:
+                        continue
+                    pairs.add(pair)
+
+        old = self.attribute_values.pop(key, frozenset())
+        for pair in old - pairs:
+            keys = self._get_attribute_keys(pair)
+            keys.discard(key)
+            if not len(keys):
+                self.attribute_index.pop(pair)
+        for pair in pairs - old:
+            self._get_attribute_keys(pair).add(key)
+
+        if len(pairs):
+            self.attribute_values[key] = frozenset(pairs)
+
+
+# the indexes which are shared between the snapshots of the registry.
+INDEXES = ['backends', 'locations', 'names', 'resources', 'partitions',
+           'ordered', 'members', 'memberships', 'indexed_attributes',
+           'attribute_index', 'attribute_values']
+
+
+class Snapshot(object):
+    '''
+    Immutable version of the indexes of a SnapshotRegistry.
+    '''
+
+    __slots__ = INDEXES + ['revision']
+
+    def __init__(self, registry):
+        for name in INDEXES:
+            setattr(self, name, getattr(registry, name))
+        self.revision = registry.revision
+
+
+class SnapshotRegistry(NonePersistentRegistry):
+    '''
+    Copy-on-write version of the NonePersistentRegistry for read-mostly
+    services.
+
+    Writers change private copies of the indexes and publish them as a new
+    Snapshot once they are done - all changes done within one transaction
+    are published at once. Readers grab the current snapshot without taking
+    any lock and will never block on a writer.
+
+    Only the indexes are versioned - the entities themselves are shared. The
+    big indexes are chunked (see occi.chunked) so the copies share all
+    chunks but the ones which are changed - a write copies O(sqrt(n))
+    references instead of the whole indexes.
+    '''
+
+    def __init__(self, journal=None, category_cache_size=CATEGORY_CACHE_SIZE):
+        '''
+        Constructor.
+
+        journal -- Optional occi.journal.Journal - the registry is restored
+                   from it and all changes are logged to it.
+        category_cache_size -- Number of parsed category strings which are
+                               cached.
+        '''
+        self.write_lock = threading.RLock()
+        self.writer = None
+        self.depth = 0
+        # nested containers which are already copied for the current write.
+        self.copied = set()
+        self.snapshot = None
+        super(SnapshotRegistry, self).__init__(journal, category_cache_size)
+        self.snapshot = Snapshot(self)
+
+    def set_backend(self, category, backend, extras):
+        with self._write():
+            super(SnapshotRegistry, self).set_backend(category, backend,
+                                                      extras)
+
+    def delete_mixin(self, mixin, extras):
+        with self._write():
+            super(SnapshotRegistry, self).delete_mixin(mixin, extras)
+
+    @contextlib.contextmanager
+    def transaction(self, extras):
+        with self._write():
+            with super(SnapshotRegistry, self).transaction(extras):
+                yield
+
+    def _view(self):
+        if self.writer is threading.current_thread() or self.snapshot is None:
+            # writers see their own changes (nothing is published while the
+            # registry is being restored).
+            return self
+        return self.snapshot
+
+    @contextlib.contextmanager
+    def _read(self):
+        yield self._view()
+
+    @contextlib.contextmanager
+    def _write(self):
+        with self.write_lock:
+            if not self.depth:
+                for name in INDEXES:
+                    setattr(self, name, getattr(self, name).copy())
+                self.copied = set()
+                self.writer = threading.current_thread()
+            self.depth += 1
+            try:
+                yield
+            finally:
+                self.depth -= 1
+                if not self.depth:
+                    self.snapshot = Snapshot(self)
+                    self.writer = None
+
+    def _create_index(self):
+        return ChunkedDict()
+
+    def _add_key(self, keys, key):
+        keys.add(key)
+
+    def _remove_key(self, keys, key):
+        keys.remove(key)
+
+    def _iter_keys(self, keys, start):
+        return keys.iter_from(start)
+
+    def _get_partition(self, owner):
+        return self._get_copy(self.partitions, owner, ChunkedDict)
+
+    def _get_ordered(self, owner):
+        return self._get_copy(self.ordered, owner, ChunkedList)
+
+    def _get_members(self, category):
+        return self._get_copy(self.members, category, ChunkedList)
+
+    def _get_attribute_keys(self, pair):
+        return self._get_copy(self.attribute_index, pair, ChunkedSet)
+
+    def _get_copy(self, index, key, factory):
+        '''
+        Returns a private copy of a nested container for changing it.
+
+        index -- The (already copied) index.
+        key -- The key of the nested container.
+        factory -- Type of the container.
+        '''
+        if key not in index:
+            index[key] = factory()
+            self.copied.add((id(index), key))
+        elif (id(index), key) not in self.copied:
+            index[key] = index[key].copy()
+            self.copied.add((id(index), key))
+        return index[key]
+
+
+def _slice_page(resources, start, limit):
+    '''
+    Returns up to limit of the resources with a key larger than start -
+    ordered by their keys.
+
+    resources -- The resources.
+    start -- The resources need to have a larger key (None for all).
+    limit -- Maximum number of resources.
+    '''
+    resources = sorted(resources, key=lambda res: res.identifier)
+    if start is not None:
+        keys = [res.identifier for res in resources]
+        resources = resources[bisect.bisect_right(keys, start):]
+    return resources[:limit]
+
+
+def _parse_media_ranges(header):
+    '''
+    Parse an Accept (or Content-Type) header into a list of media ranges.
+    Each range is a tuple (type, subtype, params, q, position).
+
+    header -- The header value.
+    '''
+    result = []
+    for position, item in enumerate(header.split(',')):
+        parts = item.split(';')
+        media = parts[0].strip().lower()
+        if media == '':
+            continue
+        if media.find('/') == -1:
+            media_type, subtype = media, ''
+        else:
+            media_type, subtype = media.split('/', 1)
+
+        params = {}
+        quality = 1.0
+        for param in parts[1:]:
+            if param.find('=') == -1:
+                continue
+            name, value = param.split('=', 1)
+            name = name.strip().lower()
+            if name == 'q':
+                try:
+                    quality = float(value.strip())
+                except ValueError:
+                    pass
+                # everything after q are accept-extensions.
+                break
+            params[name] = value.strip().strip('"')
+        result.append((media_type, subtype, params, quality, position))
+    return result
+
+
+def _negotiate(header, renderings, default_type):
+    '''
+    Find the rendering which fits best to a given header. Follows the rules
+    of RFC 2616, section 14.1: the highest q value wins; the most specific
+    matching range defines the q value of a mime type. Ties are broken by
+    specificity, the position in the header and finally the default type.
+
+    Returns None if no rendering is acceptable.
+
+    header -- The Accept or Content-Type header.
+    renderings -- Dictionary of mime type -> rendering.
+    default_type -- The default mime type of the service.
+    '''
+    ranges = _parse_media_ranges(header)
+
+    best = None
+    best_rank = None
+    for mime_type in sorted(renderings.keys()):
+        tmp = _parse_media_ranges(mime_type)
+        if not len(tmp):
+            continue
+        media_type, subtype, params = tmp[0][:3]
+
+        match = None
+        for rng in ranges:
+            if rng[0] == '*' and rng[1] == '*':
+                specificity = 0
+            elif rng[0] == media_type and rng[1] == '*':
+                specificity = 1
+            elif rng[0] == media_type and rng[1] == subtype:
+                specificity = 2
+                # only parameters the rendering declares make the range more
+                # specific (RFC 7231, section 5.3.2).
+                for name in rng[2]:
+                    if name not in params:
+                        continue
+                    if params[name] != rng[2][name]:
+                        specificity = -1
+                        break
+                    specificity += 1
+            else:
+                continue
+            if specificity >= 0 and (match is None or specificity > match[0]):
+                match = (specificity, rng)
+
+        if match is None or match[1][3] <= 0:
+            continue
+
+        rank = (match[1][3], match[0], -match[1][4], mime_type == default_type)
+        if best_rank is None or rank > best_rank:
+            best, best_rank = renderings[mime_type], rank
+    return best
@@ -0,0 +1,526 @@
+# coding=utf-8
+#
+# Copyright (C) 2010-2012 Platform Computing
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+'''
+A persistent registry which stores the resources in a SQLite database.
+
+Created on Oct 17, 2026
+'''
+
+from occi.backend import UserDefinedMixinBackend
+from occi.core_model import Action, Entity, Kind, Link, Mixin, Resource
+from occi.registry import CATEGORY_CACHE_SIZE, NonePersistentRegistry
+import contextlib
+import cPickle as pickle
+import sqlite3
+import threading
+import uuid
+import weakref
+
+SCHEMA = ['CREATE TABLE IF NOT EXISTS owners ('
+          ' id INTEGER PRIMARY KEY,'
+          ' owner BLOB NOT NULL)',
+          'CREATE TABLE IF NOT EXISTS categories ('
+          ' scheme TEXT NOT NULL,'
+          ' term TEXT NOT NULL,'
+          ' owner INTEGER,'
+          ' location TEXT,'
+          ' state BLOB NOT NULL)',
+          'CREATE UNIQUE INDEX IF NOT EXISTS categories_name'
+          ' ON categories (scheme, term, owner)',
+          'CREATE TABLE IF NOT EXISTS resources ('
+          ' key TEXT PRIMARY KEY,'
+          ' type TEXT NOT NULL,'
+          ' owner INTEGER,'
+          ' state BLOB NOT NULL)',
+          'CREATE INDEX IF NOT EXISTS resources_owner'
+          ' ON resources (owner, key)',
+          'CREATE TABLE IF NOT EXISTS memberships ('
+          ' key TEXT NOT NULL,'
+          ' scheme TEXT NOT NULL,'
+          ' term TEXT NOT NULL,'
+          ' class TEXT NOT NULL,'
+          ' owner INTEGER,'
+          ' position INTEGER NOT NULL)',
+          'CREATE INDEX IF NOT EXISTS memberships_category'
+          ' ON memberships (scheme, term, owner, key)',
+          'CREATE INDEX IF NOT EXISTS memberships_key'
+          ' ON memberships (key)',
+          'CREATE TABLE IF NOT EXISTS links ('
+          ' key TEXT PRIMARY KEY,'
+          ' source TEXT,'
+          ' target TEXT)',
+          'CREATE INDEX IF NOT EXISTS links_source ON links (source)']
+
+CATEGORY_TYPES = {'kind': Kind, 'mixin': Mixin, 'action': Action}
+
+
+def _dump(obj):
+    '''
+    Serialize an object into a BLOB.
+
+    obj -- The object.
+    '''
+    return sqlite3.Binary(pickle.dumps(obj, pickle.HIGHEST_PROTOCOL))
+
+
+def _load(blob):
+    '''
+    Deserialize a BLOB.
+
+    blob -- The BLOB from the database.
+    '''
+    return pickle.loads(str(blob))
+
+
+class SqliteRegistry(NonePersistentRegistry):
+    '''
+    Registry which keeps resources, links, user-defined mixins and owners
+    (the values returned by get_extras()) in a SQLite database.
+
+    Kinds, actions and mixins with own backends are registered by the
+    application on every start-up and stay in memory. Only the entities
+    which are currently in use are held as Python objects - everything else
+    is loaded on demand. Category, prefix and owner lookups are done by
+    SQLite using the indexes defined in SCHEMA.
+
+    Changes done within one workflow operation are written in a single
+    transaction (see Registry.transaction).
+    '''
+
+    def __init__(self, database=':memory:',
+                 category_cache_size=CATEGORY_CACHE_SIZE):
+        '''
+        Constructor.
+
+        database -- Path to the database file (default: in memory).
+        category_cache_size -- Number of parsed category strings which are
+                               cached.
+        '''
+        self.lock = threading.RLock()
+        self.depth = 0
+        # identity map - so everybody works on the same object.
+        self.live = weakref.WeakValueDictionary()
+        # keys written within the current transaction.
+        self.written = set()
+        # (scheme, term, owner id) -> category
+        self.named = {}
+        self.owner_ids = {}
+        self.owners = {}
+        # versions are only unique within one process (see core_model).
+        self.epoch = uuid.uuid4().hex
+
+        self.conn = sqlite3.connect(database, check_same_thread=False,
+                                    isolation_level=None)
+        self.conn.text_factory = str
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        for statement in SCHEMA:
+            self.conn.execute(statement)
+
+        super(SqliteRegistry, self).__init__(
+            category_cache_size=category_cache_size)
+
+        for identifier, owner in self.conn.execute('SELECT id, owner FROM'
+                                                   ' owners'):
+            self.owners[identifier] = _load(owner)
+            self.owner_ids[self.owners[identifier]] = identifier
+        for row in self.conn.execute('SELECT scheme, term, owner, location,'
+                                     ' state FROM categories'):
+            state = _load(row[4])
+            mixin = Mixin(row[0], row[1], location=row[3],
+                          title=state['title'], attributes=state['attributes'])
+            mixin.related = [self._get_category(item[0], item[1], item[2],
+                                                item[3])
+                             for item in state['related']]
+            mixin.extras = self.owners.get(row[2])
+            super(SqliteRegistry, self).set_backend(mixin,
+                                                    UserDefinedMixinBackend(),
+                                                    None)
+            self.named[(row[0], row[1], row[2])] = mixin
+
+    def close(self):
+        '''
+        Close the database connection.
+        '''
+        with self.lock:
+            self.conn.close()
+
+    @contextlib.contextmanager
+    def transaction(self, extras):
+        with self.lock:
+            if self.depth == 0:
+                self.conn.execute('BEGIN')
+            self.depth += 1
+            try:
+                yield
+            except:
+                self.depth -= 1
+                if self.depth == 0:
+                    self.conn.execute('ROLLBACK')
+                    # objects might hold changes which never made it - they
+                    # are loaded from the database again.
+                    for key in self.written:
+                        self.live.pop(key, None)
+                    self.written = set()
+                raise
+            else:
+                self.depth -= 1
+                if self.depth == 0:
+                    self.conn.execute('COMMIT')
+                    self.written = set()
+
+    #==========================================================================
+    # Categories
+    #==========================================================================
+
+    def set_backend(self, category, backend, extras):
+        super(SqliteRegistry, self).set_backend(category, backend, extras)
+        with self.transaction(extras):
+            owner = self._get_owner_id(category.extras, True)
+            self.named[(category.scheme, category.term, owner)] = category
+            if isinstance(backend, UserDefinedMixinBackend):
+                state = {'title': category.title,
+                         'attributes': category.attributes,
+                         'related': [self._category_ref(item)
+                                     for item in category.related]}
+                self.conn.execute('INSERT OR REPLACE INTO categories (scheme,'
+                                  ' term, owner, location, state) VALUES'
+                                  ' (?, ?, ?, ?, ?)',
+                                  (category.scheme, category.term, owner,
+                                   category.location, _dump(state)))
+
+    def delete_mixin(self, mixin, extras):
+        super(SqliteRegistry, self).delete_mixin(mixin, extras)
+        with self.transaction(extras):
+            owner = self._get_owner_id(mixin.extras)
+            self.named.pop((mixin.scheme, mixin.term, owner), None)
+            self.conn.execute('DELETE FROM categories WHERE scheme = ? AND'
+                              ' term = ? AND owner IS ?',
+                              (mixin.scheme, mixin.term, owner))
+
+    #==========================================================================
+    # Resources
+    #==========================================================================
+
+    def get_resource(self, key, extras):
+        with self.lock:
+            resource = self._load_entity(key)
+        if resource.extras is not None and \
+                resource.extras != self.get_extras(extras):
+            raise KeyError
+        return resource
+
+    def add_resource(self, key, resource, extras):
+        if extras is not None:
+            resource.extras = self.get_extras(extras)
+        with self.transaction(extras):
+            self._store_entity(key, resource)
+            self.live[key] = resource
+            self.revision += 1
+
+    def delete_resource(self, key, extras):
+        with self.transaction(extras):
+            self.conn.execute('DELETE FROM resources WHERE key = ?', (key,))
+            self.conn.execute('DELETE FROM memberships WHERE key = ?', (key,))
+            self.conn.execute('DELETE FROM links WHERE key = ?', (key,))
+            self.written.add(key)
+            self.revision += 1
+            entity = self.live.pop(key, None)
+            if isinstance(entity, Link):
+                self._store_source(entity.source)
+
+    def update_resource(self, key, entity, extras):
+        with self.transaction(extras):
+            if self.live.get(key) is entity or \
+                    self.conn.execute('SELECT 1 FROM resources WHERE key = ?',
+                                      (key,)).fetchone() is not None:
+                self._store_entity(key, entity)
+                self.live[key] = entity
+                self.revision += 1
+
+    def get_resource_keys(self, extras):
+        with self.lock:
+            cursor = self.conn.execute('SELECT key FROM resources WHERE'
+                                       ' owner IS NULL OR owner = ?'
+                                       ' ORDER BY key',
+                                       (self._get_caller_id(extras),))
+            return [row[0] for row in cursor]
+
+    def get_resources(self, extras):
+        with self.lock:
+            return [self._load_entity(key)
+                    for key in self.get_resource_keys(extras)]
+
+    def get_resources_of_category(self, category, extras):
+        with self.lock:
+            owner = self._get_owner_id(category.extras)
+            cursor = self.conn.execute('SELECT m.key FROM memberships m JOIN'
+                                       ' resources r ON r.key = m.key'
+                                       ' WHERE m.scheme = ? AND m.term = ?'
+                                       ' AND m.owner IS ? AND (r.owner IS'
+                                       ' NULL OR r.owner = ?)'
+                                       ' ORDER BY m.key',
+                                       (category.scheme, category.term, owner,
+                                        self._get_caller_id(extras)))
+            return [self._load_entity(row[0]) for row in cursor.fetchall()]
+
+    def get_resources_under_prefix(self, prefix, extras):
+        with self.lock:
+            query = 'SELECT key FROM resources WHERE key >= ? AND (owner' \
+                    ' IS NULL OR owner = ?)'
+            args = [prefix, self._get_caller_id(extras)]
+            if len(prefix) and ord(prefix[-1]) < 255:
+                query += ' AND key < ?'
+                args.append(prefix[:-1] + chr(ord(prefix[-1]) + 1))
+            cursor = self.conn.execute(query + ' ORDER BY key', args)
+            return [self._load_entity(row[0]) for row in cursor.fetchall()
+                    if row[0].startswith(prefix)]
+
+    def get_page_of_category(self, category, extras, start, limit):
+        with self.lock:
+            owner = self._get_owner_id(category.extras)
+            cursor = self.conn.execute('SELECT m.key FROM memberships m JOIN'
+                                       ' resources r ON r.key = m.key'
+                                       ' WHERE m.scheme = ? AND m.term = ?'
+                                       ' AND m.owner IS ? AND (r.owner IS'
+                                       ' NULL OR r.owner = ?) AND m.key > ?'
+                                       ' ORDER BY m.key LIMIT ?',
+                                       (category.scheme, category.term, owner,
+                                        self._get_caller_id(extras),
+                                        start or '', limit))
+            return [self._load_entity(row[0]) for row in cursor.fetchall()]
+
+    def get_page_under_prefix(self, prefix, extras, start, limit):
+        with self.lock:
+            query = 'SELECT key FROM resources WHERE key >= ? AND (owner' \
+                    ' IS NULL OR owner = ?)'
+            args = [prefix, self._get_caller_id(extras)]
+            if len(prefix) and ord(prefix[-1]) < 255:
+                query += ' AND key < ?'
+                args.append(prefix[:-1] + chr(ord(prefix[-1]) + 1))
+            if start is not None:
+                query += ' AND key > ?'
+                args.append(start)
+            cursor = self.conn.execute(query + ' ORDER BY key LIMIT ?',
+                                       args + [limit])
+            return [self._load_entity(row[0]) for row in cursor.fetchall()
+                    if row[0].startswith(prefix)]
+
+    def get_resource_keys_by_attribute(self, name, value, extras):
+        # attributes are stored pickled - cannot be looked up.
+        return None
+
+    #==========================================================================
+    # Helpers
+    #==========================================================================
+
+    def _get_owner_id(self, owner, create=False):
+        '''
+        Return the id of an owner. Returns -1 for unknown owners unless
+        create is set.
+
+        owner -- The owner (return value of get_extras()).
+        create -- Add the owner if it is not known yet.
+        '''
+        if owner is None:
+            return None
+        if owner not in self.owner_ids:
+            if not create:
+                return -1
+            cursor = self.conn.execute('INSERT INTO owners (owner) VALUES'
+                                       ' (?)', (_dump(owner),))
+            self.owner_ids[owner] = cursor.lastrowid
+            self.owners[cursor.lastrowid] = owner
+        return self.owner_ids[owner]
+
+    def _get_caller_id(self, extras):
+        '''
+        Return the owner id for the caller.
+
+        extras -- Extras object - same as the one passed on to the backends.
+        '''
+        if extras is None:
+            return None
+        return self._get_owner_id(self.get_extras(extras))
+
+    def _category_ref(self, category):
+        '''
+        Returns a tuple which can be stored and later be turned into the
+        category again.
+
+        category -- The category.
+        '''
+        return (category.scheme, category.term, repr(category),
+                self._get_owner_id(category.extras, True))
+
+    def _get_category(self, scheme, term, cls, owner):
+        '''
+        Find a registered category. If it is not registered (anymore) a new
+        one is created.
+
+        scheme -- The scheme.
+        term -- The term.
+        cls -- The class of the category (kind, mixin, action).
+        owner -- The id of the owner.
+        '''
+        try:
+            return self.named[(scheme, term, owner)]
+        except KeyError:
+            category = CATEGORY_TYPES.get(cls, Kind)(scheme, term)
+            category.extras = self.owners.get(owner)
+            return category
+
+    def _store_entity(self, key, entity):
+        '''
+        Write an entity into the database.
+
+        key -- Unique identifier of the entity.
+        entity -- The entity.
+        '''
+        if isinstance(entity, Link):
+            entity_type = 'link'
+        elif isinstance(entity, Resource):
+            entity_type = 'resource'
+        else:
+            entity_type = 'entity'
+        self.written.add(key)
+        self.conn.execute('INSERT OR REPLACE INTO resources (key, type, owner,'
+                          ' state) VALUES (?, ?, ?, ?)',
+                          (key, entity_type,
+                           self._get_owner_id(entity.extras, True),
+                           _dump(self._get_state(entity))))
+
+        self.conn.execute('DELETE FROM memberships WHERE key = ?', (key,))
+        rows = []
+        for position, category in enumerate([entity.kind] +
+                                             list(entity.mixins or [])):
+            if category is not None:
+                rows.append((key,) + self._category_ref(category) +
+                            (position,))
+        self.conn.executemany('INSERT INTO memberships (key, scheme, term,'
+                              ' class, owner, position) VALUES'
+                              ' (?, ?, ?, ?, ?, ?)', rows)
+
+        if entity_type == 'link':
+            self.conn.execute('INSERT OR REPLACE INTO links (key, source,'
+                              ' target) VALUES (?, ?, ?)',
+                              (key, entity.source.identifier,
+                               entity.target.identifier))
+            self._store_source(entity.source)
+
+    def _store_source(self, source):
+        '''
+        Write the state of the source of a link which was changed - its
+        version changes with its links (see workflow.touch).
+
+        source -- The source of the link.
+        '''
+        if source is not None and \
+                self.live.get(source.identifier) is source:
+            self.written.add(source.identifier)
+            self.conn.execute('UPDATE resources SET state = ? WHERE key = ?',
+                              (_dump(self._get_state(source)),
+                               source.identifier))
+
+    def _get_state(self, entity):
+        '''
+        Returns the part of an entity which is stored as BLOB.
+
+        entity -- The entity.
+        '''
+        return {'title': entity.title,
+                'summary': getattr(entity, 'summary', None),
+                'attributes': entity.attributes,
+                'actions': [self._category_ref(item)
+                            for item in entity.actions],
+                'version': (self.epoch, entity.version),
+                'modified': entity.modified}
+
+    def _load_entity(self, key):
+        '''
+        Return the entity with the given key - from the identity map or the
+        database. Raises KeyError if it does not exist.
+
+        key -- Unique identifier of the entity.
+        '''
+        entity = self.live.get(key)
+        if entity is not None:
+            return entity
+
+        row = self.conn.execute('SELECT type, owner, state FROM resources'
+                                ' WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        state = _load(row[2])
+
+        kind = None
+        mixins = []
+        for item in self.conn.execute('SELECT scheme, term, class, owner,'
+                                      ' position FROM memberships WHERE'
+                                      ' key = ? ORDER BY position', (key,)):
+            category = self._get_category(item[0], item[1], item[2], item[3])
+            if item[4] == 0:
+                kind = category
+            else:
+                mixins.append(category)
+
+        if row[0] == 'link':
+            entity = Link(key, kind, mixins, None, None, state['title'])
+        elif row[0] == 'resource':
+            entity = Resource(key, kind, mixins, [], state['summary'],
+                              state['title'])
+        else:
+            entity = Entity(key, state['title'], kind, mixins)
+        entity.attributes = state['attributes']
+        entity.actions = [self._get_category(*item)
+                          for item in state['actions']]
+        entity.extras = self.owners.get(row[1])
+        if 'version' in state:
+            epoch, version = state['version']
+            # versions of other processes must not clash with ours.
+            entity.version = version if epoch == self.epoch else \
+                state['version']
+            entity.modified = state['modified']
+
+        # register before resolving links - they point back to this one.
+        self.live[key] = entity
+        if row[0] == 'link':
+            source, target = self.conn.execute('SELECT source, target FROM'
+                                               ' links WHERE key = ?',
+                                               (key,)).fetchone()
+            entity.source = self._load_reference(source)
+            entity.target = self._load_reference(target)
+        elif row[0] == 'resource':
+            cursor = self.conn.execute('SELECT key FROM links WHERE'
+                                       ' source = ? ORDER BY rowid', (key,))
+            entity.links = [self._load_entity(item[0])
+                            for item in cursor.fetchall()]
+        return entity
+
+    def _load_reference(self, key):
+        '''
+        Load the source or target of a link. If it no longer exists a bare
+        resource with only the identifier set is returned.
+
+        key -- Unique identifier of the entity.
+        '''
+        try:
+            return self._load_entity(key)
+        except KeyError:
+            return Resource(key, Resource.kind, [])
@@ -25,8 +25,10 @@ Created on Jun 30, 2011
 '''
 
 from occi.backend import UserDefinedMixinBackend
-from occi.core_model import Resource, Link, Mixin
-from occi.exceptions import HTTPError
+from occi.core_model import Resource, Link, Mixin, VERSIONS
+from occi.exceptions import BackendErrors, HTTPError
+import bisect
+import time
 import uuid
 
 #==============================================================================
@@ -34,7 +36,7 @@ import uuid
 #==============================================================================
 
 
-def create_entity(key, entity, registry, extras):
+def create_entity(key, entity, registry, extras, executor=None):
     '''
     Handles all the model magic during creation of an entity.
 
@@ -46,35 +48,62 @@ def create_entity(key, entity, registry, extras):
     entity -- The entity itself - either Link or Resource instance.
     registry -- The registry used for this process.
     extras -- Any extra arguments which are defined by the user.
+    executor -- ThreadPool to call the backends concurrently (optional).
     '''
     entity.identifier = key
+    create_entities([entity], registry, extras, executor)
 
-    # if it is an resource we create make sure we create the links properly
-    if isinstance(entity, Resource):
-        # if it's a resource - set/create links properly.
-        for link in entity.links:
-            # FUTURE_IMPROVEMENT: string links
-            if link.identifier is None:
-                link.identifier = create_id(link.kind)
-            elif link.identifier in registry.get_resource_keys(extras):
-                raise AttributeError('A link with that id is already present')
 
-            for back in registry.get_all_backends(link, extras):
-                back.create(link, extras)
-
-            registry.add_resource(link.identifier, link, extras)
-    elif isinstance(entity, Link):
-        entity.source.links.append(entity)
-
-    # call all the backends who are associated with this entity.kind...
-    backends = registry.get_all_backends(entity, extras)
-    for backend in backends:
-        backend.create(entity, extras)
-
-    registry.add_resource(key, entity, extras)
+def create_entities(entities, registry, extras, executor=None):
+    '''
+    Creates a set of entities - each backend is called once with all the
+    entities it handles (see KindBackend.create_many). Entities without an
+    identifier get one (see create_id).
 
+    The links of resources are created as well. Links are added to the links
+    list of their source.
 
-def delete_entity(entity, registry, extras):
+    entities -- The entities - either Link or Resource instances.
+    registry -- The registry used for this process.
+    extras -- Any extra arguments which are defined by the user.
+    executor -- ThreadPool to call the backends concurrently (optional).
+    '''
+    targets = []
+    keys = set()
+    for entity in entities:
+        if entity.identifier is None:
+            entity.identifier = create_id(entity.kind)
+
+        # if it is an resource we create make sure we create the links
+        # properly
+        if isinstance(entity, Resource):
+            # if it's a resource - set/create links properly.
+            for link in entity.links:
+                # FUTURE_IMPROVEMENT: string links
+                if link.identifier is None:
+                    link.identifier = create_id(link.kind)
+                elif link.identifier in keys or \
+                        _is_present(link.identifier, registry, extras):
+                    raise AttributeError('A link with that id is already'
+                                         ' present')
+                keys.add(link.identifier)
+                targets.append(link)
+        elif isinstance(entity, Link):
+            entity.source.links.append(entity)
+        targets.append(entity)
+
+    # call all the backends who are associated with the entities...
+    _call_backends(_group_calls(targets, 'create_many', registry, extras),
+                   registry, executor)
+
+    # the registry is only locked for the writes - not for the backends.
+    with registry.transaction(extras):
+        for entity in targets:
+            touch(entity)
+            registry.add_resource(entity.identifier, entity, extras)
+
+
+def delete_entity(entity, registry, extras, executor=None):
     '''
     Handles all the model magic during deletion if an entity.
 
@@ -83,24 +112,50 @@ def delete_entity(entity, registry, extras):
     entity -- The entity itself - either Link or Resource instance.
     registry -- The registry used for this process.
     extras -- Any extra arguments which are defined by the user.
+    executor -- ThreadPool to call the backends concurrently (optional).
     '''
-    if isinstance(entity, Resource):
-        # it's an resource - so delete all it's links
-        # FUTURE_IMPROVEMENT: string links
-        for link in entity.links:
-            for back in registry.get_all_backends(link, extras):
-                back.delete(link, extras)
-            registry.delete_resource(link.identifier, extras)
-    elif isinstance(entity, Link):
-        entity.source.links.remove(entity)
+    delete_entities([entity], registry, extras, executor)
 
-    # call all the backends who are associated with this entity.kind...
-    backends = registry.get_all_backends(entity, extras)
 
-    for backend in backends:
-        backend.delete(entity, extras)
+def delete_entities(entities, registry, extras, executor=None):
+    '''
+    Deletes a set of entities - each backend is called once with all the
+    entities it handles (see KindBackend.delete_many).
+
+    The links of resources are deleted as well. Links are removed from the
+    links list of their source.
+
+    entities -- The entities - either Link or Resource instances.
+    registry -- The registry used for this process.
+    extras -- Any extra arguments which are defined by the user.
+    executor -- ThreadPool to call the backends concurrently (optional).
+    '''
+    targets = []
+    seen = set()
+    for entity in entities:
+        if isinstance(entity, Resource):
+            # it's an resource - so delete all it's links
+            # FUTURE_IMPROVEMENT: string links
+            items = entity.links + [entity]
+        else:
+            items = [entity]
+        for item in items:
+            if id(item) not in seen:
+                seen.add(id(item))
+                targets.append(item)
+    for entity in entities:
+        if isinstance(entity, Link) and entity in entity.source.links:
+            entity.source.links.remove(entity)
+
+    # call all the backends who are associated with the entities...
+    _call_backends(_group_calls(targets, 'delete_many', registry, extras),
+                   registry, executor, ordered_first=True)
 
-    registry.delete_resource(entity.identifier, extras)
+    # the registry is only locked for the writes - not for the backends.
+    with registry.transaction(extras):
+        for entity in targets:
+            touch(entity)
+            registry.delete_resource(entity.identifier, extras)
 
 
 def replace_entity(old, new, registry, extras):
@@ -131,6 +186,8 @@ def replace_entity(old, new, registry, extras):
         backend.create(new, extras)
     for backend in unique(backends, new_backends):
         backend.delete(old, extras)
+    touch(old)
+    registry.update_resource(old.identifier, old, extras)
     del new
 
 
@@ -157,31 +214,42 @@ def update_entity(old, new, registry, extras):
     for backend in unique(new_backends, backends):
         # for added mixins called create!
         backend.create(old, extras)
+    touch(old)
+    registry.update_resource(old.identifier, old, extras)
 
     del new
 
 
-def retrieve_entity(entity, registry, extras):
+def retrieve_entity(entity, registry, extras, executor=None):
     '''
     Retrieves/refreshed an entity.
 
     If it's a link the entities must be retrieved/refreshed.
 
+    Entities which the backends changed are touched and updated in the
+    registry so its indexes stay current.
+
     entity -- The entity which is to be retrieved.
     registry -- The registry used for this process.
     extras -- Any extra arguments which are defined by the user.
+    executor -- ThreadPool to call the backends concurrently (optional).
     '''
+    entities = []
     if isinstance(entity, Resource):
         # if it's a resource - retrieve all links...
-        for link in entity.links:
-            # FUTURE_IMPROVEMENT: string links
-            for back in registry.get_all_backends(link, extras):
-                back.retrieve(link, extras)
+        # FUTURE_IMPROVEMENT: string links
+        entities.extend(entity.links)
 
     # call all the backends who are associated with this entity.kind...
-    backends = registry.get_all_backends(entity, extras)
-    for backend in backends:
-        backend.retrieve(entity, extras)
+    entities.append(entity)
+    states = [_get_state(item) for item in entities]
+    _call_backends(_group_calls(entities, 'retrieve_many', registry, extras),
+                   registry, executor)
+
+    for item, state in zip(entities, states):
+        if _get_state(item) != state:
+            touch(item)
+            registry.update_resource(item.identifier, item, extras)
 
 
 def action_entity(entity, action, registry, attributes, extras):
@@ -196,6 +264,87 @@ def action_entity(entity, action, registry, attributes, extras):
     '''
     backend = registry.get_backend(action, extras)
     backend.action(entity, action, attributes, extras)
+    touch(entity)
+    registry.update_resource(entity.identifier, entity, extras)
+
+
+def action_entities(entities, action, registry, attributes, extras,
+                    executor=None):
+    '''
+    Performs an action on a set of entities and returns the outcome for each
+    of them as (entity, status code, message) tuples.
+
+    Entities which do not list the action as applicable are skipped (409). A
+    failing entity (AttributeError or HTTPError) does not stop the others.
+    The backend gets the entities in batches (see ActionBackend.action_many)
+    - with an executor one batch per thread, which are done concurrently.
+
+    entities -- The entities on which to perform the operation.
+    action -- The action definition.
+    registry -- The registry used for this process.
+    attributes -- The attributes fro the operation.
+    extras -- Any extra arguments which are defined by the user.
+    executor -- ThreadPool to perform the actions concurrently (optional).
+    '''
+    results = []
+    outcomes = []
+    for entity in entities:
+        if action not in entity.actions:
+            results.append([entity, 409, 'Action not applicable.'])
+            continue
+        outcome = [entity, 200, 'OK']
+        results.append(outcome)
+        outcomes.append(outcome)
+
+    size = len(outcomes)
+    if executor is not None:
+        size = -(-size // executor.max_workers)
+    calls = []
+    for i in range(0, len(outcomes), max(size, 1)):
+        calls.append((_try_action, (outcomes[i:i + size], action, registry,
+                                    attributes, extras)))
+
+    if executor is None:
+        for func, args in calls:
+            func(*args)
+    else:
+        errors = executor.run(_with_hostname(calls, registry))
+        if len(errors):
+            _raise_errors(errors)
+    return [tuple(item) for item in results]
+
+
+def _try_action(outcomes, action, registry, attributes, extras):
+    '''
+    Performs an action on a batch of entities and records the failures in
+    the outcomes.
+
+    outcomes -- List of [entity, status code, message] lists.
+    action -- The action definition.
+    registry -- The registry used for this process.
+    attributes -- The attributes fro the operation.
+    extras -- Any extra arguments which are defined by the user.
+    '''
+    backend = registry.get_backend(action, extras)
+    entities = [outcome[0] for outcome in outcomes]
+    try:
+        errors = backend.action_many(entities, action, attributes, extras)
+    except (AttributeError, HTTPError) as err:
+        errors = [(entity, err) for entity in entities]
+
+    failed = {}
+    for entity, err in errors:
+        failed[id(entity)] = err
+    for outcome in outcomes:
+        err = failed.get(id(outcome[0]))
+        if isinstance(err, HTTPError):
+            outcome[1:] = [err.code, err.message]
+        elif err is not None:
+            outcome[1:] = [400, str(err)]
+        else:
+            touch(outcome[0])
+            registry.update_resource(outcome[0].identifier, outcome[0],
+                                     extras)
 
 #==============================================================================
 # Collections
@@ -216,10 +365,15 @@ def update_collection(mixin, old_entities, new_entities, registry, extras):
     if not isinstance(mixin, Mixin):
         raise AttributeError('This operation is only supported on Collections'
                              + ' of Mixins.')
-    for entity in unique(new_entities, old_entities):
-        entity.mixins.append(mixin)
-        backend = registry.get_backend(mixin, extras)
-        backend.create(entity, extras)
+    backend = registry.get_backend(mixin, extras)
+    changed = []
+    try:
+        for entity in unique(new_entities, old_entities):
+            entity.mixins.append(mixin)
+            backend.create(entity, extras)
+            changed.append(entity)
+    finally:
+        _update_entities(changed, registry, extras)
     del new_entities
 
 
@@ -239,14 +393,19 @@ def replace_collection(mixin, old_entities, new_entities, registry, extras):
     if not isinstance(mixin, Mixin):
         raise AttributeError('This operation is only supported on Collections'
                              + ' of Mixins.')
-    for entity in unique(new_entities, old_entities):
-        entity.mixins.append(mixin)
-        backend = registry.get_backend(mixin, extras)
-        backend.create(entity, extras)
-    for entity in unique(old_entities, new_entities):
-        backend = registry.get_backend(mixin, extras)
-        backend.delete(entity, extras)
-        entity.mixins.remove(mixin)
+    backend = registry.get_backend(mixin, extras)
+    changed = []
+    try:
+        for entity in unique(new_entities, old_entities):
+            entity.mixins.append(mixin)
+            backend.create(entity, extras)
+            changed.append(entity)
+        for entity in unique(old_entities, new_entities):
+            backend.delete(entity, extras)
+            entity.mixins.remove(mixin)
+            changed.append(entity)
+    finally:
+        _update_entities(changed, registry, extras)
     del new_entities
 
 
@@ -263,10 +422,15 @@ def delete_from_collection(mixin, entities, registry, extras):
         raise AttributeError('This operation is only supported on Collections'
                              + ' of Mixins.')
 
-    for entity in intersect(entities, registry.get_resources(extras)):
-        backend = registry.get_backend(mixin, extras)
-        backend.delete(entity, extras)
-        entity.mixins.remove(mixin)
+    backend = registry.get_backend(mixin, extras)
+    changed = []
+    try:
+        for entity in intersect(entities, registry.get_resources(extras)):
+            backend.delete(entity, extras)
+            entity.mixins.remove(mixin)
+            changed.append(entity)
+    finally:
+        _update_entities(changed, registry, extras)
 
 
 def get_entities_under_path(path, registry, extras):
@@ -282,42 +446,175 @@ def get_entities_under_path(path, registry, extras):
     registry -- The registry used for this process.
     extras -- Any extra arguments which are defined by the user.
     '''
-    result = []
-    if registry.get_category(path, extras) is None:
-        for res in registry.get_resources(extras):
-            if not res.identifier.find(path):
-                result.append(res)
-        return result
+    category = registry.get_category(path, extras)
+    if category is None:
+        return registry.get_resources_under_prefix(path, extras)
+    else:
+        return registry.get_resources_of_category(category, extras)
+
+
+def get_filtered_entities(path, categories, attributes, registry, extras):
+    '''
+    Return the entities under a path (see get_entities_under_path) which
+    match the given categories and attributes (see filter_entities).
+
+    If the registry indexes all the attributes only the resources found in
+    the index are looked at - not the whole collection.
+
+    path -- The path under which to look...
+    categories -- Categories which must be present in the entity.
+    attributes -- Attributes which must match with the entity's attrs.
+    registry -- The registry used for this process.
+    extras -- Any extra arguments which are defined by the user.
+    '''
+    keys = _get_candidates(attributes, registry, extras)
+    if keys is None:
+        entities = get_entities_under_path(path, registry, extras)
     else:
-        cat = registry.get_category(path, extras)
-        for res in registry.get_resources(extras):
-            if cat == res.kind or cat in res.mixins:
-                result.append(res)
-        return result
+        entities = _get_from_collection(sorted(keys), path, registry, extras)
+    return filter_entities(entities, categories, attributes, registry,
+                           extras)
+
+
+def get_page(path, categories, attributes, registry, extras, limit,
+             cursor=None):
+    '''
+    Return one page of the entities get_filtered_entities would return -
+    ordered by their identifiers - and whether more entities follow. Only
+    the entities up to the end of the page are looked at.
+
+    path -- The path under which to look...
+    categories -- Categories which must be present in the entity.
+    attributes -- Attributes which must match with the entity's attrs.
+    registry -- The registry used for this process.
+    extras -- Any extra arguments which are defined by the user.
+    limit -- Maximum number of entities on the page.
+    cursor -- Identifier of the last entity of the previous page (None for
+              the first page).
+    '''
+    # the entities are compared one by one - looking them up in the
+    # attribute index again would cost more than that.
+    result = []
+    keys = _get_candidates(attributes, registry, extras)
+    if keys is not None:
+        keys = sorted(keys)
+        if cursor is not None:
+            keys = keys[bisect.bisect_right(keys, cursor):]
+        for key in keys:
+            entities = _get_from_collection([key], path, registry, extras)
+            result.extend(filter_entities(entities, categories, attributes))
+            if len(result) > limit:
+                break
+        return result[:limit], len(result) > limit
+
+    category = registry.get_category(path, extras)
+    while len(result) <= limit:
+        # one more than needed - to know if there is a next page.
+        if category is None:
+            batch = registry.get_page_under_prefix(path, extras, cursor,
+                                                   limit + 1)
+        else:
+            batch = registry.get_page_of_category(category, extras, cursor,
+                                                  limit + 1)
+        result.extend(filter_entities(batch, categories, attributes))
+        if len(batch) < limit + 1:
+            break
+        cursor = batch[-1].identifier
+    return result[:limit], len(result) > limit
+
+
+def _get_candidates(attributes, registry, extras):
+    '''
+    Returns the keys of the resources which match at least one of the
+    attributes - every entity which passes filter_entities is one of them.
+    Returns None if the registry does not index all of the attributes.
+
+    attributes -- Attributes which must match with the entity's attrs.
+    registry -- The registry used for this process.
+    extras -- Any extra arguments which are defined by the user.
+    '''
+    if not len(attributes):
+        return None
+    result = set()
+    for name, value in attributes.items():
+        keys = registry.get_resource_keys_by_attribute(name, value, extras)
+        if keys is None:
+            return None
+        result.update(keys)
+    return result
+
+
+def _get_from_collection(keys, path, registry, extras):
+    '''
+    Returns the resources with the given keys which the caller can see and
+    which fall under a path (see get_entities_under_path).
+
+    keys -- The keys of the resources.
+    path -- The path under which to look...
+    registry -- The registry used for this process.
+    extras -- Any extra arguments which are defined by the user.
+    '''
+    category = registry.get_category(path, extras)
+    result = []
+    for key in keys:
+        try:
+            entity = registry.get_resource(key, extras)
+        except KeyError:
+            # belongs to somebody else.
+            continue
+        if category is None:
+            if entity.identifier.startswith(path):
+                result.append(entity)
+        elif category == entity.kind or category in entity.mixins:
+            result.append(entity)
+    return result
 
 
-def filter_entities(entities, categories, attributes):
+def filter_entities(entities, categories, attributes, registry=None,
+                    extras=None):
     '''
     Filters a set of entities and return those who match the given categories
     and attributes.
 
+    If a registry is given attributes it has indexed are looked up in the
+    registry instead of being compared entity by entity.
+
     entities -- The entities which are to be filtered.
     categories -- Categories which must be present in the entity.
     attributes -- Attributes which must match with the entity's attrs.
+    registry -- The registry used for this process (optional).
+    extras -- Any extra arguments which are defined by the user.
     '''
     result = []
     if len(categories) == 0 and len(attributes.keys()) == 0:
         return entities
 
+    # key -> number of matching attributes (for those which are indexed)
+    matches = {}
+    unindexed = {}
+    for name, value in attributes.items():
+        keys = None
+        if registry is not None:
+            keys = registry.get_resource_keys_by_attribute(name, value,
+                                                           extras)
+        if keys is None:
+            unindexed[name] = value
+        else:
+            for key in keys:
+                matches[key] = matches.get(key, 0) + 1
+
     for entity in entities:
         indy = 0
         if entity.kind in categories:
             indy += 1
         if len(intersect(categories, entity.mixins)):
             indy += 1
-        for attr in intersect(attributes.keys(), entity.attributes.keys()):
-            if entity.attributes[attr] == attributes[attr]:
-                indy += 3
+        indy += 3 * matches.get(entity.identifier, 0)
+        if len(unindexed):
+            for attr in intersect(unindexed.keys(),
+                                  entity.attributes.keys()):
+                if entity.attributes[attr] == unindexed[attr]:
+                    indy += 3
 
         if len(categories) > 0 and len(attributes.keys()) == 0 and indy >= 1:
             result.append(entity)
@@ -397,10 +694,14 @@ def remove_mixins(mixins, registry, extras):
         if not isinstance(backend, UserDefinedMixinBackend):
             raise HTTPError(403, 'This Mixin cannot be deleted!')
 
-        entities = get_entities_under_path(mixin.location, registry, extras)
-        for entity in entities:
-            entity.mixins.remove(mixin)
-        registry.delete_mixin(mixin, extras)
+        with registry.transaction(extras):
+            entities = get_entities_under_path(mixin.location, registry,
+                                               extras)
+            for entity in entities:
+                entity.mixins.remove(mixin)
+                touch(entity)
+                registry.update_resource(entity.identifier, entity, extras)
+            registry.delete_mixin(mixin, extras)
         del mixin
 
 #==============================================================================
@@ -408,6 +709,171 @@ def remove_mixins(mixins, registry, extras):
 #==============================================================================
 
 
+def _is_present(key, registry, extras):
+    '''
+    Returns True if a resource with the given key is registered.
+
+    key -- The key of the resource.
+    registry -- The registry used for this process.
+    extras -- Any extra arguments which are defined by the user.
+    '''
+    try:
+        registry.get_resource(key, extras)
+    except KeyError:
+        return False
+    return True
+
+
+def _update_entities(entities, registry, extras):
+    '''
+    Touch entities which were changed by the backends and update them in the
+    registry - in one transaction, which is only opened once the backends
+    are done so they do not hold up the registry.
+
+    entities -- The changed entities.
+    registry -- The registry used for this process.
+    extras -- Any extra arguments which are defined by the user.
+    '''
+    if not len(entities):
+        return
+    with registry.transaction(extras):
+        for entity in entities:
+            touch(entity)
+            registry.update_resource(entity.identifier, entity, extras)
+
+
+def _group_calls(entities, name, registry, extras):
+    '''
+    Group entities by their backends. Returns one call of the given batch
+    method per backend - in the order the backends are first seen.
+
+    entities -- The entities.
+    name -- Name of the batch method (e.g. create_many).
+    registry -- The registry used for this process.
+    extras -- Any extra arguments which are defined by the user.
+    '''
+    calls = []
+    groups = {}
+    for entity in entities:
+        for backend in registry.get_all_backends(entity, extras):
+            if id(backend) not in groups:
+                groups[id(backend)] = []
+                calls.append((backend, name, (groups[id(backend)], extras)))
+            groups[id(backend)].append(entity)
+    return calls
+
+
+def _call_backends(calls, registry, executor, ordered_first=False):
+    '''
+    Call the backends.
+
+    Without an executor the calls are done one after another. With one they
+    are done concurrently - except for backends which declare to be ordered
+    (see KindBackend.ordered): those are called one by one after the others
+    (or before them if ordered_first is set). Errors of concurrent calls are
+    raised together once all of them are done.
+
+    calls -- List of (backend, method name, arguments) tuples.
+    registry -- The registry used for this process.
+    executor -- The ThreadPool to use (or None).
+    ordered_first -- Call the ordered backends first (e.g. for deletes).
+    '''
+    if executor is None:
+        for backend, name, args in calls:
+            getattr(backend, name)(*args)
+        return
+
+    ordered = []
+    others = []
+    for backend, name, args in calls:
+        if getattr(backend, 'ordered', False):
+            ordered.append((getattr(backend, name), args))
+        else:
+            others.append((getattr(backend, name), args))
+
+    if ordered_first:
+        for func, args in ordered:
+            func(*args)
+    errors = executor.run(_with_hostname(others, registry))
+    if len(errors):
+        _raise_errors(errors)
+    if not ordered_first:
+        for func, args in ordered:
+            func(*args)
+
+
+def _with_hostname(calls, registry):
+    '''
+    Wrap calls so they see the hostname of the current request when done by
+    another thread - the registry keeps the hostname per thread.
+
+    calls -- List of (function, arguments) tuples.
+    registry -- The registry used for this process.
+    '''
+    hostname = registry.get_hostname()
+
+    def call(func, *args):
+        '''
+        Set the hostname for the current thread and do the call.
+        '''
+        registry.set_hostname(hostname)
+        return func(*args)
+
+    return [(call, (func,) + tuple(args)) for func, args in calls]
+
+
+def _raise_errors(errors):
+    '''
+    Raise the errors of several calls as one. A single error is raised as
+    it is - several ones as BackendErrors (or HTTPError if one of them was an
+    HTTPError). Unexpected errors are raised as they are.
+
+    errors -- List of exc_info tuples.
+    '''
+    if len(errors) == 1:
+        raise errors[0][0], errors[0][1], errors[0][2]
+    values = [item[1] for item in errors]
+    for item in errors:
+        if not isinstance(item[1], (AttributeError, HTTPError)):
+            raise item[0], item[1], item[2]
+    for value in values:
+        if isinstance(value, HTTPError):
+            raise HTTPError(value.code, str(BackendErrors(values)))
+    raise BackendErrors(values)
+
+
+def touch(entity):
+    '''
+    Give an entity a new version and modification time - needs to be called
+    whenever an entity is changed so cached renderings of it are not used
+    anymore. Links also change the rendering of their source.
+
+    entity -- The entity which was changed.
+    '''
+    entity.version = next(VERSIONS)
+    entity.modified = time.time()
+    if isinstance(entity, Link) and entity.source is not None:
+        entity.source.version = next(VERSIONS)
+        entity.source.modified = entity.modified
+
+
+def _get_state(entity):
+    '''
+    Returns a copy of everything which shows up in the rendering of an
+    entity - used to detect changes made by the backends.
+
+    entity -- The entity.
+    '''
+    state = [entity.title, list(entity.mixins), dict(entity.attributes),
+             list(entity.actions)]
+    if isinstance(entity, Resource):
+        state.append(entity.summary)
+        for link in entity.links:
+            state.append((link, link.target, list(link.mixins),
+                          dict(link.attributes)))
+    return state
+
+
 def create_id(kind):
     '''
     Create a key with the hierarchy of the entity encapsulated.
@@ -32,27 +32,42 @@ Created on 22.11.2011
 from occi import VERSION
 from occi.backend import KindBackend, MixinBackend, ActionBackend
 from occi.exceptions import HTTPError
-from occi.handlers import QUERY_STRING
+from occi.executor import ThreadPool
+from occi.jobs import JOB, JobBackend
+from occi.handlers import QUERY_STRING, RENDER_CACHE_BYTES, \
+    RENDER_CACHE_SIZE, create_render_cache
 from occi.handlers import QueryHandler, CollectionHandler, ResourceHandler, \
-    CATEGORY, LINK, ATTRIBUTE, LOCATION, ACCEPT, CONTENT_TYPE
+    CATEGORY, LINK, ATTRIBUTE, LOCATION, ACCEPT, CONTENT_TYPE, IF_NONE_MATCH, \
+    IF_MODIFIED_SINCE
 from occi.protocol.html_rendering import HTMLRendering
 from occi.protocol.json_rendering import JsonRendering
 from occi.protocol.occi_rendering import TextOcciRendering, \
     TextPlainRendering, TextUriListRendering
 from occi.registry import NonePersistentRegistry
-import StringIO
 import logging
 
 RETURN_CODES = {201: '201 Created',
                 200: '200 OK',
+                202: '202 Accepted',
+                207: '207 Multi-Status',
+                304: '304 Not Modified',
                 400: '400 Bad Request',
                 403: '403 Forbidden',
                 404: '404 Not Found',
                 405: '405 Method Not Allowed',
                 406: '406 Not Acceptable',
+                413: '413 Request Entity Too Large',
                 500: '500 Internal Server Error',
                 501: '501 Not implemented'}
 
+# Limits for a request - enforced before anything gets parsed. A limit of
+# None disables the check. All are disabled by default - pass the ones you
+# need to the Application (see the limits argument).
+LIMITS = {'max_body_bytes': None,
+          'max_header_values': None,
+          'max_links': None,
+          'max_attributes': None}
+
 
 def _parse_headers(environ):
     '''
@@ -80,22 +95,165 @@ def _parse_headers(environ):
         headers[CONTENT_TYPE] = environ.get('CONTENT_TYPE')
     if 'QUERY_STRING' in environ.keys():
         headers[QUERY_STRING] = environ.get('QUERY_STRING')
+    if 'HTTP_IF_NONE_MATCH' in environ.keys():
+        headers[IF_NONE_MATCH] = environ.get('HTTP_IF_NONE_MATCH')
+    if 'HTTP_IF_MODIFIED_SINCE' in environ.keys():
+        headers[IF_MODIFIED_SINCE] = environ.get('HTTP_IF_MODIFIED_SINCE')
 
     return headers
 
 
-def _parse_body(environ):
+def _count_values(name, value, counts):
+    '''
+    Add an upper bound for the number of links and attributes given in a
+    header value (or body line) to the counts. Only separators are counted
+    so this runs in linear time.
+
+    name -- Name of the header field.
+    value -- The value of the header field.
+    counts -- Dictionary with the number of links and attributes so far.
+    '''
+    if name == LINK:
+        counts[LINK] += value.count(',') + 1
+        # attributes of inline links count as well.
+        counts[ATTRIBUTE] += value.count(';')
+    elif name == ATTRIBUTE:
+        counts[ATTRIBUTE] += value.count(',') + 1
+
+
+def _check_counts(counts, limits):
+    '''
+    Raises an HTTPError if there are more links or attributes than allowed.
+
+    counts -- Dictionary with the number of links and attributes.
+    limits -- Dictionary with the limits (see LIMITS).
+    '''
+    max_links = limits.get('max_links')
+    if max_links is not None and counts[LINK] > max_links:
+        raise HTTPError(400, 'Too many links in the request.')
+
+    max_attributes = limits.get('max_attributes')
+    if max_attributes is not None and counts[ATTRIBUTE] > max_attributes:
+        raise HTTPError(400, 'Too many attributes in the request.')
+
+
+def _check_limits(heads, limits):
     '''
-    Parse the body from the WSGI environ.
+    Verify that the headers of the request stay within the given limits -
+    raises an HTTPError otherwise. Returns the number of links and
+    attributes found so the body can be checked while it is read.
+
+    heads -- The parsed headers.
+    limits -- Dictionary with the limits (see LIMITS).
+    '''
+    max_values = limits.get('max_header_values')
+    if max_values is not None:
+        for name in [CATEGORY, LINK, ATTRIBUTE, LOCATION]:
+            if heads.get(name, '').count(',') >= max_values:
+                raise HTTPError(400, 'Too many values in the ' + name
+                                + ' header.')
+
+    counts = {LINK: 0, ATTRIBUTE: 0}
+    for name in [LINK, ATTRIBUTE]:
+        if name in heads:
+            _count_values(name, heads[name], counts)
+    _check_counts(counts, limits)
+    return counts
+
+
+class RequestBody(object):
+    '''
+    The body of a request which is read lazily from the WSGI input. Iterating
+    over it returns the lines (without line breaks) - the limits for links
+    and attributes are checked for every line before it is handed out. read()
+    returns the remaining body as it was sent.
+
+    The limits apply per entity. Only bodies of requests which create
+    several entities at once (per_entity) start counting again with every
+    entity - one starts with a Category line after a blank line. All other
+    bodies are parsed as one entity, no matter how many blank lines they
+    hold.
+
+    A body can only be read once.
+    '''
+
+    def __init__(self, stream, length, limits=None, counts=None,
+                 per_entity=False):
+        self.stream = stream
+        self.length = length
+        self.remaining = length
+        self.limits = limits or {}
+        self.counts = counts or {LINK: 0, ATTRIBUTE: 0}
+        # the counts of the headers - every entity starts with them.
+        self.initial = self.counts.copy()
+        self.per_entity = per_entity
+        # set by the renderings which parsed this body.
+        self.data = None
+
+    def __nonzero__(self):
+        return self.length > 0
+
+    def __iter__(self):
+        for line in self._read_lines():
+            if line.endswith('\n'):
+                line = line[:-1]
+            yield line
+
+    def read(self):
+        '''
+        Read the remaining body - line breaks are kept as they were sent. The
+        limits are checked just like when iterating.
+        '''
+        return ''.join(self._read_lines())
+
+    def _read_lines(self):
+        '''
+        Read the lines including their line breaks and check the limits.
+        '''
+        blank = False
+        while self.remaining > 0:
+            line = self.stream.readline(self.remaining)
+            if not line:
+                break
+            self.remaining -= len(line)
+            if not line.strip():
+                blank = True
+            elif blank:
+                blank = False
+                if self.per_entity and \
+                        line.strip().startswith(CATEGORY + ':'):
+                    self.counts = self.initial.copy()
+            for name in [LINK, ATTRIBUTE]:
+                if line.find(name + ':') > -1:
+                    _count_values(name, line, self.counts)
+            _check_counts(self.counts, self.limits)
+            yield line
+
+
+def _parse_body(environ, limits=None, counts=None, per_entity=False):
+    '''
+    Parse the body from the WSGI environ. The body is not read but returned
+    as RequestBody (or '' if there is none). Raises an HTTPError if the body
+    is larger than allowed.
 
     environ -- The WSGI environ.
+    limits -- Dictionary with the limits (see LIMITS).
+    counts -- Number of links and attributes found in the headers.
+    per_entity -- The body can hold several entities (see RequestBody).
     '''
+    if limits is None:
+        limits = {}
     try:
         length = int(environ.get('CONTENT_LENGTH', '0'))
-        body = StringIO.StringIO(environ['wsgi.input'].read(length))
-        return body.getvalue()
+        stream = environ['wsgi.input']
     except (KeyError, ValueError):
         return ''
+    max_length = limits.get('max_body_bytes')
+    if max_length is not None and length > max_length:
+        raise HTTPError(413, 'The body of the request is too large.')
+    if length <= 0:
+        return ''
+    return RequestBody(stream, length, limits, counts, per_entity)
 
 
 def _parse_query(environ):
@@ -117,7 +275,8 @@ def _parse_query(environ):
 
 def _set_hostname(environ, registry):
     '''
-    Set the hostname of the service.
+    Set the hostname of the service for the current request (the registry
+    keeps it per thread).
 
     environ -- The WSGI environ.
     registry -- The OCCI registry.
@@ -140,7 +299,10 @@ class Application(object):
     # disabling 'Too few public methods' pylint check (given by WSGI)
     # pylint: disable=R0903
 
-    def __init__(self, registry=None, renderings=None):
+    def __init__(self, registry=None, renderings=None, limits=None,
+                 max_workers=None, action_workers=None,
+                 render_cache_size=RENDER_CACHE_SIZE,
+                 render_cache_bytes=RENDER_CACHE_BYTES):
         # set default registry
         if registry is None:
             self.registry = NonePersistentRegistry()
@@ -165,6 +327,27 @@ class Application(object):
             for mime_type in renderings.keys():
                 self.registry.set_renderer(mime_type, renderings[mime_type])
 
+        # set limits for the requests
+        self.limits = LIMITS.copy()
+        if limits is not None:
+            self.limits.update(limits)
+
+        # call the backends of an entity concurrently if workers are given.
+        self.executor = None
+        if max_workers:
+            self.executor = ThreadPool(max_workers)
+
+        # run actions asynchronously - clients poll the job under /-/jobs/.
+        # register another JobBackend to change how long jobs are kept.
+        self.jobs = None
+        if action_workers:
+            self.jobs = ThreadPool(action_workers)
+            self.register_backend(JOB, JobBackend())
+
+        # renderings of single entities - reused until the entity changes.
+        self.render_cache = create_render_cache(render_cache_size,
+                                                render_cache_bytes)
+
     def register_backend(self, category, backend):
         '''
         Register a backend.
@@ -202,32 +385,40 @@ class Application(object):
         '''
         extras = kwargs.copy()
 
-        # parse
-        heads = _parse_headers(environ)
-
-        # parse body...
-        body = _parse_body(environ)
-
-        # parse query
-        query = _parse_query(environ)
-
-        _set_hostname(environ, self.registry)
-
-        # find right handler
-        if environ['PATH_INFO'] == '/-/':
-            handler = QueryHandler(self.registry, heads, body, query, extras)
-        elif environ['PATH_INFO'] == '/.well-known/org/ogf/occi/-/':
-            handler = QueryHandler(self.registry, heads, body, query, extras)
-        elif environ['PATH_INFO'].endswith('/'):
-            handler = CollectionHandler(self.registry, heads, body, query,
-                                        extras)
-        else:
-            handler = ResourceHandler(self.registry, heads, body, query,
-                                      extras)
-
-        # call handler
         mtd = environ['REQUEST_METHOD']
         try:
+            # parse
+            heads = _parse_headers(environ)
+
+            # reject requests which are too large before they get parsed
+            counts = _check_limits(heads, self.limits)
+
+            # parse query
+            query = _parse_query(environ)
+
+            # parse body - only a POST on a collection creates several
+            # entities at once.
+            bulk = mtd == 'POST' and query == () and \
+                environ['PATH_INFO'].endswith('/')
+            body = _parse_body(environ, self.limits, counts, bulk)
+
+            _set_hostname(environ, self.registry)
+
+            # find right handler
+            args = (self.registry, heads, body, query, extras)
+            if environ['PATH_INFO'] == '/-/':
+                handler = QueryHandler(*args)
+            elif environ['PATH_INFO'] == '/.well-known/org/ogf/occi/-/':
+                handler = QueryHandler(*args)
+            elif environ['PATH_INFO'].endswith('/'):
+                handler = CollectionHandler(*args, stream=True,
+                                            executor=self.executor)
+            else:
+                handler = ResourceHandler(*args, executor=self.executor,
+                                          jobs=self.jobs,
+                                          render_cache=self.render_cache)
+
+            # call handler
             key = environ['PATH_INFO']
             status, headers, body = handler.handle(mtd, key)
             del handler
@@ -240,14 +431,22 @@ class Application(object):
 
         # send
         headers['Server'] = VERSION
-        headers['Content-length'] = str(len(body))
+        if isinstance(body, basestring):
+            body = [str(body), ]
+        elif isinstance(body, (list, tuple)):
+            body = [str(item) for item in body]
+        else:
+            # streamed - no Content-Length so the server sends it chunked.
+            body = (str(item) for item in body)
+        if isinstance(body, list):
+            headers['Content-length'] = str(sum([len(item) for item in body]))
 
         code = RETURN_CODES[status]
 
         # headers.items() because we need a list of sets...& unicode handling
         # for wsgi since it is not supported :-/
         response(code, [(str(k), str(v)) for k, v in headers.items()])
-        return [str(body), ]
+        return body
 
     def __call__(self, environ, response):
         '''
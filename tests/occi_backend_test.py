@@ -60,6 +60,17 @@ class TestKindBackend(unittest.TestCase):
         self.back.update(None, None, None)
         self.back.replace(None, None, None)
 
+    def test_batch_calls_for_sanity(self):
+        '''
+        Test that the batch calls fall back to the single entity calls.
+        '''
+        calls = []
+        self.back.create = lambda entity, extras: calls.append(entity)
+        self.back.create_many([self.resource, self.link], None)
+        self.assertEquals(calls, [self.resource, self.link])
+        self.back.retrieve_many([self.resource], None)
+        self.back.delete_many([self.resource], None)
+
     def test_is_related_for_sanity(self):
         '''
         Tests links...
@@ -108,3 +119,21 @@ class TestActionBackend(unittest.TestCase):
         '''
         back = ActionBackend()
         back.action(None, None, None, None)
+
+    def test_action_many_for_sanity(self):
+        '''
+        Test that failures of single entities are returned.
+        '''
+        back = ActionBackend()
+        resource = Resource('/foo/1', None, [])
+        self.assertEquals(back.action_many([resource], None, {}, None), [])
+
+        def action(entity, action, attributes, extras):
+            if entity is resource:
+                raise AttributeError('nope')
+        back.action = action
+        errors = back.action_many([Resource('/foo/2', None, []), resource],
+                                  None, {}, None)
+        self.assertEquals(len(errors), 1)
+        self.assertTrue(errors[0][0] is resource)
+        self.assertEquals(str(errors[0][1]), 'nope')
@@ -0,0 +1,93 @@
+# coding=utf-8
+#
+# Copyright (C) 2010-2012 Platform Computing
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+'''
+Tests for the caches.
+
+Created on Oct 17, 2026
+'''
+
+# disabling 'Too many public methods' pylint check (unittest's fault)
+# pylint: disable=R0904
+
+from occi.cache import LRUCache
+import unittest
+
+
+class TestLRUCache(unittest.TestCase):
+    '''
+    Test the LRU cache.
+    '''
+
+    def test_get_for_sanity(self):
+        '''
+        Test if values can be stored and retrieved.
+        '''
+        cache = LRUCache(2)
+        cache.put('foo', 1)
+        self.assertEquals(cache.get('foo'), 1)
+        self.assertEquals(cache.get('bar', False), False)
+
+        cache.pop('foo')
+        self.assertFalse('foo' in cache)
+
+    def test_eviction_for_sanity(self):
+        '''
+        Test if the least recently used entry is dropped.
+        '''
+        cache = LRUCache(2)
+        cache.put('foo', 1)
+        cache.put('bar', 2)
+        cache.get('foo')
+        cache.put('baz', 3)
+        self.assertTrue('foo' in cache)
+        self.assertFalse('bar' in cache)
+        self.assertTrue(len(cache) == 2)
+
+        cache.clear()
+        self.assertTrue(len(cache) == 0)
+
+    def test_stats_for_sanity(self):
+        '''
+        Test if hits and misses are counted.
+        '''
+        cache = LRUCache(2)
+        cache.put('foo', 1)
+        cache.get('foo')
+        cache.get('bar')
+        self.assertEquals(cache.get_stats(), {'hits': 1, 'misses': 1,
+                                              'size': 1})
+
+    def test_max_bytes_for_sanity(self):
+        '''
+        Test if the overall size of the values is bounded.
+        '''
+        cache = LRUCache(10, max_bytes=10)
+        cache.put('foo', 'aaaa')
+        cache.put('bar', 'bbbb')
+        cache.put('baz', 'cccc')
+        self.assertFalse('foo' in cache)
+        self.assertEquals(cache.bytes, 8)
+
+        # values larger than the limit are not cached at all.
+        cache.put('big', 'x' * 11)
+        self.assertFalse('big' in cache)
+        self.assertEquals(len(cache), 2)
+
+        cache.pop('bar')
+        self.assertEquals(cache.bytes, 4)
@@ -0,0 +1,124 @@
+# coding=utf-8
+#
+# Copyright (C) 2010-2012 Platform Computing
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+'''
+Tests for the chunked containers.
+
+Created on Oct 17, 2026
+'''
+
+# disabling 'Too many public methods' pylint check (unittest's fault)
+# pylint: disable=R0904
+
+from occi.chunked import ChunkedDict, ChunkedList, ChunkedSet
+import random
+import unittest
+
+
+class ChunkedTest(unittest.TestCase):
+    '''
+    Test the chunked containers against the built-in ones.
+    '''
+
+    def setUp(self):
+        self.random = random.Random(42)
+
+    def test_dict_for_sanity(self):
+        '''
+        Test the dictionary and that copies do not affect each other.
+        '''
+        chunked = ChunkedDict()
+        expected = {}
+        copies = []
+        for i in range(3000):
+            key = self.random.randint(0, 1000)
+            if self.random.random() < 0.3:
+                self.assertEqual(chunked.pop(key, None),
+                                 expected.pop(key, None))
+            else:
+                chunked[key] = expected[key] = i
+            if i % 500 == 0:
+                copies.append((chunked, dict(expected)))
+                chunked = chunked.copy()
+
+        copies.append((chunked, expected))
+        for tmp, values in copies:
+            self.assertEqual(len(tmp), len(values))
+            self.assertEqual(dict(tmp.items()), values)
+            self.assertEqual(sorted(tmp.keys()), sorted(values.keys()))
+            self.assertEqual(sorted(tmp.values()), sorted(values.values()))
+            for key in range(1001):
+                self.assertEqual(key in tmp, key in values)
+                self.assertEqual(tmp.get(key), values.get(key))
+        self.assertRaises(KeyError, chunked.pop, 2000)
+
+    def test_set_for_sanity(self):
+        '''
+        Test the set and that copies do not affect each other.
+        '''
+        chunked = ChunkedSet()
+        expected = set()
+        copies = []
+        for i in range(3000):
+            key = str(self.random.randint(0, 1000))
+            if self.random.random() < 0.3:
+                chunked.discard(key)
+                expected.discard(key)
+            else:
+                chunked.add(key)
+                expected.add(key)
+            if i % 500 == 0:
+                copies.append((chunked, set(expected)))
+                chunked = chunked.copy()
+
+        copies.append((chunked, expected))
+        for tmp, values in copies:
+            self.assertEqual(len(tmp), len(values))
+            self.assertEqual(set(tmp), values)
+
+    def test_list_for_sanity(self):
+        '''
+        Test the sorted list and that copies do not affect each other.
+        '''
+        ChunkedList.max_chunk = 16
+        try:
+            chunked = ChunkedList()
+            expected = []
+            copies = []
+            for i in range(3000):
+                key = '/foo/' + str(self.random.randint(0, 1000))
+                if key in expected and self.random.random() < 0.4:
+                    chunked.remove(key)
+                    expected.remove(key)
+                elif key not in expected:
+                    chunked.add(key)
+                    expected.append(key)
+                if i % 500 == 0:
+                    copies.append((chunked, sorted(expected)))
+                    chunked = chunked.copy()
+        finally:
+            del ChunkedList.max_chunk
+
+        copies.append((chunked, sorted(expected)))
+        for tmp, values in copies:
+            self.assertEqual(len(tmp), len(values))
+            self.assertEqual(list(tmp), values)
+            self.assertEqual(list(tmp.iter_from('/foo/5')),
+                             [item for item in values if item >= '/foo/5'])
+        self.assertRaises(ValueError, chunked.remove, '/bar')
+        self.assertEqual(list(ChunkedList().iter_from('/foo')), [])
@@ -0,0 +1,81 @@
+# coding=utf-8
+#
+# Copyright (C) 2010-2012 Platform Computing
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+'''
+Tests for the thread pool.
+
+Created on Oct 17, 2026
+'''
+
+# disabling 'Too many public methods' pylint check (unittest's fault)
+# pylint: disable=R0904
+
+from occi.executor import ThreadPool
+import threading
+import time
+import unittest
+
+
+class TestThreadPool(unittest.TestCase):
+    '''
+    Test the thread pool.
+    '''
+
+    def setUp(self):
+        self.pool = ThreadPool(4)
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def test_submit_for_sanity(self):
+        '''
+        Test that results and errors are handed back.
+        '''
+        self.assertEquals(self.pool.submit(lambda x: x * 2, 21).result(), 42)
+        future = self.pool.submit(int, 'foo')
+        self.assertRaises(ValueError, future.result)
+        self.assertTrue(future.done())
+
+    def test_run_for_sanity(self):
+        '''
+        Test that calls run concurrently and errors are collected.
+        '''
+        start = time.time()
+        errors = self.pool.run([(time.sleep, (0.2,)) for _ in range(4)] +
+                               [(int, ('foo',))])
+        self.assertTrue(time.time() - start < 0.6)
+        self.assertEquals(len(errors), 1)
+        self.assertTrue(errors[0][0] is ValueError)
+
+    def test_run_in_worker_for_sanity(self):
+        '''
+        Test that the pool can be used from within its threads.
+        '''
+        pool = ThreadPool(1)
+        names = []
+
+        def nested():
+            '''
+            Runs calls from within the pool.
+            '''
+            calls = [(lambda: names.append(threading.current_thread()), ())]
+            return pool.run(calls * 2)
+
+        self.assertEquals(pool.submit(nested).result(), [])
+        self.assertEquals(names, pool.threads * 2)
+        pool.shutdown()
@@ -33,10 +33,14 @@ Created on Jul 4, 2011
 from occi.backend import KindBackend, MixinBackend, ActionBackend
 from occi.core_model import Resource, Link, Mixin
 from occi.exceptions import HTTPError
+from occi.executor import ThreadPool
 from occi.extensions.infrastructure import COMPUTE, STORAGE, NETWORK, \
     NETWORKINTERFACE, IPNETWORKINTERFACE, IPNETWORK, START
 from occi.handlers import QueryHandler, CollectionHandler, \
-    ResourceHandler, ACCEPT, CATEGORY, LOCATION, ATTRIBUTE, LINK, CONTENT_TYPE
+    ResourceHandler, ACCEPT, CATEGORY, LOCATION, ATTRIBUTE, LINK, \
+    CONTENT_TYPE, ETAG, LAST_MODIFIED, IF_NONE_MATCH, IF_MODIFIED_SINCE, \
+    QUERY_STRING, create_render_cache
+from occi.jobs import JOB, JobBackend
 from occi.protocol.occi_rendering import TextOcciRendering, \
     TextUriListRendering, TextPlainRendering
 from occi.registry import NonePersistentRegistry
@@ -198,6 +202,21 @@ class TestQueryCapabilites(unittest.TestCase):
         status, headers, body = handler.delete()
         self.assertTrue(body == 'OK')
 
+    def test_conditional_get_for_sanity(self):
+        '''
+        Test ETags on the QI - they change when categories are added.
+        '''
+        handler = QueryHandler(self.registry, {ACCEPT: 'text/occi'}, '', [])
+        etag = handler.get()[1][ETAG]
+
+        handler = QueryHandler(self.registry, {ACCEPT: 'text/occi',
+                                               IF_NONE_MATCH: etag}, '', [])
+        self.assertEquals(handler.get()[0], 304)
+
+        self.registry.set_backend(Mixin('http://example.com#', 'bar'),
+                                  MixinBackend(), None)
+        self.assertEquals(handler.get()[0], 200)
+
 
 class TestCollectionCapabilites(unittest.TestCase):
     '''
@@ -220,6 +239,7 @@ class TestCollectionCapabilites(unittest.TestCase):
 
         self.compute = Resource('/compute/1', COMPUTE, [])
         self.compute.attributes = {'foo2': 'bar2'}
+        self.compute.actions = [START]
         self.network = Resource('/network/1', NETWORK, [IPNETWORK])
         self.network_interface = Link('/network/interface/1', NETWORKINTERFACE,
                                       [IPNETWORKINTERFACE], self.compute,
@@ -380,6 +400,27 @@ class TestCollectionCapabilites(unittest.TestCase):
         self.assertTrue(self.compute.attributes['occi.compute.state']
                         == 'active')
 
+    def test_action_results_for_sanity(self):
+        '''
+        Tests that actions report the outcome per entity and skip entities
+        on which the action is not applicable.
+        '''
+        compute = Resource('/compute/2', COMPUTE, [])
+        compute.attributes = {'undeletable': 'yes'}
+        self.registry.add_resource(compute.identifier, compute, None)
+
+        headers = {CONTENT_TYPE: 'text/occi',
+                   ACCEPT: 'text/occi',
+                   CATEGORY: parser.get_category_str(START, self.registry)}
+        handler = CollectionHandler(self.registry, headers, '',
+                                    ['action', 'start'])
+        status, headers, body = handler.post('/compute/')
+        self.assertEquals(status, 207)
+        self.assertEquals(headers[CONTENT_TYPE], 'text/plain')
+        self.assertTrue('http://127.0.0.1/compute/1 200 OK' in body)
+        self.assertTrue('http://127.0.0.1/compute/2 409' in body)
+        self.assertFalse('occi.compute.state' in compute.attributes)
+
     def test_update_mixin_collection_for_sanity(self):
         '''
         Add mixins to resources.
@@ -436,6 +477,99 @@ class TestCollectionCapabilites(unittest.TestCase):
         handler.post('/compute/')
         self.assertTrue(len(self.registry.get_resources(None)) == 4)
 
+    def test_bulk_create_for_sanity(self):
+        '''
+        Test that several entities can be created with one request.
+        '''
+        category = CATEGORY + ': ' + parser.get_category_str(COMPUTE,
+                                                             self.registry)
+        body = '\n\n'.join([category + '\n' + ATTRIBUTE + ': foo="' +
+                            str(i) + '"' for i in range(3)])
+        headers = {CONTENT_TYPE: 'text/plain', ACCEPT: 'text/plain'}
+        handler = CollectionHandler(self.registry, headers, body, ())
+        status, headers, body = handler.post('/compute/')
+        self.assertEquals(status, 201)
+        self.assertEquals(body.count(LOCATION + ': http://127.0.0.1/compute/'),
+                          3)
+        self.assertTrue(len(self.registry.get_resources(None)) == 6)
+
+        # ...but not if one of them is broken.
+        body = category + '\n\n' + CATEGORY + ': garbage'
+        handler = CollectionHandler(self.registry, {CONTENT_TYPE:
+                                                    'text/plain'}, body, ())
+        self.assertRaises(HTTPError, handler.post, '/compute/')
+        self.assertTrue(len(self.registry.get_resources(None)) == 6)
+
+        # a blank line within one entity does not split it.
+        body = category + '\n\n' + ATTRIBUTE + ': foo="bar"'
+        handler = CollectionHandler(self.registry, {CONTENT_TYPE:
+                                                    'text/plain'}, body, ())
+        self.assertEquals(handler.post('/compute/')[0], 201)
+        self.assertTrue(len(self.registry.get_resources(None)) == 7)
+
+    def test_conditional_get_for_sanity(self):
+        '''
+        Test ETags on collections - they change with the members.
+        '''
+        handler = CollectionHandler(self.registry, {ACCEPT: 'text/occi'}, '',
+                                    ())
+        etag = handler.get('/compute/')[1][ETAG]
+
+        handler = CollectionHandler(self.registry,
+                                    {ACCEPT: 'text/occi',
+                                     IF_NONE_MATCH: 'W/"foo", ' + etag}, '',
+                                    ())
+        self.assertEquals(handler.get('/compute/')[0], 304)
+
+        compute = Resource('/compute/2', COMPUTE, [])
+        self.registry.add_resource(compute.identifier, compute, None)
+        self.assertEquals(handler.get('/compute/')[0], 200)
+
+        # ...and with the entities in it.
+        handler = CollectionHandler(self.registry, {ACCEPT: 'text/occi'}, '',
+                                    ())
+        etag = handler.get('/compute/')[1][ETAG]
+        compute.attributes['occi.compute.cores'] = '4'
+        self.registry.update_resource(compute.identifier, compute, None)
+        handler = CollectionHandler(self.registry,
+                                    {ACCEPT: 'text/occi',
+                                     IF_NONE_MATCH: etag}, '', ())
+        self.assertEquals(handler.get('/compute/')[0], 200)
+
+    def test_pagination_for_sanity(self):
+        '''
+        Test that a collection can be retrieved page by page.
+        '''
+        for i in range(2, 7):
+            compute = Resource('/compute/' + str(i), COMPUTE, [])
+            self.registry.add_resource(compute.identifier, compute, None)
+
+        locations = []
+        query = 'limit=2'
+        while query is not None:
+            headers = {ACCEPT: 'text/occi', QUERY_STRING: query}
+            handler = CollectionHandler(self.registry, headers, '', ())
+            status, headers, body = handler.get('/compute/')
+            page = headers[LOCATION].split(',')
+            self.assertTrue(len(page) <= 2)
+            locations.extend([item.strip() for item in page])
+            query = None
+            if LINK in headers:
+                self.assertTrue(headers[LINK].endswith('>; rel="next"'))
+                query = headers[LINK][headers[LINK].find('?') + 1:
+                                      headers[LINK].find('>')]
+
+        self.assertEquals(locations, ['http://127.0.0.1/compute/' + str(i)
+                                      for i in range(1, 7)])
+
+    def test_pagination_for_failure(self):
+        '''
+        Test garbage as limit.
+        '''
+        headers = {ACCEPT: 'text/occi', QUERY_STRING: 'limit=foo'}
+        handler = CollectionHandler(self.registry, headers, '', ())
+        self.assertRaises(HTTPError, handler.get, '/compute/')
+
 
 class TestResourceCapabilites(unittest.TestCase):
     '''
@@ -682,6 +816,115 @@ class TestResourceCapabilites(unittest.TestCase):
         self.assertTrue(compute.attributes['occi.compute.state']
                         == 'active')
 
+    def test_async_action_for_sanity(self):
+        '''
+        Trigger an action which is done by a worker thread.
+        '''
+        self.registry.set_backend(JOB, JobBackend(), None)
+        headers = {CONTENT_TYPE: 'text/occi',
+                   CATEGORY: parser.get_category_str(COMPUTE, self.registry)}
+        handler = ResourceHandler(self.registry, headers, '', [])
+        handler.put('/compute/4')
+
+        headers = {CONTENT_TYPE: 'text/occi',
+                   CATEGORY: parser.get_category_str(START, self.registry)}
+        pool = ThreadPool(1)
+        handler = ResourceHandler(self.registry, headers, '',
+                                  ['action', 'start'], jobs=pool)
+        status, headers, _ = handler.post('/compute/4')
+        self.assertEquals(status, 202)
+        self.assertTrue(headers['Location'].find('/-/jobs/') != -1)
+
+        # poll the job...
+        pool.shutdown()
+        job = self.registry.get_resource(
+            headers['Location'].replace(self.registry.get_hostname(), ''),
+            None)
+        self.assertEquals(job.attributes['ssf.job.state'], 'done')
+        self.assertEquals(job.attributes['ssf.job.entity'], '/compute/4')
+        compute = self.registry.get_resource('/compute/4', None)
+        self.assertEquals(compute.attributes['occi.compute.state'], 'active')
+
+    def test_render_cache_for_sanity(self):
+        '''
+        Test that unchanged entities are not rendered again.
+        '''
+        headers = {CONTENT_TYPE: 'text/occi',
+                   CATEGORY: parser.get_category_str(COMPUTE, self.registry)}
+        handler = ResourceHandler(self.registry, headers, '', [])
+        handler.put('/compute/4')
+
+        cache = create_render_cache(max_size=10)
+        handler = ResourceHandler(self.registry, {ACCEPT: 'text/occi'}, '', [],
+                                  render_cache=cache)
+        first = handler.get('/compute/4')
+        second = handler.get('/compute/4')
+        self.assertEquals(first, second)
+        self.assertFalse(first[1] is second[1])
+        self.assertEquals(cache.get_stats()['hits'], 1)
+
+        # a change results in a new rendering.
+        headers = {CONTENT_TYPE: 'text/occi',
+                   ATTRIBUTE: 'occi.compute.cores="2"'}
+        handler = ResourceHandler(self.registry, headers, '', ())
+        handler.post('/compute/4')
+        handler = ResourceHandler(self.registry, {ACCEPT: 'text/occi'}, '', [],
+                                  render_cache=cache)
+        status, headers, body = handler.get('/compute/4')
+        self.assertTrue('occi.compute.cores' in headers['X-OCCI-Attribute'])
+        self.assertEquals(cache.get_stats()['misses'], 2)
+
+    def test_conditional_get_for_sanity(self):
+        '''
+        Test ETags and If-None-Match / If-Modified-Since on resources.
+        '''
+        headers = {CONTENT_TYPE: 'text/occi',
+                   CATEGORY: parser.get_category_str(COMPUTE, self.registry)}
+        handler = ResourceHandler(self.registry, headers, '', [])
+        handler.put('/compute/5')
+
+        handler = ResourceHandler(self.registry, {ACCEPT: 'text/occi'}, '', [])
+        status, headers, body = handler.get('/compute/5')
+        etag = headers[ETAG]
+        modified = headers[LAST_MODIFIED]
+
+        handler = ResourceHandler(self.registry, {ACCEPT: 'text/occi',
+                                                  IF_NONE_MATCH: etag}, '', [])
+        status, headers, body = handler.get('/compute/5')
+        self.assertEquals(status, 304)
+        self.assertEquals(headers[ETAG], etag)
+        self.assertEquals(body, '')
+
+        handler = ResourceHandler(self.registry,
+                                  {ACCEPT: 'text/occi',
+                                   IF_MODIFIED_SINCE: modified}, '', [])
+        self.assertEquals(handler.get('/compute/5')[0], 304)
+
+        # other renderings have other ETags.
+        handler = ResourceHandler(self.registry, {ACCEPT: 'text/plain',
+                                                  IF_NONE_MATCH: etag}, '', [])
+        self.assertEquals(handler.get('/compute/5')[0], 200)
+
+        # changes result in a new ETag.
+        headers = {CONTENT_TYPE: 'text/occi',
+                   ATTRIBUTE: 'occi.compute.cores="2"'}
+        handler = ResourceHandler(self.registry, headers, '', ())
+        handler.post('/compute/5')
+        handler = ResourceHandler(self.registry, {ACCEPT: 'text/occi',
+                                                  IF_NONE_MATCH: etag}, '', [])
+        status, headers, body = handler.get('/compute/5')
+        self.assertEquals(status, 200)
+        self.assertNotEquals(headers[ETAG], etag)
+
+        # changes done by the backends on retrieval are seen as well.
+        etag = headers[ETAG]
+        self.registry.set_backend(COMPUTE, ActivatingBackend(), None)
+        handler = ResourceHandler(self.registry, {ACCEPT: 'text/occi',
+                                                  IF_NONE_MATCH: etag}, '', [])
+        status, headers, body = handler.get('/compute/5')
+        self.assertEquals(status, 200)
+        self.assertTrue('"active"' in headers['X-OCCI-Attribute'])
+
 
 class TestLinkHandling(unittest.TestCase):
     '''
@@ -789,3 +1032,12 @@ class SimpleComputeBackend(KindBackend, ActionBackend):
 
     def action(self, entity, action, attributes, extras):
         entity.attributes['occi.compute.state'] = 'active'
+
+
+class ActivatingBackend(KindBackend):
+    '''
+    Backend which finds the compute active whenever it is asked.
+    '''
+
+    def retrieve(self, entity, extras):
+        entity.attributes['occi.compute.state'] = 'active'
@@ -0,0 +1,217 @@
+# coding=utf-8
+#
+# Copyright (C) 2010-2012 Platform Computing
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+'''
+Tests for the asynchronous actions.
+
+Created on Oct 17, 2026
+'''
+
+# disabling 'Too many public methods' pylint check (unittest's fault)
+# disabling 'Method could be func' pylint check (naw...)
+# pylint: disable=R0904,R0201
+
+from occi import workflow
+from occi.backend import ActionBackend, KindBackend
+from occi.core_model import Resource
+from occi.executor import ThreadPool
+from occi.extensions.infrastructure import COMPUTE, START, STOP
+from occi.jobs import JOB, JobBackend, submit_action
+from occi.registry import NonePersistentRegistry
+import threading
+import unittest
+
+
+class GatedBackend(ActionBackend):
+    '''
+    Action backend which waits until it is allowed to continue.
+    '''
+
+    def __init__(self):
+        self.gate = threading.Event()
+
+    def action(self, entity, action, attributes, extras):
+        self.gate.wait()
+        if action == STOP:
+            raise AttributeError('Cannot stop.')
+        entity.attributes['occi.compute.state'] = 'active'
+
+
+class TestJobs(unittest.TestCase):
+    '''
+    Test the jobs.
+    '''
+
+    def setUp(self):
+        self.registry = NonePersistentRegistry()
+        self.backend = GatedBackend()
+        self.registry.set_backend(COMPUTE, KindBackend(), None)
+        self.registry.set_backend(START, self.backend, None)
+        self.registry.set_backend(STOP, self.backend, None)
+        self.registry.set_backend(JOB, JobBackend(), None)
+        self.pool = ThreadPool(1)
+
+        self.compute = Resource('/compute/1', COMPUTE, [])
+        self.registry.add_resource('/compute/1', self.compute, None)
+
+    def tearDown(self):
+        self.backend.gate.set()
+        self.pool.shutdown()
+
+    #==========================================================================
+    # Success
+    #==========================================================================
+
+    def test_submit_action_for_success(self):
+        '''
+        Test that the job is registered and tracks the action.
+        '''
+        job = submit_action(self.compute, START, self.registry, {}, None,
+                            self.pool)
+        self.assertTrue(job.identifier.startswith('/-/jobs/'))
+        self.assertTrue(self.registry.get_resource(job.identifier, None)
+                        is job)
+        self.assertTrue(job.attributes['ssf.job.state'] in ('queued',
+                                                            'running'))
+        self.assertFalse('occi.compute.state' in self.compute.attributes)
+
+        version = job.version
+        self.backend.gate.set()
+        self.pool.shutdown()
+        self.assertEquals(job.attributes['ssf.job.state'], 'done')
+        self.assertEquals(job.attributes['ssf.job.result'], 'OK')
+        self.assertTrue(job.version > version)
+        self.assertEquals(self.compute.attributes['occi.compute.state'],
+                          'active')
+
+    def test_hostname_for_sanity(self):
+        '''
+        Test that the action sees the hostname of the request which
+        submitted it.
+        '''
+        hostnames = []
+        registry = self.registry
+
+        class HostBackend(ActionBackend):
+            '''
+            Action backend which records the hostname.
+            '''
+
+            def action(self, entity, action, attributes, extras):
+                hostnames.append(registry.get_hostname())
+
+        self.registry.set_backend(START, HostBackend(), None)
+        self.registry.set_hostname('http://example.com')
+        submit_action(self.compute, START, self.registry, {}, None,
+                      self.pool)
+        self.pool.shutdown()
+        self.assertEquals(hostnames, ['http://example.com'])
+
+    def test_expire_for_success(self):
+        '''
+        Test that finished jobs are removed beyond the retention limits.
+        '''
+        backend = JobBackend(max_finished=1)
+        self.registry.set_backend(JOB, backend, None)
+        self.backend.gate.set()
+        first = submit_action(self.compute, START, self.registry, {}, None,
+                              self.pool)
+        second = submit_action(self.compute, START, self.registry, {}, None,
+                               self.pool)
+        self.pool.shutdown()
+        self.assertRaises(KeyError, self.registry.get_resource,
+                          first.identifier, None)
+        self.assertTrue(self.registry.get_resource(second.identifier, None)
+                        is second)
+
+        backend.ttl = 0
+        backend.expire(self.registry)
+        self.assertEquals(self.registry.get_resource_keys(None),
+                          ['/compute/1'])
+
+    def test_expire_for_sanity(self):
+        '''
+        Test that unfinished and deleted jobs are left alone.
+        '''
+        backend = JobBackend(ttl=0)
+        self.registry.set_backend(JOB, backend, None)
+        job = submit_action(self.compute, START, self.registry, {}, None,
+                            self.pool)
+        backend.expire(self.registry)
+        self.assertTrue(self.registry.get_resource(job.identifier, None)
+                        is job)
+
+        self.backend.gate.set()
+        self.pool.shutdown()
+        self.assertRaises(KeyError, self.registry.get_resource,
+                          job.identifier, None)
+        backend.finish(job, None)
+        backend.expire(self.registry)
+        self.assertEquals(len(backend.finished), 0)
+
+    #==========================================================================
+    # Failure
+    #==========================================================================
+
+    def test_submit_action_for_failure(self):
+        '''
+        Test that failing actions are recorded in the job.
+        '''
+        job = submit_action(self.compute, STOP, self.registry, {}, None,
+                            self.pool)
+        self.backend.gate.set()
+        self.pool.shutdown()
+        self.assertEquals(job.attributes['ssf.job.state'], 'failed')
+        self.assertEquals(job.attributes['ssf.job.result'], 'Cannot stop.')
+
+    def test_update_job_for_failure(self):
+        '''
+        Test that clients cannot change jobs.
+        '''
+        job = submit_action(self.compute, START, self.registry, {}, None,
+                            self.pool)
+        backend = JobBackend()
+        self.assertRaises(AttributeError, backend.update, job, job, None)
+        self.assertRaises(AttributeError, backend.replace, job, job, None)
+
+    def test_create_job_for_failure(self):
+        '''
+        Test that clients cannot create jobs.
+        '''
+        job = Resource('/-/jobs/1', JOB, [])
+        self.assertRaises(AttributeError, workflow.create_entity,
+                          job.identifier, job, self.registry, None)
+        self.assertRaises(KeyError, self.registry.get_resource,
+                          job.identifier, None)
+
+    def test_delete_job_for_failure(self):
+        '''
+        Test that unfinished jobs cannot be deleted - finished ones can.
+        '''
+        job = submit_action(self.compute, START, self.registry, {}, None,
+                            self.pool)
+        self.assertRaises(AttributeError, workflow.delete_entity, job,
+                          self.registry, None)
+        self.assertTrue(self.registry.get_resource(job.identifier, None)
+                        is job)
+
+        self.backend.gate.set()
+        self.pool.shutdown()
+        workflow.delete_entity(job, self.registry, None)
+        self.assertRaises(KeyError, self.registry.get_resource,
+                          job.identifier, None)
@@ -0,0 +1,249 @@
+# coding=utf-8
+#
+# Copyright (C) 2010-2012 Platform Computing
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+'''
+Module to test the journal of the registry.
+
+Created on Oct 17, 2026
+'''
+
+# disabling 'Invalid name' pylint check (unittest's fault)
+# disabling 'Too many public methods' pylint check (unittest's fault)
+# pylint: disable=C0103,R0904
+
+from occi import workflow
+from occi.backend import KindBackend, UserDefinedMixinBackend
+from occi.core_model import Kind, Link, Mixin, Resource
+from occi.journal import Journal, LOG_FILE, OLD_LOG_FILE, SNAPSHOT_FILE
+from occi.registry import NonePersistentRegistry
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+
+class MyRegistry(NonePersistentRegistry):
+    '''
+    Registry which uses the extras as owner.
+    '''
+
+    def get_extras(self, extras):
+        return extras
+
+
+class TestJournal(unittest.TestCase):
+    '''
+    Test the write-ahead log and the snapshots.
+    '''
+
+    kind = Kind('http://example.com#', 'compute')
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.journal = None
+        self.registry = self._restart()
+
+    def tearDown(self):
+        self.journal.close()
+        shutil.rmtree(self.directory)
+
+    def _restart(self, snapshot_every=100000):
+        '''
+        Throw away the registry and restore it from the journal.
+
+        snapshot_every -- Number of records after which a snapshot is taken.
+        '''
+        if self.journal is not None:
+            self.journal.close()
+        self.journal = Journal(self.directory, snapshot_every=snapshot_every)
+        registry = MyRegistry(self.journal)
+        registry.set_backend(Resource.kind, KindBackend(), None)
+        registry.set_backend(Link.kind, KindBackend(), None)
+        registry.set_backend(self.kind, KindBackend(), None)
+        return registry
+
+    def _create(self, key, extras=None):
+        '''
+        Create a resource.
+
+        key -- The key of the resource.
+        extras -- Owner of the resource.
+        '''
+        res = Resource(key, self.kind, [])
+        workflow.create_entity(key, res, self.registry, extras)
+        return res
+
+    def _wait(self, condition):
+        '''
+        Wait for the timer of the journal.
+
+        condition -- Function which returns True once it is done.
+        '''
+        for _ in range(100):
+            if condition():
+                return
+            time.sleep(0.05)
+        self.fail('Timer of the journal did not finish in time.')
+
+    #==========================================================================
+    # Success
+    #==========================================================================
+
+    def test_replay_for_success(self):
+        '''
+        Test that resources, links and user-defined mixins get restored.
+        '''
+        mixin = Mixin('http://example.com/user#', 'foo', location='/foo/')
+        self.registry.set_backend(mixin, UserDefinedMixinBackend(), None)
+        target = self._create('/compute/2')
+        source = Resource('/compute/1', self.kind, [mixin], title='a')
+        source.links = [Link('/link/1', Link.kind, [], source, target)]
+        workflow.create_entity('/compute/1', source, self.registry, None)
+        self._create('/compute/3')
+        workflow.delete_entity(self.registry.get_resource('/compute/3', None),
+                               self.registry, None)
+        source.title = 'b'
+        self.registry.update_resource('/compute/1', source, None)
+
+        self.registry = self._restart()
+
+        self.assertEquals(sorted(self.registry.get_resource_keys(None)),
+                          ['/compute/1', '/compute/2', '/link/1'])
+        res = self.registry.get_resource('/compute/1', None)
+        self.assertEquals(res.title, 'b')
+        self.assertEquals(res.mixins, [mixin])
+        self.assertTrue(res.links[0] is self.registry.get_resource('/link/1',
+                                                                   None))
+        self.assertTrue(res.links[0].source is res)
+        self.assertEquals(self.registry.get_category('/foo/', None), mixin)
+        self.assertEquals(workflow.get_entities_under_path('/foo/',
+                                                           self.registry,
+                                                           None), [res])
+
+    def test_categories_for_success(self):
+        '''
+        Test that restored entities use the registered categories - even
+        though they are registered after the registry got restored.
+        '''
+        mixin = Mixin('http://example.com/user#', 'foo', location='/foo/')
+        self.registry.set_backend(mixin, UserDefinedMixinBackend(), None)
+        workflow.create_entity('/compute/1', Resource('/compute/1', self.kind,
+                                                      [mixin]),
+                               self.registry, None)
+
+        self.registry = self._restart()
+        res = self.registry.get_resource('/compute/1', None)
+        self.assertTrue(res.kind is self.kind)
+        self.assertTrue(res.mixins[0] is self.registry.get_category('/foo/',
+                                                                    None))
+
+        new = Resource('/compute/1', self.kind, [])
+        workflow.replace_entity(res, new, self.registry, None)
+
+    def test_snapshot_for_success(self):
+        '''
+        Test that a snapshot is taken and the log compacted.
+        '''
+        self.registry = self._restart(snapshot_every=5)
+        for i in range(7):
+            self._create('/compute/' + str(i), extras='tom')
+        self.registry.delete_resource('/compute/0', None)
+
+        # the snapshot is taken by the timer.
+        self._wait(lambda: os.path.exists(os.path.join(self.directory,
+                                                       SNAPSHOT_FILE))
+                   and not os.path.exists(os.path.join(self.directory,
+                                                       OLD_LOG_FILE))
+                   and not self.journal.snapshotting)
+        self.assertTrue(self.journal.records < 5)
+
+        self.registry = self._restart()
+        self.assertEquals(len(self.registry.get_resource_keys('tom')), 6)
+        self.assertEquals(self.registry.get_resource('/compute/6',
+                                                     'tom').extras, 'tom')
+
+    def test_link_for_success(self):
+        '''
+        Test that links created on their own are restored with their source.
+        '''
+        source = self._create('/compute/1')
+        target = self._create('/compute/2')
+        link = Link(None, Link.kind, [], source, target)
+        workflow.create_entity('/link/1', link, self.registry, None)
+
+        self.registry = self._restart()
+        res = self.registry.get_resource('/compute/1', None)
+        self.assertEquals([item.identifier for item in res.links],
+                          ['/link/1'])
+        self.assertTrue(res.links[0].source is res)
+
+    def test_idle_sync_for_success(self):
+        '''
+        Test that pending records are synced once the service gets idle.
+        '''
+        self.journal.group_size = 100
+        self.journal.group_interval = 0.2
+        self.journal.last_sync = time.time()
+        self.registry.add_resource('/compute/1',
+                                   Resource('/compute/1', self.kind, []),
+                                   None)
+        self.assertEquals(self.journal.pending, 1)
+        self._wait(lambda: self.journal.pending == 0)
+
+    def test_old_log_for_success(self):
+        '''
+        Test that a log which was moved aside is replayed as long as no
+        snapshot covers it.
+        '''
+        self._create('/compute/1')
+        self.journal.close()
+        os.rename(os.path.join(self.directory, LOG_FILE),
+                  os.path.join(self.directory, OLD_LOG_FILE))
+
+        self.registry = self._restart()
+        self.assertEquals(self.registry.get_resource_keys(None),
+                          ['/compute/1'])
+        self.assertFalse(os.path.exists(os.path.join(self.directory,
+                                                     OLD_LOG_FILE)))
+
+        self.registry = self._restart()
+        self.assertEquals(self.registry.get_resource_keys(None),
+                          ['/compute/1'])
+
+    #==========================================================================
+    # Failure
+    #==========================================================================
+
+    def test_torn_write_for_failure(self):
+        '''
+        Test that a partially written record at the end is ignored.
+        '''
+        self._create('/compute/1')
+        self.journal.close()
+        with open(os.path.join(self.directory, LOG_FILE), 'ab') as tmp:
+            tmp.write('\x80\x02(U\x08resour')
+
+        self.registry = self._restart()
+        self.assertEquals(self.registry.get_resource_keys(None),
+                          ['/compute/1'])
+        self._create('/compute/2')
+
+        self.registry = self._restart()
+        self.assertEquals(sorted(self.registry.get_resource_keys(None)),
+                          ['/compute/1', '/compute/2'])
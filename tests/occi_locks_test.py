@@ -0,0 +1,72 @@
+# coding=utf-8
+#
+# Copyright (C) 2010-2012 Platform Computing
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+'''
+Module to test the locks.
+
+Created on Oct 17, 2026
+'''
+
+# disabling 'Invalid name' pylint check (unittest's fault)
+# disabling 'Too many public methods' pylint check (unittest's fault)
+# pylint: disable=C0103,R0904
+
+from occi.locks import ReadWriteLock
+import threading
+import unittest
+
+
+class TestReadWriteLock(unittest.TestCase):
+    '''
+    Test the reader/writer lock.
+    '''
+
+    def test_readers_for_sanity(self):
+        '''
+        Test that readers do not block each other but block the writer.
+        '''
+        lock = ReadWriteLock()
+        result = []
+
+        def write():
+            '''
+            Take the write lock.
+            '''
+            with lock.write():
+                result.append('write')
+
+        with lock.read():
+            with lock.read():
+                thread = threading.Thread(target=write)
+                thread.start()
+                thread.join(0.05)
+                self.assertEqual(result, [])
+        thread.join()
+        self.assertEqual(result, ['write'])
+
+    def test_writer_for_sanity(self):
+        '''
+        Test that the writer can re-acquire the lock.
+        '''
+        lock = ReadWriteLock()
+        with lock.write():
+            with lock.write():
+                with lock.read():
+                    self.assertTrue(lock.writer is threading.current_thread())
+        self.assertTrue(lock.writer is None)
+        self.assertEqual(lock.readers, 0)
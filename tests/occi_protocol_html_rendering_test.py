@@ -89,6 +89,10 @@ class TestHTMLRendering(unittest.TestCase):
         self.parser.from_entities([self.source], '/foo/')
         self.parser.from_entities([], '/')
 
+        heads, body = self.parser.from_entities([self.source], '/foo/',
+                                                '/foo/?limit=1&cursor=x')
+        self.assertTrue('href="/foo/?limit=1&amp;cursor=x"' in body)
+
     def test_from_categories_for_success(self):
         '''
         Test from categories...
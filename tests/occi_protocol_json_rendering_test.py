@@ -9,9 +9,11 @@ Created on Feb 2, 2012
 # disabling 'Invalid name' pylint check (We need longer names here)
 # pylint: disable=R0904,C0103
 
+from occi.backend import KindBackend, MixinBackend
 from occi.core_model import Action, Kind, Mixin, Resource, Link
 from occi.protocol.json_rendering import JsonRendering
 from occi.registry import NonePersistentRegistry
+import json
 import unittest
 
 
@@ -60,8 +62,85 @@ class JsonRenderingTest(unittest.TestCase):
         self.parser.from_entities([self.source], '/foo/')
         self.parser.from_entities([], '/foo/')
 
+        # streamed and complete rendering are the same.
+        heads, body = self.parser.iter_entities([self.source, self.link],
+                                                '/foo/')
+        self.assertEquals(''.join(body), self.parser.from_entities(
+            [self.source, self.link], '/foo/')[1])
+
     def test_from_categories_for_success(self):
         '''
         Test from categories...
         '''
         self.parser.from_categories([self.kind, self.mixin, self.action])
+
+    def test_to_new_entities_for_success(self):
+        '''
+        Test parsing of entities...
+        '''
+        registry = NonePersistentRegistry()
+        kind = Kind('http://example.com#', 'res', related=[Resource.kind])
+        link_kind = Kind('http://example.com#', 'lnk', related=[Link.kind])
+        registry.set_backend(kind, KindBackend(), None)
+        registry.set_backend(link_kind, KindBackend(), None)
+        registry.set_backend(self.mixin, MixinBackend(), None)
+        registry.add_resource('/res/1', Resource('/res/1', kind, []), None)
+        parser = JsonRendering(registry)
+
+        body = json.dumps([{'kind': {'scheme': 'http://example.com#',
+                                     'term': 'res'},
+                            'mixins': [{'scheme': 'http://example.com/foo#',
+                                        'term': 'mixin'}],
+                            'attributes': {'foo': 'bar'},
+                            'links': [{'kind': {'term': 'lnk',
+                                                'scheme':
+                                                'http://example.com#'},
+                                       'target': '/res/1'}]},
+                           {'kind': {'scheme': 'http://example.com#',
+                                     'term': 'res'}}])
+        first, second = parser.to_new_entities({}, body, None)
+        self.assertEquals(first.kind, kind)
+        self.assertEquals(first.mixins, [self.mixin])
+        self.assertEquals(first.attributes, {'foo': 'bar'})
+        self.assertEquals(first.links[0].source, first)
+        self.assertEquals(first.links[0].target.identifier, '/res/1')
+        self.assertEquals(second.links, [])
+
+        # a single object is a single entity.
+        entity = parser.to_entity({}, json.dumps(json.loads(body)[1]), None,
+                                  None)
+        self.assertEquals(entity.kind, kind)
+
+        # text is handed on as UTF-8 - like the other renderings do.
+        entity = parser.to_entity({}, json.dumps({'attributes':
+                                                  {u'n\xe4me': u'v\xe4lue',
+                                                   'size': 2}}),
+                                  kind, None)
+        self.assertEquals(entity.attributes, {'n\xc3\xa4me': 'v\xc3\xa4lue',
+                                              'size': '2'})
+        self.assertRaises(AttributeError, parser.to_entity, {},
+                          '{"attributes": {"foo": {"bar": 1}}}', kind, None)
+        self.assertRaises(AttributeError, parser.to_entity, {},
+                          '{"attributes": {"foo": [1]}}', kind, None)
+
+        # arrays of locations are existing entities.
+        self.assertEquals(parser.to_entities({}, '["/res/1"]', None),
+                          [registry.get_resource('/res/1', None)])
+        self.assertEquals(parser.to_entities({}, body, None), [])
+
+    #==========================================================================
+    # Failure
+    #==========================================================================
+
+    def test_to_new_entities_for_failure(self):
+        '''
+        Test parsing of garbage...
+        '''
+        self.assertRaises(AttributeError, self.parser.to_new_entities, {},
+                          '[{"kind": ', None)
+        self.assertRaises(AttributeError, self.parser.to_new_entities, {},
+                          '[{"kind": {"scheme": "a#", "term": "b"}}]', None)
+        self.assertRaises(AttributeError, self.parser.to_new_entities, {},
+                          '["/foo/"]', None)
+        self.assertRaises(AttributeError, self.parser.to_entities, {},
+                          '["/foo/bar"]', None)
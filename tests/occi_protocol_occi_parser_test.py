@@ -199,6 +199,32 @@ class TestParser(unittest.TestCase):
                          parser.get_category('foo1; \
                          scheme="http://example.com#"', reg, 'bar'))
 
+    def test_category_cache_for_sanity(self):
+        '''
+        Test that parsed categories are cached until categories change.
+        '''
+        reg = MyRegistry(category_cache_size=10)
+        mixin = Mixin('http://example.com#', 'cached')
+        reg.set_backend(mixin, None, None)
+        tmp = 'cached; scheme="http://example.com#"'
+
+        self.assertTrue(parser.get_category(tmp, reg, None) is mixin)
+        self.assertTrue(parser.get_category(tmp, reg, None) is mixin)
+        self.assertEqual(reg.get_category_cache().get_stats()['hits'], 1)
+        self.assertEqual(reg.get_category_cache().get_stats()['misses'], 1)
+
+        # owners have an entry of their own...
+        own = Mixin('http://example.com#', 'cached')
+        reg.set_backend(own, None, 'foo')
+        self.assertTrue(parser.get_category(tmp, reg, 'foo') is own)
+
+        # ...and removing a mixin invalidates the entries.
+        reg.delete_mixin(own, 'foo')
+        self.assertTrue(parser.get_category(tmp, reg, 'foo') is mixin)
+        reg.delete_mixin(mixin, None)
+        self.assertRaises(AttributeError, parser.get_category, tmp, reg,
+                          None)
+
     def test_get_link_for_sanity(self):
         '''
         Verifies that source and target are set...
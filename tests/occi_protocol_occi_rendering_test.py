@@ -32,8 +32,9 @@ from occi.backend import KindBackend, MixinBackend, ActionBackend
 from occi.core_model import Kind, Resource, Link, Mixin, Action
 from occi.handlers import CONTENT_TYPE
 from occi.protocol.occi_rendering import TextOcciRendering, Rendering, \
-    TextPlainRendering, TextUriListRendering
+    TextPlainRendering, TextUriListRendering, split_values
 from occi.registry import NonePersistentRegistry
+import shlex
 import unittest
 
 
@@ -241,6 +242,33 @@ class TestTextPlainRendering(unittest.TestCase):
         self.assertTrue(body.count('X-OCCI-Attribute') == 3)
         self.assertTrue(body.count('X-OCCI-Location') == 3)
 
+    def test_to_new_entities_for_sanity(self):
+        '''
+        Test that blank lines separate the entities of a body.
+        '''
+        kind = Kind('http://example.com#', 'foo', related=[Resource.kind])
+        self.registry.set_backend(kind, KindBackend(), None)
+        category = 'Category: foo; scheme="http://example.com#"\n'
+        body = '\n' + category + 'X-OCCI-Attribute: a="1"\n\n' + \
+            category + 'X-OCCI-Attribute: a="2"\n\n'
+        entities = self.rendering.to_new_entities({}, body, None)
+        self.assertEquals([item.attributes['a'] for item in entities],
+                          ['1', '2'])
+        self.assertEquals(self.rendering.get_data({}, body).categories,
+                          [category.strip()[10:]] * 2)
+
+        # no blank lines - one entity.
+        entities = self.rendering.to_new_entities({}, category, None)
+        self.assertEquals(len(entities), 1)
+        self.assertEquals(entities[0].kind, kind)
+
+        # blocks without a Category line belong to the entity before.
+        body = category + 'X-OCCI-Attribute: a="1"\n\n' \
+            'X-OCCI-Attribute: b="2"'
+        entities = self.rendering.to_new_entities({}, body, None)
+        self.assertEquals(len(entities), 1)
+        self.assertEquals(entities[0].attributes, {'a': '1', 'b': '2'})
+
 
 class TestTextURIListRendering(unittest.TestCase):
     '''
@@ -280,6 +308,31 @@ class TestTextURIListRendering(unittest.TestCase):
                           None, None)
 
 
+class TestSplitValues(unittest.TestCase):
+    '''
+    Test the splitting of comma separated values.
+    '''
+
+    def test_split_values_for_sanity(self):
+        '''
+        Test the scanner behaves like the shlex based splitting it replaced.
+        '''
+        self.assertEqual(split_values('a="b, c", d=1'), ['a=b, c', ' d=1'])
+        self.assertEqual(split_values('a=\'b,c\',,d="e\\"f"'),
+                         ['a=b,c', 'd=e"f'])
+        self.assertEqual(split_values('""'), [''])
+        self.assertRaises(ValueError, split_values, 'a="b')
+        self.assertRaises(ValueError, split_values, 'a=b\\')
+
+        for string in ['', ',', 'a', 'a,b', ' a , b ', 'a="b,c"',
+                       "a='b\\',c", 'a="b\\c"', 'a\\,b', 'a#b,c',
+                       'a,#b\nc,d', '"a"b"c",', "'',\"\"", 'a="",b=\'\'']:
+            split = shlex.shlex(string, posix=True)
+            split.whitespace = ','
+            split.whitespace_split = True
+            self.assertEqual(split_values(string), list(split))
+
+
 class TestRendering(unittest.TestCase):
     '''
     Test for the abstract Rendering class.
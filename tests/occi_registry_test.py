@@ -33,7 +33,8 @@ from occi.backend import KindBackend, ActionBackend, MixinBackend
 from occi.core_model import Kind, Resource, Action, Mixin
 from occi.exceptions import HTTPError
 from occi.protocol.occi_rendering import Rendering
-from occi.registry import NonePersistentRegistry, Registry
+from occi.registry import NonePersistentRegistry, Registry, SnapshotRegistry
+import threading
 import unittest
 
 
@@ -78,6 +79,30 @@ class TestAbstractClass(unittest.TestCase):
         reg.set_hostname('foo')
         self.assertEqual('foo', reg.get_hostname())
 
+        # other threads (requests) see their own hostname.
+        result = []
+        thread = threading.Thread(target=lambda: result.append(
+                                                        reg.get_hostname()))
+        thread.start()
+        thread.join()
+        self.assertEqual(result, [''])
+
+        # subclasses do not need to call the constructor.
+        class OwnRegistry(Registry):
+            '''
+            Registry with its own constructor.
+            '''
+
+            # pylint: disable=W0223,W0231
+
+            def __init__(self):
+                self.hostname = 'bar'
+
+        reg = OwnRegistry()
+        self.assertEqual('bar', reg.get_hostname())
+        reg.set_hostname('foo')
+        self.assertEqual('foo', reg.get_hostname())
+
 
 class TestBackendsRegistry(unittest.TestCase):
     '''
@@ -148,6 +173,33 @@ class TestBackendsRegistry(unittest.TestCase):
         backs = self.registry.get_all_backends(self.entity, None)
         self.assertTrue(len(backs) == 2)
 
+    def test_get_all_backends_cache_for_sanity(self):
+        '''
+        Test if the resolved backends are ordered and follow changes.
+        '''
+        mixin2 = Mixin('http://example.com#', 'another')
+        back = MixinBackend()
+        self.registry.set_backend(mixin2, back, None)
+
+        entity1 = Resource('bar', self.kind1, [self.mixin, mixin2])
+        entity2 = Resource('baz', self.kind1, [mixin2, self.mixin])
+        backs = self.registry.get_all_backends(entity1, None)
+        self.assertEqual(backs, self.registry.get_all_backends(entity2, None))
+        self.assertEqual(backs[0], self.registry.get_backend(self.kind1,
+                                                             None))
+        self.assertEqual(backs[1], back)
+
+        # new backend -> new result.
+        back2 = MixinBackend()
+        self.registry.set_backend(mixin2, back2, None)
+        backs = self.registry.get_all_backends(entity1, None)
+        self.assertTrue(back2 in backs)
+        self.assertFalse(back in backs)
+
+        self.registry.delete_mixin(mixin2, None)
+        self.assertRaises(AttributeError, self.registry.get_all_backends,
+                          entity1, None)
+
 
 class TestParserRegistry(unittest.TestCase):
     '''
@@ -195,6 +247,57 @@ class TestParserRegistry(unittest.TestCase):
         self.assertEquals(parser1, parser3)
         self.assertEquals(parser2, parser3)
 
+    def test_negotiation_for_sanity(self):
+        '''
+        Test q values, wildcards and parameters in Accept headers.
+        '''
+        plain = self.registry.get_renderer('text/plain')
+        occi = self.registry.get_renderer('text/occi')
+
+        # q values win over the position in the header.
+        self.assertEquals(occi, self.registry.get_renderer(
+            'text/plain;q=0.5, text/occi'))
+        self.assertEquals(plain, self.registry.get_renderer(
+            'text/html,application/xhtml+xml,text/plain;q=0.9,*/*;q=0.8'))
+        # the default type wins on wildcards.
+        self.assertEquals(plain, self.registry.get_renderer('text/*'))
+        self.assertEquals(occi, self.registry.get_renderer(
+            'text/occi, */*'))
+        # parameters are ignored - q=0 means not acceptable.
+        self.assertEquals(occi, self.registry.get_renderer(
+            'text/occi; charset=utf-8'))
+        self.assertEquals(occi, self.registry.get_renderer(
+            'text/plain;q=0, text/*'))
+        self.assertRaises(HTTPError, self.registry.get_renderer,
+                          'text/plain;q=0, text/occi;q=0')
+        # parameters the rendering does not declare do not make a range
+        # more specific.
+        self.assertEquals(plain, self.registry.get_renderer(
+            'text/plain;q=0.9, text/plain;level=1;q=0.1, text/occi;q=0.5'))
+
+        # ...but the ones it declares need to fit.
+        rendering = DummyRendering(self.registry)
+        self.registry.set_renderer('text/bla;level=1', rendering)
+        self.assertEquals(rendering, self.registry.get_renderer(
+            'text/bla;level=1'))
+        self.assertRaises(HTTPError, self.registry.get_renderer,
+                          'text/bla;level=2')
+        self.registry.renderings.pop('text/bla;level=1')
+        self.registry.negotiated.clear()
+
+    def test_negotiation_cache_for_sanity(self):
+        '''
+        Test if the negotiation result is cached and invalidated.
+        '''
+        self.assertRaises(HTTPError, self.registry.get_renderer, 'text/bla')
+        self.assertTrue('text/bla' in self.registry.negotiated)
+
+        rendering = DummyRendering(self.registry)
+        self.registry.set_renderer('text/bla', rendering)
+        self.assertEquals(rendering, self.registry.get_renderer('text/bla'))
+        self.registry.renderings.pop('text/bla')
+        self.registry.negotiated.clear()
+
 
 class CategoryRegistryTest(unittest.TestCase):
     '''
@@ -227,6 +330,63 @@ class CategoryRegistryTest(unittest.TestCase):
         result = self.registry.get_category('/bar/', None)
         self.assertTrue(result is None)
 
+    def test_get_category_after_changes_for_sanity(self):
+        '''
+        Test if the location lookup follows registrations and deletions.
+        '''
+        mixin = Mixin('http://example.com#', 'mixin', location='/bar/')
+        self.registry.set_backend(mixin, MixinBackend(), None)
+        self.assertTrue(self.registry.get_category('/bar/', None) is mixin)
+
+        # re-registration with a new location drops the old one.
+        moved = Mixin('http://example.com#', 'mixin', location='/moved/')
+        self.registry.set_backend(moved, MixinBackend(), None)
+        self.assertTrue(self.registry.get_category('/bar/', None) is None)
+        self.assertTrue(self.registry.get_category('/moved/', None) is moved)
+
+        self.registry.delete_mixin(moved, None)
+        self.assertTrue(self.registry.get_category('/moved/', None) is None)
+
+        # the location of the registered mixin is dropped - not the one of
+        # the mixin given (e.g. parsed from a request).
+        self.registry.set_backend(mixin, MixinBackend(), None)
+        self.registry.delete_mixin(Mixin('http://example.com#', 'mixin',
+                                         location='/other/'), None)
+        self.assertTrue(self.registry.get_category('/bar/', None) is None)
+
+    def test_find_category_for_sanity(self):
+        '''
+        Test the lookup by scheme and term - own categories first.
+        '''
+        my_reg = MyRegistry()
+        shared = Mixin('http://example.com#', 'mine')
+        own = Mixin('http://example.com#', 'mine', location='/mine/')
+        my_reg.set_backend(shared, MixinBackend(), None)
+        my_reg.set_backend(own, MixinBackend(), 'foo')
+
+        self.assertTrue(my_reg.find_category('http://example.com#', 'mine',
+                                             'foo') is own)
+        self.assertTrue(my_reg.find_category('http://example.com#', 'mine',
+                                             'bar') is shared)
+        self.assertTrue(my_reg.find_category('http://example.com#', 'mine',
+                                             None) is shared)
+        self.assertTrue(my_reg.find_category('http://example.com#', 'other',
+                                             None) is None)
+
+        # lookups by owner do not fall back to the shared categories.
+        self.assertTrue(my_reg.get_category_by_name('http://example.com#',
+                                                    'mine', 'foo') is own)
+        self.assertTrue(my_reg.get_category_by_name('http://example.com#',
+                                                    'mine', 'bar') is None)
+
+        my_reg.delete_mixin(own, 'foo')
+        self.assertTrue(my_reg.find_category('http://example.com#', 'mine',
+                                             'foo') is shared)
+
+        # the default implementation of the registry behaves the same.
+        self.assertTrue(Registry.find_category(my_reg, 'http://example.com#',
+                                               'mine', 'foo') is shared)
+
     def test_set_category_for_sanity(self):
         '''
         Test the hash function of the categories...
@@ -293,6 +453,275 @@ class ResourcesTest(unittest.TestCase):
         self.assertTrue(len(self.registry.get_resources(None)) == 2)
         self.assertTrue(len(self.registry.get_resource_keys(None)) == 2)
 
+    def test_owned_resources_for_sanity(self):
+        '''
+        Test if owners only see their own and the shared resources.
+        '''
+        my_reg = MyRegistry()
+        res3 = Resource('shared', None, None)
+        my_reg.add_resource('foo', self.res1, 'foo')
+        my_reg.add_resource('bar', self.res2, 'bar')
+        my_reg.add_resource('shared', res3, None)
+
+        self.assertEqual(sorted(my_reg.get_resource_keys('foo')),
+                         ['foo', 'shared'])
+        self.assertEqual(sorted(my_reg.get_resource_keys('bar')),
+                         ['bar', 'shared'])
+        self.assertEqual(my_reg.get_resources(None), [res3])
+
+        # re-adding moves the resource to the new owner.
+        my_reg.add_resource('foo', self.res1, 'bar')
+        self.assertEqual(my_reg.get_resource_keys('foo'), ['shared'])
+
+        my_reg.delete_resource('foo', None)
+        my_reg.delete_resource('bar', None)
+        self.assertEqual(my_reg.get_resources('bar'), [res3])
+
+    def test_resources_of_category_for_sanity(self):
+        '''
+        Test if resources can be retrieved by kind and mixin.
+        '''
+        kind = Kind('http://example.com#', 'kind')
+        mixin = Mixin('http://example.com#', 'mixin')
+        res3 = Resource('/kind/1', kind, [mixin])
+        res4 = Resource('/kind/2', kind, [])
+        self.registry.add_resource('/kind/1', res3, None)
+        self.registry.add_resource('/kind/2', res4, None)
+
+        self.assertEqual(len(self.registry.get_resources_of_category(kind,
+                                                                     None)), 2)
+        self.assertEqual(self.registry.get_resources_of_category(mixin, None),
+                         [res3])
+
+        # changes need to be announced...
+        res4.mixins.append(mixin)
+        res3.mixins.remove(mixin)
+        self.registry.update_resource('/kind/1', res3, None)
+        self.registry.update_resource('/kind/2', res4, None)
+        self.assertEqual(self.registry.get_resources_of_category(mixin, None),
+                         [res4])
+
+        self.registry.delete_resource('/kind/2', None)
+        self.assertEqual(self.registry.get_resources_of_category(mixin, None),
+                         [])
+        self.assertEqual(self.registry.get_resources_of_category(kind, None),
+                         [res3])
+
+        # owners only see their own and shared ones.
+        my_reg = MyRegistry()
+        my_reg.add_resource('/kind/1', res3, 'foo')
+        self.assertEqual(my_reg.get_resources_of_category(kind, 'foo'),
+                         [res3])
+        self.assertEqual(my_reg.get_resources_of_category(kind, 'bar'), [])
+
+    def test_resources_under_prefix_for_sanity(self):
+        '''
+        Test if resources can be retrieved by the prefix of their key.
+        '''
+        for key in ['/foo/bar/2', '/foo/bar/1', '/foo/bars', '/foo/baz/1',
+                    '/goo/1']:
+            self.registry.add_resource(key, Resource(key, None, None), None)
+
+        res = self.registry.get_resources_under_prefix('/foo/bar/', None)
+        self.assertEqual([item.identifier for item in res],
+                         ['/foo/bar/1', '/foo/bar/2'])
+        res = self.registry.get_resources_under_prefix('/foo/', None)
+        self.assertTrue(len(res) == 4)
+        res = self.registry.get_resources_under_prefix('/', None)
+        self.assertTrue(len(res) == 5)
+        res = self.registry.get_resources_under_prefix('/hoo/', None)
+        self.assertTrue(len(res) == 0)
+
+        self.registry.delete_resource('/foo/bar/1', None)
+        res = self.registry.get_resources_under_prefix('/foo/bar/', None)
+        self.assertEqual([item.identifier for item in res], ['/foo/bar/2'])
+
+        # merged partitions stay ordered.
+        my_reg = MyRegistry()
+        for key, owner in [('/a/3', None), ('/a/2', 'foo'), ('/a/1', None),
+                           ('/a/0', 'bar')]:
+            my_reg.add_resource(key, Resource(key, None, None), owner)
+        res = my_reg.get_resources_under_prefix('/a/', 'foo')
+        self.assertEqual([item.identifier for item in res],
+                         ['/a/1', '/a/2', '/a/3'])
+
+    def test_pages_for_sanity(self):
+        '''
+        Test if pages of resources can be retrieved after a given key.
+        '''
+        kind = Kind('http://example.com#', 'page')
+        for key in ['/foo/3', '/foo/1', '/foo/2', '/foo0/1', '/goo/1']:
+            self.registry.add_resource(key, Resource(key, kind, []), None)
+
+        res = self.registry.get_page_under_prefix('/foo/', None, None, 2)
+        self.assertEqual([item.identifier for item in res],
+                         ['/foo/1', '/foo/2'])
+        res = self.registry.get_page_under_prefix('/foo/', None, '/foo/2', 2)
+        self.assertEqual([item.identifier for item in res], ['/foo/3'])
+        res = self.registry.get_page_under_prefix('/foo/', None, '/a', 1)
+        self.assertEqual([item.identifier for item in res], ['/foo/1'])
+        res = self.registry.get_page_of_category(kind, None, '/foo/3', 2)
+        self.assertEqual([item.identifier for item in res],
+                         ['/foo0/1', '/goo/1'])
+        self.assertEqual(self.registry.get_page_of_category(
+                                            Kind('a#', 'b'), None, None, 2),
+                         [])
+
+        # pages merge the partitions.
+        my_reg = MyRegistry()
+        for key, owner in [('/a/3', None), ('/a/2', 'foo'), ('/a/1', None),
+                           ('/a/0', 'bar')]:
+            my_reg.add_resource(key, Resource(key, kind, []), owner)
+        res = my_reg.get_page_under_prefix('/a/', 'foo', '/a/1', 5)
+        self.assertEqual([item.identifier for item in res], ['/a/2', '/a/3'])
+        res = my_reg.get_page_of_category(kind, 'foo', None, 2)
+        self.assertEqual([item.identifier for item in res], ['/a/1', '/a/2'])
+
+        # the default implementation returns the same pages.
+        res = Registry.get_page_under_prefix(my_reg, '/a/', 'foo', '/a/1', 5)
+        self.assertEqual([item.identifier for item in res], ['/a/2', '/a/3'])
+        res = Registry.get_page_of_category(my_reg, kind, 'foo', None, 2)
+        self.assertEqual([item.identifier for item in res], ['/a/1', '/a/2'])
+
+    def test_attribute_index_for_sanity(self):
+        '''
+        Test that the attribute index follows the changes of the resources.
+        '''
+        registry = NonePersistentRegistry()
+        self.res1.attributes = {'state': 'active'}
+        registry.add_resource('foo', self.res1, None)
+        self.assertTrue(registry.get_resource_keys_by_attribute(
+                                            'state', 'active', None) is None)
+
+        registry.index_attribute('state')
+        registry.add_resource('bar', self.res2, None)
+        self.assertEqual(registry.get_resource_keys_by_attribute(
+                                                'state', 'active', None),
+                         set(['foo']))
+
+        self.res2.attributes = {'state': 'active'}
+        registry.update_resource('bar', self.res2, None)
+        self.res1.attributes = {'state': 'inactive'}
+        registry.update_resource('foo', self.res1, None)
+        self.assertEqual(registry.get_resource_keys_by_attribute(
+                                                'state', 'active', None),
+                         set(['bar']))
+
+        registry.delete_resource('bar', None)
+        self.assertEqual(registry.get_resource_keys_by_attribute(
+                                                'state', 'active', None),
+                         set())
+
+    def test_concurrency_for_sanity(self):
+        '''
+        Test that concurrent changes leave the indexes intact.
+        '''
+        kind = Kind('http://example.com#', 'bar')
+
+        def work(name):
+            '''
+            Add and remove resources while reading.
+            '''
+            for i in range(200):
+                key = '/bar/' + name + str(i)
+                self.registry.add_resource(key, Resource(key, kind, []),
+                                           None)
+                self.registry.get_resources_of_category(kind, None)
+                self.registry.get_resources_under_prefix('/bar/', None)
+                if i % 2:
+                    self.registry.delete_resource(key, None)
+
+        threads = [threading.Thread(target=work, args=(str(i) + '-', ))
+                   for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(self.registry.get_resources_under_prefix('/bar/',
+                                                                      None)),
+                         400)
+        self.assertEqual(len(self.registry.get_resources_of_category(kind,
+                                                                     None)),
+                         400)
+
+
+class SnapshotRegistryTest(unittest.TestCase):
+    '''
+    Tests the copy-on-write registry.
+    '''
+
+    kind = Kind('http://example.com#', 'foo')
+
+    def setUp(self):
+        self.registry = SnapshotRegistry()
+        self.registry.set_backend(self.kind, KindBackend(), None)
+
+    def test_snapshot_for_sanity(self):
+        '''
+        Test that readers see the last published snapshot while a transaction
+        is in progress - and the writer sees its own changes.
+        '''
+        res1 = Resource('/foo/1', self.kind, [])
+        self.registry.add_resource('/foo/1', res1, None)
+        old = self.registry.snapshot
+        result = []
+
+        def read():
+            '''
+            Read from another thread.
+            '''
+            result.append(self.registry.get_resource_keys(None))
+            result.append(self.registry.get_resources_of_category(self.kind,
+                                                                  None))
+
+        with self.registry.transaction(None):
+            self.registry.delete_resource('/foo/1', None)
+            self.registry.add_resource('/foo/2', Resource('/foo/2', self.kind,
+                                                          []), None)
+            self.assertEqual(self.registry.get_resource_keys(None),
+                             ['/foo/2'])
+
+            thread = threading.Thread(target=read)
+            thread.start()
+            thread.join()
+            self.assertEqual(result, [['/foo/1'], [res1]])
+
+        self.assertEqual(self.registry.get_resource_keys(None), ['/foo/2'])
+        self.assertRaises(KeyError, self.registry.get_resource, '/foo/1',
+                          None)
+        with self.registry.locked() as view:
+            self.assertEqual(view.resources.keys(), ['/foo/2'])
+        # the old snapshot was not touched.
+        self.assertEqual(old.partitions[None].keys(), ['/foo/1'])
+        self.assertEqual(list(old.ordered[None]), ['/foo/1'])
+        self.assertEqual(set(old.members[self.kind]), set(['/foo/1']))
+
+    def test_pages_for_sanity(self):
+        '''
+        Test that pages are read from the chunked indexes.
+        '''
+        for key in ['/foo/3', '/foo/1', '/foo/2']:
+            self.registry.add_resource(key, Resource(key, self.kind, []),
+                                       None)
+        res = self.registry.get_page_under_prefix('/foo/', None, '/foo/1', 1)
+        self.assertEqual([item.identifier for item in res], ['/foo/2'])
+        res = self.registry.get_page_of_category(self.kind, None, '/foo/1',
+                                                 5)
+        self.assertEqual([item.identifier for item in res],
+                         ['/foo/2', '/foo/3'])
+
+    def test_categories_for_sanity(self):
+        '''
+        Test that category changes are published.
+        '''
+        mixin = Mixin('http://example.com#', 'bar')
+        self.registry.set_backend(mixin, MixinBackend(), None)
+        self.assertEqual(self.registry.get_category('/bar/', None), mixin)
+        self.assertTrue(mixin in self.registry.get_categories(None))
+        self.registry.delete_mixin(mixin, None)
+        self.assertTrue(self.registry.get_category('/bar/', None) is None)
+
 
 class DummyBackend(KindBackend):
     '''
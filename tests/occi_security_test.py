@@ -89,7 +89,7 @@ class SecurityChecksTest(unittest.TestCase):
            'PATH_INFO': '/compute/',
            'REQUEST_METHOD': 'GET'}
 
-    my_registry = MyRegistry()
+    my_registry = None
 
     def setUp(self):
         '''
@@ -98,6 +98,7 @@ class SecurityChecksTest(unittest.TestCase):
         '''
         unittest.TestCase.setUp(self)
 
+        self.my_registry = MyRegistry()
         self.my_registry.set_renderer('text/occi',
                                  TextOcciRendering(self.my_registry))
 
@@ -109,8 +110,6 @@ class SecurityChecksTest(unittest.TestCase):
         self.my_registry.set_backend(COMPUTE, backend, None)
 
     def tearDown(self):
-        self.my_registry.backends = {}
-        self.my_registry.resources = {}
         self.my_registry = None
 
     #==========================================================================
@@ -0,0 +1,335 @@
+# coding=utf-8
+#
+# Copyright (C) 2010-2012 Platform Computing
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+'''
+Module to test the SQLite registry.
+
+Created on Oct 17, 2026
+'''
+
+# disabling 'Invalid name' pylint check (unittest's fault)
+# disabling 'Too many public methods' pylint check (unittest's fault)
+# pylint: disable=C0103,R0904
+
+from occi import workflow
+from occi.backend import KindBackend, UserDefinedMixinBackend
+from occi.core_model import Kind, Link, Mixin, Resource
+from occi.sqlite_registry import SqliteRegistry
+import gc
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+
+class MySqliteRegistry(SqliteRegistry):
+    '''
+    Registry which uses the extras as owner.
+    '''
+
+    def get_extras(self, extras):
+        return extras
+
+
+class TestSqliteRegistry(unittest.TestCase):
+    '''
+    Test the SQLite backed registry.
+    '''
+
+    kind = Kind('http://example.com#', 'compute')
+    mixin = Mixin('http://example.com#', 'large')
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.database = os.path.join(self.directory, 'registry.db')
+        self.registry = self._create_registry()
+
+    def tearDown(self):
+        self.registry.close()
+        shutil.rmtree(self.directory)
+
+    def _create_registry(self):
+        '''
+        Create a new registry on the test database.
+        '''
+        registry = MySqliteRegistry(self.database)
+        registry.set_backend(Resource.kind, KindBackend(), None)
+        registry.set_backend(Link.kind, KindBackend(), None)
+        registry.set_backend(self.kind, KindBackend(), None)
+        registry.set_backend(self.mixin, UserDefinedMixinBackend(), None)
+        return registry
+
+    #==========================================================================
+    # Success
+    #==========================================================================
+
+    def test_resources_for_success(self):
+        '''
+        Test adding, retrieving and deleting resources.
+        '''
+        res = Resource('/compute/1', self.kind, [self.mixin])
+        res.attributes = {'foo': 'bar'}
+        self.registry.add_resource('/compute/1', res, None)
+
+        self.assertTrue(self.registry.get_resource('/compute/1', None) is res)
+        self.assertEquals(self.registry.get_resource_keys(None),
+                          ['/compute/1'])
+
+        self.registry.delete_resource('/compute/1', None)
+        self.assertRaises(KeyError, self.registry.get_resource, '/compute/1',
+                          None)
+        self.assertEquals(self.registry.get_resources(None), [])
+
+    def test_persistence_for_success(self):
+        '''
+        Test that resources, links and owners survive a restart.
+        '''
+        source = Resource('/compute/1', self.kind, [self.mixin], title='a')
+        target = Resource('/compute/2', self.kind, [])
+        link = Link('/link/1', Link.kind, [], source, target)
+        source.links = [link]
+        source.attributes = {'foo': 'bar'}
+        workflow.create_entity('/compute/2', target, self.registry, None)
+        workflow.create_entity('/compute/1', source, self.registry, 'tom')
+
+        self.registry.close()
+        self.registry = self._create_registry()
+
+        res = self.registry.get_resource('/compute/1', 'tom')
+        self.assertEquals(res.title, 'a')
+        self.assertEquals(res.kind, self.kind)
+        self.assertEquals(res.mixins, [self.mixin])
+        self.assertEquals(res.attributes['foo'], 'bar')
+        self.assertEquals(res.extras, 'tom')
+        self.assertEquals(len(res.links), 1)
+        self.assertTrue(res.links[0].source is res)
+        self.assertTrue(res.links[0].target is
+                        self.registry.get_resource('/compute/2', None))
+
+    def test_user_mixins_for_success(self):
+        '''
+        Test that user-defined mixins are stored.
+        '''
+        mixin = Mixin('http://example.com/user#', 'foo', location='/foo/')
+        self.registry.set_backend(mixin, UserDefinedMixinBackend(), 'tom')
+
+        self.registry.close()
+        self.registry = self._create_registry()
+
+        self.assertEquals(self.registry.get_category('/foo/', 'tom'), mixin)
+        self.assertEquals(self.registry.get_category('/foo/', 'tom').extras,
+                          'tom')
+
+        self.registry.delete_mixin(mixin, 'tom')
+        self.registry.close()
+        self.registry = self._create_registry()
+        self.assertTrue(self.registry.get_category('/foo/', 'tom') is None)
+
+    #==========================================================================
+    # Failure
+    #==========================================================================
+
+    def test_transaction_for_failure(self):
+        '''
+        Test that a failing transaction leaves no traces.
+        '''
+        res = Resource('/compute/1', self.kind, [])
+        try:
+            with self.registry.transaction(None):
+                self.registry.add_resource('/compute/1', res, None)
+                raise AttributeError('Backend failed.')
+        except AttributeError:
+            pass
+        self.assertRaises(KeyError, self.registry.get_resource, '/compute/1',
+                          None)
+        self.assertEquals(self.registry.get_resource_keys(None), [])
+
+    def test_rollback_for_failure(self):
+        '''
+        Test that a failing transaction does not affect the entities which
+        were not changed in it.
+        '''
+        workflow.create_entity('/compute/1', Resource('/compute/1', self.kind,
+                                                      []),
+                               self.registry, None)
+        self.registry.close()
+        self.registry = self._create_registry()
+        res = self.registry.get_resource('/compute/1', None)
+
+        try:
+            with self.registry.transaction(None):
+                self.registry.add_resource('/compute/2',
+                                           Resource('/compute/2', self.kind,
+                                                    []), None)
+                raise AttributeError('Backend failed.')
+        except AttributeError:
+            pass
+
+        self.assertTrue(self.registry.get_resource('/compute/1', None) is res)
+        workflow.update_collection(self.mixin, [], [res], self.registry, None)
+        self.assertEquals(self.registry.get_resources_of_category(self.mixin,
+                                                                  None),
+                          [res])
+
+        # entities which are no longer in the identity map are stored too.
+        self.registry.live.clear()
+        res.mixins.remove(self.mixin)
+        self.registry.update_resource('/compute/1', res, None)
+        self.assertEquals(self.registry.get_resources_of_category(self.mixin,
+                                                                  None), [])
+        self.assertTrue(self.registry.get_resource('/compute/1', None) is res)
+
+    #==========================================================================
+    # Sanity
+    #==========================================================================
+
+    def test_backends_for_sanity(self):
+        '''
+        Test that readers are not held up while the backends are called.
+        '''
+        registry = self.registry
+        workflow.create_entity('/compute/1', Resource('/compute/1', self.kind,
+                                                      []),
+                               registry, None)
+        seen = []
+
+        class SlowBackend(KindBackend):
+            '''
+            Backend which reads from the registry in another thread.
+            '''
+
+            def create(self, entity, extras):
+                self.read()
+
+            def delete(self, entity, extras):
+                self.read()
+
+            def read(self):
+                '''
+                Look up a resource from another thread.
+                '''
+                thread = threading.Thread(target=lambda: seen.append(
+                    registry.get_resource('/compute/1', None)))
+                thread.start()
+                thread.join(5)
+
+        kind = Kind('http://example.com#', 'slow')
+        registry.set_backend(kind, SlowBackend(), None)
+        res = Resource('/slow/1', kind, [])
+        workflow.create_entity('/slow/1', res, registry, None)
+        workflow.delete_entity(res, registry, None)
+        self.assertEquals(len(seen), 2)
+
+    def test_owners_for_sanity(self):
+        '''
+        Test that only resources of the owner or shared ones are visible.
+        '''
+        workflow.create_entity('/compute/1', Resource('/compute/1', self.kind,
+                                                      []),
+                               self.registry, None)
+        workflow.create_entity('/compute/2', Resource('/compute/2', self.kind,
+                                                      []),
+                               self.registry, 'tom')
+        workflow.create_entity('/compute/3', Resource('/compute/3', self.kind,
+                                                      []),
+                               self.registry, 'bob')
+
+        self.assertEquals(self.registry.get_resource_keys('tom'),
+                          ['/compute/1', '/compute/2'])
+        self.assertEquals(self.registry.get_resource_keys('ann'),
+                          ['/compute/1'])
+        self.assertRaises(KeyError, self.registry.get_resource, '/compute/3',
+                          'tom')
+
+    def test_queries_for_sanity(self):
+        '''
+        Test the category and prefix queries.
+        '''
+        res1 = Resource('/compute/1', self.kind, [self.mixin])
+        res2 = Resource('/compute/2', self.kind, [])
+        res3 = Resource('/compute0/3', self.kind, [])
+        for res in [res1, res2, res3]:
+            workflow.create_entity(res.identifier, res, self.registry, None)
+
+        self.assertEquals(self.registry.get_resources_of_category(self.kind,
+                                                                  None),
+                          [res1, res2, res3])
+        self.assertEquals(self.registry.get_resources_of_category(self.mixin,
+                                                                  None),
+                          [res1])
+        self.assertEquals(self.registry.get_resources_under_prefix('/compute/',
+                                                                   None),
+                          [res1, res2])
+        self.assertEquals(workflow.get_entities_under_path('/large/',
+                                                           self.registry,
+                                                           None),
+                          [res1])
+        res = self.registry.get_page_under_prefix('/compute/', None,
+                                                  '/compute/1', 5)
+        self.assertEquals([item.identifier for item in res], ['/compute/2'])
+        res = self.registry.get_page_of_category(self.kind, None, None, 2)
+        self.assertEquals([item.identifier for item in res],
+                          ['/compute/1', '/compute/2'])
+
+        # changes to the mixins are reflected.
+        workflow.delete_from_collection(self.mixin, [res1], self.registry,
+                                        None)
+        self.assertEquals(self.registry.get_resources_of_category(self.mixin,
+                                                                  None), [])
+
+    def test_versions_for_sanity(self):
+        '''
+        Test that reloaded entities keep their version and modification time
+        - ETags would change otherwise.
+        '''
+        source = Resource('/compute/1', self.kind, [])
+        target = Resource('/compute/2', self.kind, [])
+        workflow.create_entity('/compute/1', source, self.registry, None)
+        workflow.create_entity('/compute/2', target, self.registry, None)
+        version, modified = source.version, source.modified
+        del source
+        res = self.registry.get_resource('/compute/1', None)
+        self.assertEquals((res.version, res.modified), (version, modified))
+
+        # links change the version of their source.
+        link = Link('/link/1', Link.kind, [], res, target)
+        workflow.create_entity('/link/1', link, self.registry, None)
+        version = res.version
+        del res, link
+        gc.collect()
+        res = self.registry.get_resource('/compute/1', None)
+        self.assertEquals(res.version, version)
+
+        workflow.delete_entity(res.links[0], self.registry, None)
+        version = res.version
+        del res
+        gc.collect()
+        res = self.registry.get_resource('/compute/1', None)
+        self.assertEquals(res.version, version)
+
+        # versions of other processes are not used as they are.
+        self.registry.close()
+        self.registry = self._create_registry()
+        res = self.registry.get_resource('/compute/1', None)
+        self.assertNotEquals(res.version, version)
+        version = res.version
+        del res
+        gc.collect()
+        self.assertEquals(self.registry.get_resource('/compute/1',
+                                                     None).version, version)
@@ -31,8 +31,10 @@ Created on Jul 5, 2011
 from occi import workflow
 from occi.backend import KindBackend, MixinBackend, ActionBackend
 from occi.core_model import Resource, Kind, Link, Action, Mixin
-from occi.exceptions import HTTPError
+from occi.exceptions import BackendErrors, HTTPError
+from occi.executor import ThreadPool
 from occi.registry import NonePersistentRegistry
+import time
 import unittest
 
 
@@ -111,10 +113,215 @@ class EntityWorkflowTest(unittest.TestCase):
         workflow.action_entity(self.link1, self.action, self.registry, None,
                                None)
 
+    def test_action_entities_for_success(self):
+        '''
+        Test that actions on several entities report per entity.
+        '''
+        self.src_entity.actions = [self.action]
+        self.link1.actions = [self.action]
+        pool = ThreadPool(2)
+        for executor in (None, pool):
+            results = workflow.action_entities([self.src_entity, self.link1,
+                                                self.trg_entity],
+                                               self.action, self.registry,
+                                               None, None, executor)
+            self.assertEquals([(entity, code) for entity, code, _ in results],
+                              [(self.src_entity, 200), (self.link1, 200),
+                               (self.trg_entity, 409)])
+        pool.shutdown()
+
+    def test_versions_for_success(self):
+        '''
+        Test that changes to an entity give it a new version.
+        '''
+        workflow.create_entity('/foo/src', self.src_entity, self.registry,
+                               None)
+        version = self.src_entity.version
+
+        # nothing changed.
+        workflow.retrieve_entity(self.src_entity, self.registry, None)
+        self.assertEquals(self.src_entity.version, version)
+
+        workflow.action_entity(self.src_entity, self.action, self.registry,
+                               None, None)
+        self.assertTrue(self.src_entity.version > version)
+        version = self.src_entity.version
+
+        # changes to a link change the source as well.
+        workflow.action_entity(self.link1, self.action, self.registry, None,
+                               None)
+        self.assertTrue(self.src_entity.version > version)
+        version = self.src_entity.version
+
+        # changes done by the backends during retrieval are detected.
+        backend = self.registry.get_backend(self.test_kind, None)
+        backend.retrieve = lambda entity, extras: entity.attributes.update(
+            {'bar': 'foo'})
+        workflow.retrieve_entity(self.src_entity, self.registry, None)
+        self.assertTrue(self.src_entity.version > version)
+
+    def test_batches_for_success(self):
+        '''
+        Test that each backend is called once with all its entities.
+        '''
+        calls = []
+
+        class BatchBackend(KindBackend):
+            '''
+            Backend which records the batches.
+            '''
+
+            def create_many(self, entities, extras):
+                calls.append(('create', list(entities)))
+
+            def delete_many(self, entities, extras):
+                calls.append(('delete', list(entities)))
+
+        self.registry.set_backend(self.link_kind, BatchBackend(), None)
+        link2 = Link(None, self.link_kind, [], self.src_entity,
+                     self.trg_entity)
+        self.src_entity.links.append(link2)
+        workflow.create_entity('/foo/src', self.src_entity, self.registry,
+                               None)
+        self.assertEquals(calls, [('create', [self.link1, link2])])
+
+        # several entities at once - ids are created if needed.
+        del calls[:]
+        res = Resource(None, self.test_kind, [], [])
+        link3 = Link(None, self.link_kind, [], res, self.trg_entity)
+        link4 = Link(None, self.link_kind, [], self.trg_entity, res)
+        res.links = [link3]
+        workflow.create_entities([res, link4], self.registry, None)
+        self.assertEquals(calls, [('create', [link3, link4])])
+        self.assertTrue(res.identifier.startswith('/test/'))
+        self.assertTrue(link4 in self.trg_entity.links)
+        self.assertTrue(res.identifier in
+                        self.registry.get_resource_keys(None))
+
+        del calls[:]
+        workflow.delete_entities([self.src_entity, link2], self.registry, None)
+        self.assertEquals(calls, [('delete', [self.link1, link2])])
+        self.assertEquals(self.src_entity.links, [self.link1])
+        self.assertFalse(link2.identifier in
+                         self.registry.get_resource_keys(None))
+
+    def test_fan_out_for_success(self):
+        '''
+        Test that the backends can be called concurrently - ordered ones
+        after the others.
+        '''
+        calls = []
+        hostnames = []
+        registry = self.registry
+
+        class SlowBackend(MixinBackend):
+            '''
+            Backend with some latency.
+            '''
+
+            def create(self, entity, extras):
+                time.sleep(0.2)
+                calls.append(self)
+                hostnames.append(registry.get_hostname())
+
+        class OrderedBackend(KindBackend):
+            '''
+            Backend which needs to be called last.
+            '''
+
+            ordered = True
+
+            def create(self, entity, extras):
+                calls.append(self)
+
+        slow = SlowBackend()
+        ordered = OrderedBackend()
+        self.registry.set_backend(self.test_kind, slow, None)
+        self.registry.set_backend(self.src_entity.mixins[0], SlowBackend(),
+                                  None)
+        self.registry.set_backend(self.link_kind, ordered, None)
+
+        pool = ThreadPool(4)
+        self.registry.set_hostname('http://example.com')
+        start = time.time()
+        workflow.create_entity('/foo/src', self.src_entity, self.registry,
+                               None, pool)
+        self.registry.set_hostname('')
+        self.assertTrue(time.time() - start < 0.35)
+        self.assertEquals(len(calls), 3)
+        # the threads of the pool see the hostname of the request.
+        self.assertEquals(hostnames, ['http://example.com'] * 2)
+        self.assertTrue(calls[-1] is ordered)
+        self.assertTrue('/link/1' in self.registry.get_resource_keys(None))
+
+        calls[:] = []
+        workflow.retrieve_entity(self.src_entity, self.registry, None, pool)
+        pool.shutdown()
+
     #==========================================================================
     # Failure
     #==========================================================================
 
+    def test_action_entities_for_failure(self):
+        '''
+        Test that failing entities do not stop the others.
+        '''
+
+        class PickyBackend(ActionBackend):
+            '''
+            Fails for the source and target entity.
+            '''
+
+            def action(self, entity, action, attributes, extras):
+                if entity.identifier == '/foo/src':
+                    raise AttributeError('not me')
+                if entity.identifier == '/foo/trg':
+                    raise HTTPError(403, 'forbidden')
+                entity.attributes['done'] = 'yes'
+
+        self.registry.set_backend(self.action, PickyBackend(), None)
+        self.src_entity.identifier = '/foo/src'
+        for entity in (self.src_entity, self.trg_entity, self.link1):
+            entity.actions = [self.action]
+        pool = ThreadPool(2)
+        results = workflow.action_entities([self.src_entity, self.trg_entity,
+                                            self.link1],
+                                           self.action, self.registry, None,
+                                           None, pool)
+        pool.shutdown()
+        self.assertEquals([item[1:] for item in results],
+                          [(400, 'not me'), (403, 'forbidden'), (200, 'OK')])
+        self.assertEquals(self.link1.attributes['done'], 'yes')
+
+    def test_fan_out_for_failure(self):
+        '''
+        Test that the errors of concurrent backends are aggregated.
+        '''
+
+        class BrokenBackend(KindBackend):
+            '''
+            Backend which fails.
+            '''
+
+            def delete(self, entity, extras):
+                raise AttributeError('broken: ' + entity.identifier)
+
+        workflow.create_entity('/foo/src', self.src_entity, self.registry,
+                               None)
+        self.registry.set_backend(self.test_kind, BrokenBackend(), None)
+        self.registry.set_backend(self.link_kind, BrokenBackend(), None)
+
+        pool = ThreadPool(4)
+        try:
+            workflow.delete_entity(self.src_entity, self.registry, None, pool)
+        except BackendErrors as err:
+            self.assertEquals(len(err.errors), 2)
+            self.assertTrue('broken: /link/1' in str(err))
+        else:
+            self.fail('Errors of the backends got lost.')
+        pool.shutdown()
+        self.assertTrue('/foo/src' in self.registry.get_resource_keys(None))
+
     def test_create_resource_for_failure(self):
         '''
         Test if create behaves correct on faulty create calls...
@@ -319,6 +526,19 @@ class CollectionWorkflowTest(unittest.TestCase):
         self.assertTrue(self.mixin in res1.mixins)
         self.assertTrue(self.mixin in res2.mixins)
 
+        # the collection listing needs to follow...
+        target = self.resources[1]
+        workflow.update_collection(self.mixin, [], [target], self.registry,
+                                   None)
+        lst = workflow.get_entities_under_path('/mixin/', self.registry, None)
+        self.assertTrue(target in lst)
+        self.assertTrue(len(lst) == 2)
+
+        workflow.delete_from_collection(self.mixin, [target], self.registry,
+                                        None)
+        lst = workflow.get_entities_under_path('/mixin/', self.registry, None)
+        self.assertFalse(target in lst)
+
     def test_replace_collection_for_sanity(self):
         '''
         Check if the replace functionalities are implemented correctly.
@@ -386,6 +606,120 @@ class CollectionWorkflowTest(unittest.TestCase):
         self.assertTrue(self.resources[0] in res)
         self.assertTrue(len(res) == 1)
 
+    def test_filter_entities_indexed_for_sanity(self):
+        '''
+        Check that using the attribute index gives the same results.
+        '''
+        registry = NonePersistentRegistry()
+        registry.index_attribute('foo')
+        for item in self.resources:
+            registry.add_resource(item.identifier, item, None)
+        self.resources[1].attributes = {'foo': 'baz', 'bar': 'bar'}
+        registry.update_resource('/foo/target', self.resources[1], None)
+
+        for categories, attributes in [([], {'foo': 'bar'}),
+                                       ([], {'foo': 'baz'}),
+                                       ([], {'foo': 'baz', 'bar': 'bar'}),
+                                       ([self.kind], {'foo': 'bar'}),
+                                       ([self.mixin], {'bar': 'bar'})]:
+            self.assertEqual(workflow.filter_entities(self.resources,
+                                                      categories, attributes,
+                                                      registry, None),
+                             workflow.filter_entities(self.resources,
+                                                      categories, attributes))
+
+    def test_get_filtered_entities_for_sanity(self):
+        '''
+        Check that indexed attributes are answered from the index - without
+        walking over the collection - and give the same results.
+        '''
+        registry = NonePersistentRegistry()
+        mixin = Mixin('http://example.com/foo#', 'tagged', location='/tag/')
+        registry.set_backend(self.kind, KindBackend(), None)
+        registry.set_backend(mixin, MixinBackend(), None)
+        self.resources[1].mixins = [mixin]
+        for item in self.resources:
+            registry.add_resource(item.identifier, item, None)
+        expected = {}
+        for path in ['/', '/foo/', '/tag/']:
+            for attributes in [{'foo': 'bar'}, {'foo': 'baz'}]:
+                expected[(path, attributes['foo'])] = \
+                    workflow.get_filtered_entities(path, [], attributes,
+                                                   registry, None)
+
+        registry.index_attribute('foo')
+        registry.get_resources_under_prefix = None
+        registry.get_resources_of_category = None
+        for path, value in expected.keys():
+            self.assertEqual(workflow.get_filtered_entities(path, [],
+                                                            {'foo': value},
+                                                            registry, None),
+                             expected[(path, value)])
+        self.assertEqual(expected[('/foo/', 'bar')], [self.resources[0]])
+
+    def test_get_page_for_sanity(self):
+        '''
+        Check that pages hold the same entities as the filtered collection -
+        also when the filter drops entities of several batches.
+        '''
+        registry = NonePersistentRegistry()
+        registry.set_backend(self.kind, KindBackend(), None)
+        for i in range(10):
+            item = Resource('/bar/%d' % i, self.kind, [])
+            item.attributes = {'even': str(i % 2 == 0)}
+            registry.add_resource(item.identifier, item, None)
+        expected = workflow.get_filtered_entities('/bar/', [],
+                                                  {'even': 'True'}, registry,
+                                                  None)
+
+        for index in [False, True]:
+            if index:
+                registry.index_attribute('even')
+            result, more = workflow.get_page('/bar/', [], {'even': 'True'},
+                                             registry, None, 2)
+            self.assertEqual(result, expected[:2])
+            self.assertTrue(more)
+            result, more = workflow.get_page('/bar/', [], {'even': 'True'},
+                                             registry, None, 2, '/bar/4')
+            self.assertEqual(result, expected[3:])
+            self.assertFalse(more)
+        result, more = workflow.get_page('/bar/', [], {}, registry, None, 20)
+        self.assertEqual(len(result), 10)
+        self.assertFalse(more)
+
+    def test_filter_entities_retrieved_for_sanity(self):
+        '''
+        Check that the attribute index follows changes the backends make
+        during a retrieve.
+        '''
+
+        class StateBackend(KindBackend):
+            '''
+            Backend which changes the attributes on retrieve.
+            '''
+
+            def retrieve(self, entity, extras):
+                entity.attributes['foo'] = 'baz'
+
+        registry = NonePersistentRegistry()
+        registry.index_attribute('foo')
+        registry.set_backend(self.kind, StateBackend(), None)
+        registry.set_backend(self.link_kind, StateBackend(), None)
+        registry.set_backend(self.mixin, MixinBackend(), None)
+        for item in self.resources:
+            registry.add_resource(item.identifier, item, None)
+
+        workflow.retrieve_entity(self.resources[0], registry, None)
+        for value in ['bar', 'baz']:
+            self.assertEqual(workflow.filter_entities(self.resources, [],
+                                                      {'foo': value},
+                                                      registry, None),
+                             workflow.filter_entities(self.resources, [],
+                                                      {'foo': value}))
+        self.assertEqual(registry.get_resource_keys_by_attribute('foo', 'baz',
+                                                                 None),
+                         frozenset(['/foo/src', '/link/foo']))
+
 
 class QueriyInterfaceTest(unittest.TestCase):
     '''
@@ -31,12 +31,16 @@ Created on Nov 24, 2011
 # pylint: disable=R0904,R0201,R0903,C0103
 
 from occi.backend import ActionBackend, KindBackend, MixinBackend
+from occi.core_model import Resource
+from occi.exceptions import HTTPError
 from occi.extensions.infrastructure import COMPUTE, IPNETWORKINTERFACE, START
+from occi.jobs import JOB, JobBackend
 from occi.protocol.html_rendering import HTMLRendering
 from occi.protocol.occi_rendering import TextOcciRendering, \
     TextUriListRendering, TextPlainRendering
+from occi.protocol.rendering import Rendering
 from occi.registry import NonePersistentRegistry
-from occi.wsgi import Application
+from occi.wsgi import Application, RequestBody
 
 import unittest
 import StringIO
@@ -83,6 +87,18 @@ class ApplicationTest(unittest.TestCase):
         app3 = Application(renderings={'text/bla': rendering})
         self.assertEqual(app3.registry.get_renderer('text/bla'), rendering)
 
+        # asynchronous actions
+        app4 = Application(action_workers=2)
+        self.assertTrue(isinstance(app4.registry.get_backend(JOB, None),
+                                   JobBackend))
+        self.assertEqual(app4.jobs.max_workers, 2)
+        self.assertTrue(Application().jobs is None)
+
+        # size of the render cache
+        app5 = Application(render_cache_size=5, render_cache_bytes=100)
+        self.assertEqual(app5.render_cache.max_size, 5)
+        self.assertEqual(app5.render_cache.max_bytes, 100)
+
     def test_register_backend_for_failure(self):
         '''
         Test registration.
@@ -148,3 +164,318 @@ class ApplicationTest(unittest.TestCase):
         environ['wsgi.input'] = output
 
         app.__call__(environ, response)
+
+    def test_bulk_create_limits_for_sanity(self):
+        '''
+        Test that the limits for attributes apply to each entity of a bulk
+        create.
+        '''
+        app = Application(limits={'max_attributes': 5})
+        app.register_backend(COMPUTE, KindBackend())
+        block = 'Category: compute; ' \
+            'scheme="http://schemas.ogf.org/occi/infrastructure#"\n' \
+            'X-OCCI-Attribute: occi.compute.cores="2", ' \
+            'occi.compute.memory="4", occi.compute.hostname="foo"'
+        text = '\n\n'.join([block] * 400)
+        response = RecordingResponse()
+        environ = {'SERVER_NAME': 'foo',
+                   'SERVER_PORT': '8888',
+                   'PATH_INFO': '/compute/',
+                   'REQUEST_METHOD': 'POST',
+                   'CONTENT_TYPE': 'text/plain',
+                   'CONTENT_LENGTH': str(len(text)),
+                   'HTTP_ACCEPT': 'text/plain',
+                   'wsgi.input': StringIO.StringIO(text)}
+        app(environ, response)
+        self.assertEquals(response.status, '201 Created')
+        self.assertEquals(len(app.registry.get_resources(None)), 400)
+
+    def test_custom_rendering_for_sanity(self):
+        '''
+        Test that renderings which do not stream the body get a string.
+        '''
+        rendering = StringRendering(None)
+        app = Application(renderings={'text/bla': rendering})
+        rendering.registry = app.registry
+        app.register_backend(COMPUTE, KindBackend())
+        text = 'compute\nfoo'
+        response = RecordingResponse()
+        environ = {'SERVER_NAME': 'foo',
+                   'SERVER_PORT': '8888',
+                   'PATH_INFO': '/compute/',
+                   'REQUEST_METHOD': 'POST',
+                   'CONTENT_TYPE': 'text/bla',
+                   'CONTENT_LENGTH': str(len(text)),
+                   'HTTP_ACCEPT': 'text/bla',
+                   'wsgi.input': StringIO.StringIO(text)}
+        app(environ, response)
+        self.assertEquals(response.status, '201 Created')
+        self.assertEquals(rendering.bodies, [text, text])
+
+
+class StringRendering(Rendering):
+    '''
+    Rendering which only accepts the body as string.
+    '''
+
+    mime_type = 'text/bla'
+
+    def __init__(self, registry):
+        super(StringRendering, self).__init__(registry)
+        self.bodies = []
+
+    def to_entity(self, headers, body, def_kind, extras):
+        self.bodies.append(body)
+        if body.split('\n')[0] != 'compute':
+            raise AttributeError('Only compute is supported.')
+        return Resource(None, COMPUTE, [])
+
+    def to_entities(self, headers, body, extras):
+        self.bodies.append(body)
+        return []
+
+
+class RecordingResponse(object):
+    '''
+    Mock response which remembers the status and headers.
+    '''
+
+    def __init__(self):
+        self.status = None
+        self.headers = None
+
+    def __call__(self, stat, heads):
+        '''
+        Remember the status and headers.
+        '''
+        self.status = stat
+        self.headers = heads
+
+
+class LimitsTest(unittest.TestCase):
+    '''
+    Tests for the limits of the WSGI application.
+    '''
+
+    def setUp(self):
+        self.app = Application(limits={'max_body_bytes': 100,
+                                       'max_header_values': 10,
+                                       'max_links': 2,
+                                       'max_attributes': 5})
+        self.response = RecordingResponse()
+        self.environ = {'SERVER_NAME': 'foo',
+                        'SERVER_PORT': '8888',
+                        'PATH_INFO': '/foo',
+                        'REQUEST_METHOD': 'GET',
+                        'CONTENT_TYPE': 'text/plain',
+                        'HTTP_ACCEPT': 'text/plain'}
+
+    #==========================================================================
+    # Success
+    #==========================================================================
+
+    def test_defaults_for_sanity(self):
+        '''
+        Test that no limits are enforced by default.
+        '''
+        app = Application()
+        body = 'X-OCCI-Location: /compute/' + 'x' * 40 + '\n'
+        body *= 50000
+        self.environ['REQUEST_METHOD'] = 'PUT'
+        self.environ['CONTENT_LENGTH'] = str(len(body))
+        self.environ['wsgi.input'] = StringIO.StringIO(body)
+        app(self.environ, self.response)
+        self.assertNotEquals(self.response.status,
+                             '413 Request Entity Too Large')
+
+    def test_not_modified_for_sanity(self):
+        '''
+        Test that conditional requests are passed on.
+        '''
+        self.environ['PATH_INFO'] = '/-/'
+        body = self.app(self.environ, self.response)
+        self.assertEquals(self.response.status, '200 OK')
+
+        etag = [value for key, value in self.response.headers
+                if key == 'ETag'][0]
+        self.environ['HTTP_IF_NONE_MATCH'] = etag
+        body = self.app(self.environ, self.response)
+        self.assertEquals(self.response.status, '304 Not Modified')
+        self.assertEquals(body, [''])
+
+    def test_streaming_for_sanity(self):
+        '''
+        Test that collections are streamed without a Content-Length.
+        '''
+        self.environ['PATH_INFO'] = '/'
+        self.environ['HTTP_ACCEPT'] = 'text/uri-list'
+        body = self.app(self.environ, self.response)
+        self.assertFalse(isinstance(body, list))
+        self.assertEquals(''.join(body), '# uri:/')
+        self.assertFalse('Content-length' in dict(self.response.headers))
+
+        # everything else has a Content-Length.
+        self.environ['PATH_INFO'] = '/-/'
+        self.environ['HTTP_ACCEPT'] = 'text/plain'
+        body = self.app(self.environ, self.response)
+        self.assertEquals(dict(self.response.headers)['Content-length'],
+                          str(len(body[0])))
+
+    def test_limits_for_success(self):
+        '''
+        Test that requests within the limits pass.
+        '''
+        self.environ['HTTP_X_OCCI_ATTRIBUTE'] = 'a="b", c="d"'
+        self.environ['HTTP_LINK'] = '</bar>; category="a#b"; foo="bar"'
+        self.app(self.environ, self.response)
+        self.assertEquals(self.response.status, '404 Not Found')
+
+    #==========================================================================
+    # Failure
+    #==========================================================================
+
+    def test_body_size_for_failure(self):
+        '''
+        Test that too large bodies are not read.
+        '''
+        self.environ['CONTENT_LENGTH'] = '101'
+        self.environ['wsgi.input'] = StringIO.StringIO('a' * 101)
+        self.app(self.environ, self.response)
+        self.assertEquals(self.response.status,
+                          '413 Request Entity Too Large')
+        self.assertEquals(self.environ['wsgi.input'].tell(), 0)
+
+    def test_header_values_for_failure(self):
+        '''
+        Test that headers with too many values are rejected.
+        '''
+        self.environ['HTTP_CATEGORY'] = ', '.join(['a'] * 11)
+        self.app(self.environ, self.response)
+        self.assertEquals(self.response.status, '400 Bad Request')
+
+    def test_links_for_failure(self):
+        '''
+        Test that too many links are rejected - in headers and body.
+        '''
+        self.environ['HTTP_LINK'] = '</a>, </b>, </c>'
+        self.app(self.environ, self.response)
+        self.assertEquals(self.response.status, '400 Bad Request')
+
+        # links in the body are counted while it is read.
+        self.environ.pop('HTTP_LINK')
+        self.environ['REQUEST_METHOD'] = 'POST'
+        self.environ['PATH_INFO'] = '/'
+        body = 'Link: </a>\nLink: </b>\nLink: </c>'
+        self.environ['CONTENT_LENGTH'] = str(len(body))
+        self.environ['wsgi.input'] = StringIO.StringIO(body)
+        self.app(self.environ, self.response)
+        self.assertEquals(self.response.status, '400 Bad Request')
+
+    def test_blank_lines_for_failure(self):
+        '''
+        Test that blank lines cannot be used to get around the limits of a
+        single entity.
+        '''
+        self.app.limits['max_body_bytes'] = None
+        self.app.register_backend(COMPUTE, KindBackend())
+        body = 'Category: compute; ' \
+            'scheme="http://schemas.ogf.org/occi/infrastructure#"\n'
+        body += '\n\n'.join(['X-OCCI-Attribute: occi.compute.cores="2"'] * 6)
+        self.environ['REQUEST_METHOD'] = 'PUT'
+        self.environ['PATH_INFO'] = '/compute/1'
+        self.environ['CONTENT_LENGTH'] = str(len(body))
+        self.environ['wsgi.input'] = StringIO.StringIO(body)
+        self.app(self.environ, self.response)
+        self.assertEquals(self.response.status, '400 Bad Request')
+        self.assertEquals(self.app.registry.get_resource_keys(None), [])
+
+    def test_attributes_for_failure(self):
+        '''
+        Test that too many attributes are rejected - including those of
+        inline links.
+        '''
+        self.environ['HTTP_X_OCCI_ATTRIBUTE'] = 'a=1, b=2, c=3, d=4, e=5, f=6'
+        self.app(self.environ, self.response)
+        self.assertEquals(self.response.status, '400 Bad Request')
+
+        self.environ['HTTP_X_OCCI_ATTRIBUTE'] = 'a=1, b=2, c=3'
+        self.environ['HTTP_LINK'] = '</a>; category="a#b"; c=1; d=2'
+        self.app(self.environ, self.response)
+        self.assertEquals(self.response.status, '400 Bad Request')
+
+
+class RequestBodyTest(unittest.TestCase):
+    '''
+    Tests for the lazily read request body.
+    '''
+
+    def test_lines_for_sanity(self):
+        '''
+        Test that the lines are returned without line breaks and only the
+        given length is read.
+        '''
+        stream = StringIO.StringIO('X-OCCI-Location: /a\nX-OCCI-Location: '
+                                   '/b\ntrailing garbage')
+        body = RequestBody(stream, 40)
+        self.assertTrue(body)
+        self.assertEquals(list(body), ['X-OCCI-Location: /a',
+                                       'X-OCCI-Location: /b'])
+        # can only be read once.
+        self.assertEquals(list(body), [])
+
+    def test_read_for_sanity(self):
+        '''
+        Test that the body is read as it was sent - including carriage
+        returns and the trailing line break.
+        '''
+        text = '{"kind": "a#b",\r\n "attributes": {"c": "d\\n"}}\n'
+        body = RequestBody(StringIO.StringIO(text + 'garbage'), len(text))
+        self.assertEquals(body.read(), text)
+        # can only be read once.
+        self.assertEquals(body.read(), '')
+
+        stream = StringIO.StringIO('X-OCCI-Attribute: a=1, b=2\n'
+                                   'X-OCCI-Attribute: c=3\n')
+        body = RequestBody(stream, 48, {'max_attributes': 2})
+        self.assertRaises(HTTPError, body.read)
+
+    def test_limits_for_failure(self):
+        '''
+        Test that the limits are checked while reading.
+        '''
+        stream = StringIO.StringIO('X-OCCI-Attribute: a=1, b=2\n'
+                                   'X-OCCI-Attribute: c=3\n')
+        body = RequestBody(stream, 48, {'max_attributes': 2})
+        lines = iter(body)
+        self.assertEquals(lines.next(), 'X-OCCI-Attribute: a=1, b=2')
+        self.assertRaises(HTTPError, lines.next)
+
+    def test_limits_per_entity_for_sanity(self):
+        '''
+        Test that the limits apply to each entity of a bulk request.
+        '''
+        text = '\n\n'.join(['Category: a\nX-OCCI-Attribute: a=1, b=2'] * 3)
+        body = RequestBody(StringIO.StringIO(text), len(text),
+                           {'max_attributes': 2}, per_entity=True)
+        self.assertEquals(len(list(body)), 8)
+
+        text = 'Category: a\nX-OCCI-Attribute: a=1\n\n' \
+            'Category: a\nX-OCCI-Attribute: a=1, b=2, c=3'
+        body = RequestBody(StringIO.StringIO(text), len(text),
+                           {'max_attributes': 2}, per_entity=True)
+        self.assertRaises(HTTPError, list, body)
+
+    def test_limits_per_entity_for_failure(self):
+        '''
+        Test that blank lines do not start a new entity - unless it is a bulk
+        request and a Category follows.
+        '''
+        text = '\n\n'.join(['X-OCCI-Attribute: a=1, b=2'] * 3)
+        body = RequestBody(StringIO.StringIO(text), len(text),
+                           {'max_attributes': 2}, per_entity=True)
+        self.assertRaises(HTTPError, list, body)
+
+        text = '\n\n'.join(['Category: a\nX-OCCI-Attribute: a=1, b=2'] * 3)
+        body = RequestBody(StringIO.StringIO(text), len(text),
+                           {'max_attributes': 2})
+        self.assertRaises(HTTPError, list, body)